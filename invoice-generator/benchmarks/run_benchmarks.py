@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Rendering benchmarks for all PDF backends.
+
+Renders synthetic invoices with 1, 8, 30, 100 and 223 items through every
+backend and reports docs/sec, pages/sec, p50/p95 latency and peak RSS as JSON.
+Each (backend, size) case runs in a fresh process, so peak RSS belongs to
+that case only. Results are compared against the stored baseline and the
+script exits with code 1 if any metric regressed beyond the tolerance, if a
+case that passed in the baseline did not pass now, or if a backend failed.
+Without a baseline the script exits with code 2: save one first with
+--save-baseline on the machine that runs the comparison.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--backend NAME] [--sizes 1,8,30] [--repeat N]
+                                        [--output results.json] [--save-baseline]
+                                        [--tolerance 0.15]
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import multiprocessing
+import platform
+import re
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import SIZES, make_invoice
+
+BASELINE_PATH = Path(__file__).parent / 'baseline.json'
+DEFAULT_TOLERANCE = 0.15
+RSS_TOLERANCE = 0.25
+
+# Число документов на один замер в зависимости от размера инвойса
+DEFAULT_REPEATS = {1: 20, 8: 20, 30: 10, 100: 5, 223: 3}
+
+# Объект страницы PDF (но не /Pages)
+PAGE_PATTERN = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+
+class BackendUnavailable(Exception):
+    """A backend cannot run here for a known reason (e.g. missing input data); the case is skipped."""
+
+
+class FeilerHtmlBackend:
+    """templates.invoice.feiler: Jinja + WeasyPrint, single pass."""
+
+    backend = 'weasyprint'
+
+    def setup(self):
+        from templates.invoice.feiler.generator import FeilerInvoiceGenerator
+        self.generator = FeilerInvoiceGenerator(backend=self.backend)
+
+    def render(self, invoice, out_dir, index):
+        html_path = out_dir / f'invoice_{index}.html'
+        pdf_path = out_dir / f'invoice_{index}.pdf'
+        self.generator.generate(invoice, str(html_path), str(pdf_path), anonymize=False)
+        return pdf_path
+
+    def expected_pages(self, invoice):
+        return len(self.generator.plan_pages(invoice))
+
+
+class FeilerReportLabBackend(FeilerHtmlBackend):
+    """templates.invoice.feiler with the ReportLab canvas backend."""
+
+    backend = 'reportlab'
+
+    def render(self, invoice, out_dir, index):
+        pdf_path = out_dir / f'invoice_{index}.pdf'
+        self.generator.generate(invoice, None, str(pdf_path), anonymize=False)
+        return pdf_path
+
+
+class InvoiceHtmlBackend:
+    """templates.invoice.InvoiceGenerator: page-by-page HTML + WeasyPrint."""
+
+    def setup(self):
+        from templates.invoice import InvoiceGenerator
+        self.generator = InvoiceGenerator()
+
+    def render(self, invoice, out_dir, index):
+        pdf_path = out_dir / f'invoice_{index}.pdf'
+        self.generator.generate_both(invoice, str(out_dir / f'invoice_{index}.html'), str(pdf_path),
+                                     persist_html=False)
+        return pdf_path
+
+    def expected_pages(self, invoice):
+        from templates.invoice.generator import HTML_LAYOUT, html_item_height
+        from utils.pagination import plan_pages
+        return len(plan_pages(invoice.items, HTML_LAYOUT, html_item_height, totals=False))
+
+
+class PdfTemplatesHtmlBackend(InvoiceHtmlBackend):
+    """pdf_templates.invoice_generator: file-based WeasyPrint generator."""
+
+    def setup(self):
+        from pdf_templates.invoice_generator import FeilerInvoiceGenerator
+        self.generator = FeilerInvoiceGenerator()
+        if not self.generator.css_path.exists():
+            raise BackendUnavailable(f"Template directory not found: {self.generator.template_dir}")
+
+
+class ReportLabBackend:
+    """pdf_templates.feiler_template: ReportLab canvas."""
+
+    def setup(self):
+        from pdf_templates.feiler_template import FeilerInvoiceTemplate
+        self.template = FeilerInvoiceTemplate()
+
+    def render(self, invoice, out_dir, index):
+        pdf_path = out_dir / f'invoice_{index}.pdf'
+        self.template.render(invoice, str(pdf_path))
+        return pdf_path
+
+    def expected_pages(self, invoice):
+        return len(self.template.plan_pages(invoice))
+
+
+BACKENDS = {
+    'feiler_html': FeilerHtmlBackend,
+    'feiler_reportlab': FeilerReportLabBackend,
+    'invoice_html': InvoiceHtmlBackend,
+    'pdf_templates_html': PdfTemplatesHtmlBackend,
+    'reportlab': ReportLabBackend,
+}
+
+
+def count_pages(pdf_path):
+    """Count page objects in a PDF; returns 0 if they are hidden in compressed streams."""
+    return len(PAGE_PATTERN.findall(Path(pdf_path).read_bytes()))
+
+
+def peak_rss_mb():
+    """Peak resident set size of the current process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux возвращает КБ, macOS - байты
+    if platform.system() == 'Darwin':
+        return peak / 1024 ** 2
+    return peak / 1024
+
+
+def percentile(values, fraction):
+    """Percentile with linear interpolation between closest ranks."""
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = math.floor(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def run_case(backend_name, size, repeat):
+    """Render `repeat` invoices of `size` items with one backend (runs in a fresh process)."""
+    # Генераторы печатают прогресс в stdout, а stdout занят под JSON-отчет
+    with contextlib.redirect_stdout(sys.stderr):
+        return _run_case(backend_name, size, repeat)
+
+
+def _run_case(backend_name, size, repeat):
+    backend = BACKENDS[backend_name]()
+    try:
+        backend.setup()
+    except BackendUnavailable as e:
+        return {'backend': backend_name, 'items': size, 'status': 'skipped', 'reason': str(e)}
+    except Exception as e:
+        # Сломанный бэкенд (например, не импортируется) - ошибка, а не пропуск
+        return {'backend': backend_name, 'items': size, 'status': 'failed',
+                'reason': f"{type(e).__name__}: {e}"}
+
+    invoice = make_invoice(size)
+    latencies = []
+    pages = 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out_dir = Path(tmp_dir)
+        # Прогрев: первый документ загружает шрифты, шаблоны и ресурсы
+        backend.render(invoice, out_dir, 'warmup')
+
+        for index in range(repeat):
+            started = time.perf_counter()
+            pdf_path = backend.render(invoice, out_dir, index)
+            latencies.append(time.perf_counter() - started)
+            pages += count_pages(pdf_path) or backend.expected_pages(invoice)
+
+    total = sum(latencies)
+    return {
+        'backend': backend_name,
+        'items': size,
+        'status': 'ok',
+        'documents': repeat,
+        'pages_per_doc': pages / repeat,
+        'docs_per_sec': repeat / total,
+        'pages_per_sec': pages / total,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_benchmarks(backends, sizes, repeat=None):
+    """Run every (backend, size) case in its own process."""
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for backend_name in backends:
+        for size in sizes:
+            count = repeat or DEFAULT_REPEATS.get(size, 5)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_case, backend_name, size, count).result()
+            results.append(result)
+            if result['status'] == 'ok':
+                print(f"{backend_name:>20} {size:>4} items: {result['docs_per_sec']:8.2f} docs/s "
+                      f"{result['pages_per_sec']:8.2f} pages/s  p50 {result['p50_ms']:8.1f} ms  "
+                      f"p95 {result['p95_ms']:8.1f} ms  RSS {result['peak_rss_mb']:6.1f} MB",
+                      file=sys.stderr)
+            else:
+                print(f"{backend_name:>20} {size:>4} items: {result['status']} ({result['reason']})",
+                      file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, rss_tolerance=RSS_TOLERANCE):
+    """Return a list of regressions against the baseline results."""
+    reference = {(r['backend'], r['items']): r for r in baseline.get('results', []) if r['status'] == 'ok'}
+    regressions = []
+
+    for result in results:
+        base = reference.get((result['backend'], result['items']))
+        if base is None:
+            continue
+
+        case = f"{result['backend']}/{result['items']} items"
+        # Случай, проходивший в эталоне, должен проходить и сейчас
+        if result['status'] != 'ok':
+            regressions.append(f"{case}: {result['status']} ({result['reason']}), ok in baseline")
+            continue
+        # Пропускная способность: меньше - хуже
+        for metric in ('docs_per_sec', 'pages_per_sec'):
+            if result[metric] < base[metric] * (1 - tolerance):
+                regressions.append(f"{case}: {metric} {result[metric]:.2f} < baseline {base[metric]:.2f}")
+        # Задержка и память: больше - хуже
+        for metric, limit in (('p50_ms', tolerance), ('p95_ms', tolerance), ('peak_rss_mb', rss_tolerance)):
+            if result[metric] > base[metric] * (1 + limit):
+                regressions.append(f"{case}: {metric} {result[metric]:.1f} > baseline {base[metric]:.1f}")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark PDF rendering backends')
+    parser.add_argument('--backend', action='append', choices=sorted(BACKENDS),
+                        help='Backend to run (repeatable, default: all)')
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                        help='Comma-separated invoice sizes in items')
+    parser.add_argument('--repeat', type=int, help='Documents per case (default depends on size)')
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='Store results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Allowed relative slowdown before failing')
+    args = parser.parse_args()
+
+    backends = args.backend or list(BACKENDS)
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': run_benchmarks(backends, sizes, args.repeat),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + '\n', encoding='utf-8')
+    else:
+        print(output)
+
+    failed = [r for r in report['results'] if r['status'] == 'failed']
+    if failed:
+        print("\nBACKEND FAILURE:", file=sys.stderr)
+        for result in failed:
+            print(f"  {result['backend']}/{result['items']} items: {result['reason']}", file=sys.stderr)
+        return 1
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(output + '\n', encoding='utf-8')
+        print(f"Baseline saved to {baseline_path}", file=sys.stderr)
+        return 0
+
+    # Эталон зависит от машины и в репозиторий не входит: без него сравнивать не с чем
+    if not baseline_path.exists():
+        print(f"No baseline at {baseline_path}, run with --save-baseline to create one", file=sys.stderr)
+        return 2
+
+    regressions = compare(report['results'], json.loads(baseline_path.read_text(encoding='utf-8')),
+                          tolerance=args.tolerance)
+    if regressions:
+        print("\nPERFORMANCE REGRESSION:", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        return 1
+
+    print("No regressions against baseline", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic invoices for benchmarks.
+
+Sizes follow the statistics of the source data from the README
+(min 1, average ~30, max 223 items per invoice).
+"""
+
+import random
+from datetime import datetime
+
+from utils.invoice_model import Address, Invoice, LineItem
+
+# Количество позиций в инвойсе: минимум, страница, среднее, крупный, максимум
+SIZES = [1, 8, 30, 100, 223]
+
+COLLECTIONS = ['BELLE FLEUR', 'SUMMER DAY', 'FLOWER MEADOW', 'WINTER DREAMS', 'AUTUMN LEAVES',
+               'ELEGANCE', 'CLASSIC', 'PEONY GARDEN', 'NIGHT BLOSSOM', 'CHENILLE ROYAL']
+SIZES_CM = ['50/100', '75/150', '37/50', '150/200', '30/50']
+COLORS = [('147', 'pebble'), ('227', 'breeze'), ('445', 'stone'), ('666', 'black'), ('', 'white')]
+
+
+def _lines(item_count, seed):
+    """Yield (position, collection, size, color_id, color, quantity, price_cents, sku) tuples."""
+    rng = random.Random(seed)
+    for position in range(1, item_count + 1):
+        color_id, color = rng.choice(COLORS)
+        yield (
+            position,
+            rng.choice(COLLECTIONS),
+            rng.choice(SIZES_CM),
+            color_id or '.',
+            color,
+            rng.randint(1, 12),
+            rng.randint(500, 9000),
+            f"sku{rng.randint(100000, 999999)}",
+        )
+
+
+def _money(cents):
+    return f"{cents // 100},{cents % 100:02d}"
+
+
+def make_invoice(item_count, seed=0):
+    """Invoice model with the given number of items, consumed by every backend."""
+    items = tuple(
+        LineItem(
+            position=position,
+            design=collection,
+            size=size,
+            color=color_id,
+            quantity=str(quantity),
+            unit='pcs',
+            price=_money(price_cents),
+            amount=_money(price_cents * quantity),
+            amount_cents=price_cents * quantity,
+            color_name=color,
+            article_no=sku,
+            hs_code='HS-Code: 63029100 Chenille towels, 100% cotton',
+            product_type='Towel'
+        )
+        for position, collection, size, color_id, color, quantity, price_cents, sku in _lines(item_count, seed)
+    )
+
+    return Invoice(
+        invoice_number=f"BENCH-{item_count:03d}-{seed}",
+        invoice_date=datetime(2024, 9, 18),
+        customer_number='29060',
+        order='2069354',
+        agent='49112',
+        seller='Emanuel Baur Asien/Drittland',
+        contact='Anja Konig',
+        recipient=Address('Home Sweet Home', 'Perekopskaya Street 123', '73022', 'KHERSON', 'UKRAINE'),
+        correspondence_number='09-2024',
+        correspondence_date=datetime(2024, 9, 10),
+        correspondence_person='Tatjana Parygin',
+        delivery_note_number='4059965',
+        delivery_date=datetime(2024, 9, 18),
+        items=items
+    )
@@ -1,307 +1,478 @@
+from reportlab import Version as REPORTLAB_VERSION
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import mm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.colors import black
+from reportlab.lib.colors import black, HexColor
 from reportlab.lib.utils import ImageReader
+import hashlib
+import logging
 import os
-import platform
+import threading
+from pathlib import Path
 from . import BaseInvoiceTemplate
+from . import fonts as font_metrics
+from .fonts import register_fonts, string_width, wrap_text
+from utils import pagination
+from utils.invoice_model import as_invoice, format_date
+from utils.line_items import format_cents
+from utils.pagination import PageLayout, plan_pages
+from utils.pdf_bundle import BundleIndex, outline_title
+
+logger = logging.getLogger(__name__)
+
+# Поля страницы как в @page шаблона templates/invoice/feiler/template.html
+MARGIN_TOP = 15 * mm
+MARGIN_BOTTOM = 20 * mm
+MARGIN_SIDE = 20 * mm
+
+GREY = HexColor('#666666')
+HEADER_BACKGROUND = HexColor('#f8f8f8')
+
+# Ширины колонок таблицы в долях ширины контента (как в CSS шаблона)
+COLUMN_WIDTHS = [0.04, 0.35, 0.12, 0.15, 0.12, 0.10, 0.12]
+COLUMN_TITLES = ["Pos.", "Design", "Size", "Color", "Quantity QU", "Price", "Amount (EUR)"]
+
+# Высоты строк позиции: основная строка (и каждая строка переноса Design), артикул, HS-Code
+MAIN_LINE_HEIGHT = 12
+DETAIL_LINE_HEIGHT = 10
+ITEM_SPACING = 3
+TABLE_HEADER_HEIGHT = 16
+
+TRANSPORT_CHARGE = "30,00"
+
+LOGO_WIDTH = 150
+LOGO_HEIGHT = 50
+HEADER_LABELS = ["Date", "Your Customer No.", "Invoice-No.", "Seller", "Contact", "Agent", "Order"]
+
+# Имена form XObject со статичными элементами страницы
+HEADER_FORM = 'FeilerHeader'
+TABLE_HEADER_FORM = 'FeilerTableHeader'
+
+_image_lock = threading.Lock()
+# Абсолютный путь -> (mtime_ns, ImageReader)
+_image_cache = {}
+
+
+def get_image(path):
+    """Return a decoded image shared by all documents of this process, or None if the file is missing."""
+    path = os.path.abspath(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _image_lock:
+        cached = _image_cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, ImageReader(path))
+            _image_cache[path] = cached
+        return cached[1]
+
 
 class FeilerInvoiceTemplate(BaseInvoiceTemplate):
-    """Шаблон для инвойсов компании Feiler."""
+    """Шаблон для инвойсов компании Feiler.
+
+    Рисует на холсте ReportLab ту же раскладку, что и HTML-шаблон
+    templates/invoice/feiler/template.html: трехстрочные позиции (артикул,
+    HS-Code) и блок итогов. Страницы заполняются по измеренной высоте позиций
+    (utils.pagination).
+    """
 
     def __init__(self):
         """Инициализация шаблона и регистрация шрифтов."""
-        # Используем шрифт Liberation Serif (свободная замена Times New Roman)
-        font_path = os.path.join(os.path.dirname(__file__), '..', 'fonts')
-        
-        # Проверяем наличие шрифта Liberation
-        liberation_regular = os.path.join(font_path, 'LiberationSerif-Regular.ttf')
-        liberation_bold = os.path.join(font_path, 'LiberationSerif-Bold.ttf')
-        
-        if os.path.exists(liberation_regular) and os.path.exists(liberation_bold):
-            pdfmetrics.registerFont(TTFont('LiberationSerif', liberation_regular))
-            pdfmetrics.registerFont(TTFont('LiberationSerif-Bold', liberation_bold))
-            self.font_name = 'LiberationSerif'
-            self.font_bold = 'LiberationSerif-Bold'
-        else:
-            print("Warning: Liberation fonts not found, using system fonts")
-            self.font_name = 'Helvetica'
-            self.font_bold = 'Helvetica-Bold'
-            
+        # Шрифты регистрируются один раз на процесс (pdf_templates.fonts)
+        fonts = register_fonts()
+        self.font_name = fonts.regular
+        self.font_bold = fonts.bold
+        self.font_files = fonts.files
+
         # Путь к логотипу
         self.logo_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'sample', 'logo_feiler.png')
 
-    def draw_header(self, canvas, width, height, data):
-        """Отрисовка шапки документа."""
+        width, height = A4
+        self.content_width = width - 2 * MARGIN_SIDE
+        self.columns = []
+        x = MARGIN_SIDE
+        for fraction in COLUMN_WIDTHS:
+            self.columns.append(x)
+            x += fraction * self.content_width
+        # Ширина текста в колонке Design (отступ 2pt с каждой стороны)
+        self.design_width = COLUMN_WIDTHS[1] * self.content_width - 4
+
+        # Место под таблицу: от шапки (и блока доставки на первой странице) до нижнего поля
+        page_space = height - MARGIN_TOP - self.header_height() - MARGIN_BOTTOM
+        self.layout = PageLayout(
+            first_page_space=page_space - self.shipping_height(),
+            page_space=page_space,
+            table_header_height=TABLE_HEADER_HEIGHT,
+            totals_height=self.totals_height()
+        )
+
+    # --- Подготовка данных ---
+
+    def format_totals(self, invoice):
+        """Formatted (total, net, gross) or None if amounts are placeholders."""
+        if invoice.total_cents is None:
+            return None
+        return format_cents([invoice.total_cents, invoice.net_cents, invoice.gross_cents], locale='en').tolist()
+
+    def header_values(self, invoice):
+        """Invoice details as printed; empty fields become placeholders (template without data)."""
+        values = [
+            (format_date(invoice.invoice_date), "[Date]"),
+            (invoice.customer_number, "[Customer No]"),
+            (invoice.invoice_number, "[Invoice No]"),
+            (invoice.seller, "[Seller Name]"),
+            (invoice.contact, "[Contact Name]"),
+            (invoice.agent, "[Agent]"),
+            (invoice.order, "[Order No]")
+        ]
+        return [str(value or placeholder) for value, placeholder in values]
+
+    def printed_fields(self, invoice):
+        """Every text the document prints, formatted as drawn (dates as dd.mm.yyyy).
+
+        Two invoices with equal printed fields render to the same PDF, so this
+        is the data part of the render cache key.
+        """
+        fields = [invoice.sender, *invoice.recipient.lines(), *self.header_values(invoice),
+                  *invoice.ship_to.lines(), invoice.vat_info, invoice.correspondence_text(),
+                  invoice.delivery_text(), self.format_totals(invoice)]
+        for item in invoice.items:
+            fields.append([str(item.position), str(item.design), str(item.size), str(item.color),
+                           f"{item.quantity} {item.unit}".strip(), str(item.price), str(item.amount),
+                           str(item.article_no or ''), str(item.color_name or ''), str(item.hs_code or '')])
+        return fields
+
+    def cache_key(self, cache, invoice, *context):
+        """Render cache key (utils.render_cache) of the PDF rendered for an Invoice.
+
+        Covers everything the output depends on: the ReportLab version, the
+        source of this template, of the font metrics and of the page planner,
+        the font files, the logo and the printed fields. Callers may prepend
+        their own context (generator name and version).
+        """
+        parts = [
+            *context,
+            type(self).__name__,
+            REPORTLAB_VERSION,
+            Path(__file__),
+            # Метрики шрифтов и разбиение на страницы определяют раскладку документа
+            Path(font_metrics.__file__),
+            Path(pagination.__file__),
+            self.printed_fields(invoice)
+        ]
+        # Шрифты и логотип влияют на результат так же, как код шаблона
+        for path in self.font_files + [self.logo_path]:
+            if os.path.exists(path):
+                parts.append(Path(path))
+        return cache.make_key(*parts)
+
+    # --- Измерение ---
+
+    def _wrap_design(self, text):
+        """Wrap a design name to the Design column by glyph widths of the bold font."""
+        return wrap_text(text, self.font_bold, 8.5, self.design_width)
+
+    def item_height(self, item):
+        """Height of one item block (main line, wrapped design, article and HS-Code lines)."""
+        height = MAIN_LINE_HEIGHT * len(self._wrap_design(str(item.design)))
+        if item.article_no or item.color_name:
+            height += DETAIL_LINE_HEIGHT
+        if item.hs_code:
+            height += DETAIL_LINE_HEIGHT
+        return height + ITEM_SPACING
+
+    def header_height(self):
+        """Height of the page header (logo, addresses, invoice details)."""
+        return 50 + 19 + 14 + 15 + 7 * 13 + 26
+
+    def shipping_height(self):
+        """Height of the first-page shipping block."""
+        return 12 + 12 * 4 + 12 + 3 * 16 + 26
+
+    def totals_height(self):
+        """Height of the totals block with terms of delivery."""
+        return 20 + 4 * 13 + 30 + 12 + 2 * 11
+
+    def plan_pages(self, invoice):
+        """Lay out pages by measured item heights (see utils.pagination.plan_pages)."""
+        return plan_pages(invoice.items, self.layout, self.item_height,
+                          totals=invoice.total_cents is not None)
+
+    # --- Отрисовка ---
+
+    def draw_right(self, canvas, x, y, text, font_name, size):
+        """Right-aligned text measured with the cached glyph-width tables."""
+        canvas.setFont(font_name, size)
+        canvas.drawString(x - string_width(text, font_name, size), y, text)
+
+    def header_form_name(self, invoice):
+        """Name of the header form; documents with a different sender line get their own form."""
+        digest = hashlib.sha1(invoice.sender.encode('utf-8')).hexdigest()[:12]
+        return f"{HEADER_FORM}_{digest}"
+
+    def define_forms(self, canvas, width, height, invoice):
+        """Capture the static page furniture as form XObjects.
+
+        Every page then references the same objects with doForm instead of
+        redrawing them, and the logo image is embedded only once. Forms that
+        already exist in the document (bundles) are reused.
+        """
+        # Шапка: логотип, строка отправителя, заголовок Invoice и подписи реквизитов
+        header_form = self.header_form_name(invoice)
+        if not canvas.hasForm(header_form):
+            canvas.beginForm(header_form)
+            self._draw_header_static(canvas, width, height, invoice)
+            canvas.endForm()
+
+        # Заголовок таблицы рисуется от y=0 и переносится на нужную высоту при выводе
+        if not canvas.hasForm(TABLE_HEADER_FORM):
+            canvas.beginForm(TABLE_HEADER_FORM, 0, -TABLE_HEADER_HEIGHT - 1, width, 1)
+            self._draw_table_header_static(canvas, width)
+            canvas.endForm()
+
+    def _draw_header_static(self, canvas, width, height, invoice):
+        """Parts of the header that are identical on every page of a document."""
+        top = height - MARGIN_TOP
+        start_y = top - LOGO_HEIGHT - 19
+
         # 1. Логотип в правом верхнем углу
-        if os.path.exists(self.logo_path):
-            img = ImageReader(self.logo_path)
-            # Увеличенные размеры логотипа
-            logo_width = 180
-            logo_height = 70
-            # Позиционирование логотипа справа вверху с отступами
-            logo_x = width - logo_width - 30
-            logo_y = height - logo_height - 20
-            canvas.drawImage(img, logo_x, logo_y,
-                           width=logo_width, height=logo_height, mask='auto')
-
-        # Начальная позиция для колонок (под логотипом)
-        start_y = height - logo_height - 50
-
-        # 2. Левая колонка (адрес отправителя и получателя)
-        # Адрес отправителя (подчеркнутый)
+        # Место под логотип резервируется и без файла логотипа
+        logo = get_image(self.logo_path)
+        if logo is not None:
+            canvas.drawImage(logo, width - MARGIN_SIDE - LOGO_WIDTH, top - LOGO_HEIGHT,
+                             width=LOGO_WIDTH, height=LOGO_HEIGHT, mask='auto', preserveAspectRatio=True,
+                             anchor='ne')
+
+        # 2. Адрес отправителя (подчеркнутый, серый)
+        canvas.setFillColor(GREY)
+        canvas.setStrokeColor(GREY)
+        canvas.setLineWidth(0.5)
         canvas.setFont(self.font_name, 7)
-        sender = data.get("SENDER", "Ernst Feiler GmbH - Postfach 28 - D-95691 Hohenberg/Eger")
-        canvas.drawString(30, start_y, sender)
-        canvas.line(30, start_y - 2, 30 + canvas.stringWidth(sender, self.font_name, 7), start_y - 2)
-        
-        # Адрес получателя
-        canvas.setFont(self.font_name, 10)
-        y = start_y - 20
-        address_template = data.get("CUSTOMER_FULL_ADDRESS", """[Company Name]
-[Street Address]
-[Postal Code] [City]
-[Country]""")
-        for line in address_template.split('\n'):
-            canvas.drawString(30, y, line)
-            y -= 12
+        canvas.drawString(MARGIN_SIDE, start_y - 7, invoice.sender)
+        canvas.line(MARGIN_SIDE, start_y - 10, MARGIN_SIDE + self.content_width * 0.48, start_y - 10)
 
-        # 3. Правая колонка (с отступом от правого края)
-        # Заголовок Invoice (подчеркнутый)
-        right_column_x = width - 250  # Отступ от правого края
-        canvas.setFont(self.font_bold, 12)
-        invoice_text = "Invoice"
-        invoice_y = start_y + 15
-        canvas.drawString(right_column_x, invoice_y, invoice_text)
-        canvas.line(right_column_x, invoice_y - 2, 
-                   right_column_x + canvas.stringWidth(invoice_text, self.font_bold, 12), 
-                   invoice_y - 2)
-
-        # Информация в правой колонке
-        y = start_y - 5
-        fields = [
-            ("Date", data.get("DATE", "[Date]")),
-            ("Your Customer No.", data.get("CUSTOMER_NO", "[Customer No]")),
-            ("Invoice-No.", data.get("INVOICE_NO", "[Invoice No]"), True),
-            ("Order", data.get("ORDER", "[Order No]")),
-            ("Agent", data.get("AGENT", "[Agent]")),
-            ("Seller", data.get("SELLER", "[Seller Name]")),
-            ("Contact", data.get("CONTACT", "[Contact Name]"))
-        ]
+        # 3. Заголовок Invoice и подписи реквизитов в правой колонке
+        right_column_x = MARGIN_SIDE + self.content_width * 0.52
+        canvas.setFillColor(black)
+        canvas.setFont(self.font_bold, 14)
+        canvas.drawString(right_column_x, start_y - 14, "Invoice")
 
-        # Позиции для правой колонки (с правильным выравниванием)
-        label_x = right_column_x
-        value_x = right_column_x + 120  # Отступ для значений
-
-        for label, value, *bold in fields:
-            is_bold = bool(bold and bold[0])
-            canvas.setFont(self.font_bold if is_bold else self.font_name, 9)
-            canvas.drawString(label_x, y, f"{label}:")
-            
-            # Для длинных значений используем меньший шрифт
-            if len(value) > 20:
-                canvas.setFont(self.font_name, 8)
+        canvas.setFillColor(GREY)
+        canvas.setFont(self.font_name, 8.5)
+        y = start_y - 14 - 15 - 9
+        for label in HEADER_LABELS:
+            canvas.drawString(right_column_x, y, label)
+            y -= 13
+
+    def draw_header(self, canvas, width, height, invoice):
+        """Отрисовка шапки документа. Возвращает позицию под шапкой."""
+        top = height - MARGIN_TOP
+        start_y = top - LOGO_HEIGHT - 19
+        canvas.doForm(self.header_form_name(invoice))
+
+        # Адрес получателя
+        canvas.setFillColor(black)
+        canvas.setFont(self.font_name, 9)
+        y = start_y - 35
+        for line in invoice.recipient.lines():
+            canvas.drawString(MARGIN_SIDE, y, line)
+            y -= 12.6
+
+        value_x = MARGIN_SIDE + self.content_width * 0.52 + 90
+        y = start_y - 14 - 15 - 9
+        for value in self.header_values(invoice):
             canvas.drawString(value_x, y, value)
-            y -= 12
+            y -= 13
 
-        # Номер страницы (прижат к правому краю колонки)
-        y -= 5
-        page_text = f"Page {data.get('PAGE', '1')} fr. {data.get('TOTAL_PAGES', '1')}"
-        canvas.drawRightString(width - 30, y, page_text)
+        return top - self.header_height()
 
-    def draw_shipping_info(self, canvas, width, height, data, first_page=True):
+    def draw_shipping_info(self, canvas, y, invoice):
         """Отрисовка информации о доставке (только на первой странице)."""
-        if not first_page:
-            return
-
-        # Определяем начальную позицию для блока доставки
-        # (ниже обеих колонок из шапки)
-        start_y = height - 200  # Увеличенный отступ сверху
-            
-        # Ship to с подчеркиванием
-        canvas.setFont(self.font_bold, 10)
-        ship_to_text = "Ship to:"
-        canvas.drawString(30, start_y, ship_to_text)
-        canvas.line(30, start_y - 2, 30 + canvas.stringWidth(ship_to_text, self.font_bold, 10), start_y - 2)
-        
-        # Адрес доставки
-        y = start_y - 20
-        canvas.setFont(self.font_name, 10)
-        for line in data.get("SHIPPING_ADDRESS", "").split('\n'):
-            canvas.drawString(30, y, line)
+        canvas.setFont(self.font_bold, 9)
+        y -= 9
+        canvas.drawString(MARGIN_SIDE, y, "Ship to:")
+
+        canvas.setFont(self.font_name, 9)
+        for line in invoice.ship_to.lines():
             y -= 12
-            
-        # Дополнительная информация с увеличенными отступами
-        y -= 20
+            canvas.drawString(MARGIN_SIDE, y, line)
+        y -= 12
+
         canvas.setFont(self.font_name, 8)
-        
-        # VAT информация с подчеркиванием
-        vat_info = data.get("VAT_INFO", "")
-        canvas.drawString(30, y, vat_info)
-        canvas.line(30, y - 2, 30 + canvas.stringWidth(vat_info, self.font_name, 8), y - 2)
-        
-        # Информация о корреспонденции
+        for text in (invoice.vat_info, invoice.correspondence_text(), invoice.delivery_text()):
+            y -= 16
+            canvas.drawString(MARGIN_SIDE, y, text)
+
+        return y - 26
+
+    def _draw_table_header_static(self, canvas, width):
+        """Table header drawn with its top edge at y=0 (captured as a form)."""
+        right = width - MARGIN_SIDE
+        canvas.setFillColor(HEADER_BACKGROUND)
+        canvas.rect(MARGIN_SIDE, -TABLE_HEADER_HEIGHT, self.content_width, TABLE_HEADER_HEIGHT,
+                    stroke=0, fill=1)
+
+        canvas.setStrokeColor(GREY)
+        canvas.setLineWidth(0.5)
+        canvas.line(MARGIN_SIDE, 0, right, 0)
+        canvas.line(MARGIN_SIDE, -TABLE_HEADER_HEIGHT, right, -TABLE_HEADER_HEIGHT)
+
+        canvas.setFillColor(GREY)
+        canvas.setFont(self.font_name, 8.5)
+        baseline = -TABLE_HEADER_HEIGHT + 5
+        for x, title in zip(self.columns[:-1], COLUMN_TITLES[:-1]):
+            canvas.drawString(x + 2, baseline, title)
+        self.draw_right(canvas, right - 2, baseline, COLUMN_TITLES[-1], self.font_name, 8.5)
+
+    def draw_table_header(self, canvas, width, y):
+        """Отрисовка заголовка таблицы товаров. Возвращает позицию первой строки."""
+        canvas.saveState()
+        canvas.translate(0, y)
+        canvas.doForm(TABLE_HEADER_FORM)
+        canvas.restoreState()
+        return y - TABLE_HEADER_HEIGHT
+
+    def draw_product_line(self, canvas, y, item):
+        """Отрисовка позиции: основная строка, артикул с цветом и HS-Code."""
+        width, _ = A4
+        right = width - MARGIN_SIDE
+        pos_x, design_x, size_x, color_x, quantity_x, price_x, _ = [x + 2 for x in self.columns]
+        design_lines = self._wrap_design(str(item.design))
+
+        # Первая строка позиции - жирным шрифтом
+        baseline = y - 9
+        canvas.setFont(self.font_bold, 8.5)
+        canvas.drawString(pos_x, baseline, str(item.position))
+        for index, line in enumerate(design_lines):
+            canvas.drawString(design_x, baseline - index * MAIN_LINE_HEIGHT, line)
+        canvas.drawString(size_x, baseline, str(item.size))
+        canvas.drawString(color_x, baseline, str(item.color))
+        canvas.drawString(quantity_x, baseline, f"{item.quantity} {item.unit}".strip())
+        canvas.drawString(price_x, baseline, str(item.price))
+        self.draw_right(canvas, right - 2, baseline, str(item.amount), self.font_bold, 8.5)
+        y -= MAIN_LINE_HEIGHT * len(design_lines)
+
+        canvas.setFillColor(GREY)
+        canvas.setFont(self.font_name, 7.5)
+        # Вторая строка: артикул и название цвета
+        if item.article_no or item.color_name:
+            baseline = y - 8
+            if item.article_no:
+                canvas.drawString(design_x, baseline, f"Article No.: {item.article_no}")
+            canvas.drawString(color_x, baseline, str(item.color_name))
+            y -= DETAIL_LINE_HEIGHT
+
+        # Третья строка: HS-Code на всю ширину от колонки Design
+        if item.hs_code:
+            canvas.drawString(design_x, y - 8, str(item.hs_code))
+            y -= DETAIL_LINE_HEIGHT
+        canvas.setFillColor(black)
+
+        return y - ITEM_SPACING
+
+    def draw_totals(self, canvas, width, y, invoice):
+        """Отрисовка блока итогов и условий поставки."""
+        right = width - MARGIN_SIDE
+        label_x = right - 100 - 10
         y -= 20
-        correspondence = data.get("CORRESPONDENCE", "")
-        canvas.drawString(30, y, correspondence)
-        
-        # Информация о доставке
-        y -= 15
-        delivery = data.get("DELIVERY_NOTE", "")
-        canvas.drawString(30, y, delivery)
-        
-        return y - 25  # Возвращаем позицию для следующего элемента
-
-    def draw_table_header(self, canvas, width, height, y_position):
-        """Отрисовка заголовка таблицы товаров."""
-        canvas.setFont(self.font_bold, 9)
-        
-        # Определяем позиции колонок
-        headers = [
-            (30, 50, "Pos."),
-            (60, 180, "Design"),
-            (250, 40, "Size"),
-            (300, 40, "Color"),
-            (350, 40, "Quantity"),
-            (400, 30, "QU"),
-            (450, 40, "Price"),
-            (500, 60, "Amount\n(EUR)")
+
+        canvas.setStrokeColor(GREY)
+        canvas.setLineWidth(0.5)
+        canvas.line(MARGIN_SIDE, y, right, y)
+
+        total, net, gross = self.format_totals(invoice)
+        rows = [
+            ("Value of Goods:", total, self.font_bold),
+            ("Transport Charge:", TRANSPORT_CHARGE, self.font_name),
+            ("value of invoice net:", net, self.font_bold),
+            ("value of invoice gross / final amount:", gross, self.font_bold)
         ]
-        
-        # Рисуем линию над заголовками
-        canvas.line(25, y_position + 15, width - 25, y_position + 15)
-        
-        # Отрисовка заголовков с подчеркиванием
-        for x, width_col, text in headers:
-            # Многострочный текст
-            if '\n' in text:
-                lines = text.split('\n')
-                canvas.drawString(x, y_position + 5, lines[0])
-                canvas.drawString(x, y_position - 5, lines[1])
-            else:
-                canvas.drawString(x, y_position, text)
-            
-            # Подчеркивание
-            canvas.line(x, y_position - 2, x + width_col, y_position - 2)
-        
-        # Рисуем линию под заголовками
-        canvas.line(25, y_position - 10, width - 25, y_position - 10)
-
-    def draw_product_line(self, canvas, y, product):
-        """Отрисовка строки с информацией о товаре."""
-        if y < 50:  # Проверка на достижение нижней границы страницы
-            return y
-            
+        for label, value, font in rows:
+            y -= 13
+            self.draw_right(canvas, label_x, y, label, font, 9)
+            self.draw_right(canvas, right, y, str(value), font, 9)
+
+        y -= 30
+        canvas.setFont(self.font_bold, 9)
+        canvas.drawString(MARGIN_SIDE, y, "Terms of Delivery")
         canvas.setFont(self.font_name, 9)
-        
-        # Позиции колонок (соответствуют заголовкам)
-        positions = {
-            'pos': 30,
-            'design': 60,
-            'size': 250,
-            'color': 300,
-            'quantity': 350,
-            'qu': 400,
-            'price': 450,
-            'amount': 500
-        }
-        
-        # Отрисовка значений
-        canvas.drawString(positions['pos'], y, str(product.get('pos', '')))
-        
-        # Design может быть длинным, нужно переносить по словам
-        design_text = str(product.get('design', ''))
-        if len(design_text) > 30:  # Если текст длинный
-            words = design_text.split()
-            line1 = []
-            line2 = []
-            current_line = line1
-            current_length = 0
-            
-            for word in words:
-                if current_length + len(word) + 1 <= 30:
-                    current_line.append(word)
-                    current_length += len(word) + 1
-                else:
-                    current_line = line2
-                    current_line.append(word)
-                    current_length = len(word) + 1
-            
-            canvas.drawString(positions['design'], y, ' '.join(line1))
-            if line2:
-                canvas.drawString(positions['design'], y - 10, ' '.join(line2))
-        else:
-            canvas.drawString(positions['design'], y, design_text)
-        
-        canvas.drawString(positions['size'], y, str(product.get('size', '')))
-        canvas.drawString(positions['color'], y, str(product.get('color', '')))
-        
-        # Выравнивание чисел по правому краю
-        quantity = str(product.get('quantity', ''))
-        qu = str(product.get('qu', ''))
-        price = str(product.get('price', ''))
-        amount = str(product.get('amount', ''))
-        
-        canvas.drawRightString(positions['quantity'] + 35, y, quantity)
-        canvas.drawString(positions['qu'], y, qu)
-        canvas.drawRightString(positions['price'] + 35, y, price)
-        canvas.drawRightString(positions['amount'] + 55, y, amount)
-        
-        # Если был перенос в design, возвращаем позицию с учетом второй строки
-        if len(design_text) > 30:
-            return y - 22  # Дополнительное место для второй строки
-        return y - 12  # Стандартный отступ между строками
-
-    def render_page(self, canvas, width, height, data, page_number, total_pages):
+        for line in ("Post", "FCA (Free Carrier) as per INCOTERMS 2010"):
+            y -= 11
+            canvas.drawString(MARGIN_SIDE + 15, y, line)
+        return y
+
+    def draw_page_number(self, canvas, width, page_number, total_pages):
+        """Номер страницы в нижнем поле справа, как @bottom-right в HTML-шаблоне."""
+        canvas.setFillColor(GREY)
+        self.draw_right(canvas, width - MARGIN_SIDE, MARGIN_BOTTOM / 2, f"Page {page_number} fr. {total_pages}",
+                        self.font_name, 7)
+        canvas.setFillColor(black)
+
+    def render_page(self, canvas, width, height, invoice, page, total_pages):
         """Отрисовка одной страницы документа."""
-        # Обновляем номер страницы в данных
-        data["PAGE"] = str(page_number)
-        data["TOTAL_PAGES"] = str(total_pages)
-        
-        self.draw_header(canvas, width, height, data)
-        
-        if page_number == 1:
+        y = self.draw_header(canvas, width, height, invoice)
+        if page.is_first:
             # Информация о доставке только на первой странице
-            y_position = self.draw_shipping_info(canvas, width, height, data)
-        else:
-            y_position = height - 100
-            
-        self.draw_table_header(canvas, width, height, y_position)
-        
-        # Отрисовка товаров
-        y = y_position - 30
-        products = data.get("products", [])
-        start_idx = (page_number - 1) * 10  # 10 товаров на страницу
-        end_idx = min(start_idx + 10, len(products))
-        
-        for product in products[start_idx:end_idx]:
-            y = self.draw_product_line(canvas, y, product)
-            if y < 50:  # Если достигли нижней границы страницы
-                break
+            y = self.draw_shipping_info(canvas, y, invoice)
 
-    def render(self, data: dict = None, output_path: str = "../data/output/template_invoice.pdf"):
-        """Генерация PDF-документа."""
-        if data is None:
-            data = {}
-            
+        if page.items:
+            y = self.draw_table_header(canvas, width, y)
+            for item in page.items:
+                y = self.draw_product_line(canvas, y, item)
+
+        if page.has_totals:
+            self.draw_totals(canvas, width, y, invoice)
+
+        self.draw_page_number(canvas, width, page.number, total_pages)
+
+    def render_invoice(self, invoice, output_path):
+        """Render a prepared Invoice (utils.invoice_model) to PDF."""
+        c = canvas.Canvas(output_path, pagesize=A4)
+        width, height = A4
+
+        self.define_forms(c, width, height, invoice)
+        planned = self.plan_pages(invoice)
+        for page in planned:
+            self.render_page(c, width, height, invoice, page, len(planned))
+            c.showPage()
+
+        c.save()
+        return output_path
+
+    def render_bundle(self, invoices, output_path, index_path=None):
+        """Render many invoices into one PDF with an outline entry per invoice.
+
+        Fonts, the logo and the table header form are embedded once for the
+        whole bundle. A JSON sidecar with the page range of every invoice is
+        written next to the PDF (utils.pdf_bundle). Returns the sidecar path.
+        """
         c = canvas.Canvas(output_path, pagesize=A4)
         width, height = A4
-        
-        # Определяем количество страниц
-        products = data.get("products", [])
-        total_pages = (len(products) + 9) // 10  # 10 товаров на страницу
-        if total_pages == 0:
-            total_pages = 1
-            
-        # Генерируем страницы
-        for page in range(1, total_pages + 1):
-            self.render_page(c, width, height, data, page, total_pages)
-            if page < total_pages:
-                c.showPage()  # Новая страница
-                
+        index = BundleIndex(output_path)
+
+        for number, data in enumerate(invoices, 1):
+            invoice = as_invoice(data)
+            self.define_forms(c, width, height, invoice)
+            planned = self.plan_pages(invoice)
+
+            # Закладка на первой странице инвойса
+            key = f"invoice_{number}"
+            c.bookmarkPage(key)
+            c.addOutlineEntry(outline_title(invoice, number), key, level=0)
+            for page in planned:
+                self.render_page(c, width, height, invoice, page, len(planned))
+                c.showPage()
+            index.add(invoice.invoice_number, len(planned))
+
+        if not index.entries:
+            raise ValueError("No invoices to bundle")
+        c.showOutline()
         c.save()
-        print(f"PDF template saved to {output_path}")
-        print(f"Using font: {self.font_name}") 
\ No newline at end of file
+        return index.write(index_path)
+
+    def render(self, data: dict = None, output_path: str = "../data/output/template_invoice.pdf"):
+        """Генерация PDF-документа из Invoice или словаря (ключи в верхнем регистре + products)."""
+        self.render_invoice(as_invoice(data), output_path)
+        logger.debug("PDF template saved to %s (font %s)", output_path, self.font_name)
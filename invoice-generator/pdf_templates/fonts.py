@@ -0,0 +1,149 @@
+"""
+Process-wide font registry for ReportLab templates.
+
+Each TTF file is parsed and registered with pdfmetrics once per process;
+repeated calls return the already registered fonts. Glyph-width tables are
+extracted once per font, so text measurement does not go through ReportLab
+metrics lookups on every call. Standard PDF fonts (e.g. Helvetica, metric
+compatible with the Arial of the HTML templates) can be measured without
+registration. ``preload()`` is meant for pool worker initializers.
+"""
+
+import os
+import threading
+from functools import lru_cache
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+FONT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fonts'))
+
+# Используем шрифт Liberation Serif (свободная замена Times New Roman)
+REGULAR = ('LiberationSerif', 'LiberationSerif-Regular.ttf')
+BOLD = ('LiberationSerif-Bold', 'LiberationSerif-Bold.ttf')
+# Стандартные шрифты PDF, если файлы Liberation не найдены
+FALLBACK = ('Helvetica', 'Helvetica-Bold')
+
+_lock = threading.Lock()
+_fonts = None
+# Имя шрифта -> (ширины глифов по коду символа в 1/1000 em, ширина по умолчанию)
+_width_tables = {}
+
+
+class FontSet:
+    """Registered regular/bold font names and the files they were loaded from."""
+
+    __slots__ = ('regular', 'bold', 'files')
+
+    def __init__(self, regular, bold, files):
+        self.regular = regular
+        self.bold = bold
+        self.files = files
+
+
+def register_fonts():
+    """Register the template fonts once per process and return the FontSet."""
+    global _fonts
+    with _lock:
+        if _fonts is not None:
+            return _fonts
+
+        regular_path = os.path.join(FONT_DIR, REGULAR[1])
+        bold_path = os.path.join(FONT_DIR, BOLD[1])
+        if os.path.exists(regular_path) and os.path.exists(bold_path):
+            for (name, _), path in ((REGULAR, regular_path), (BOLD, bold_path)):
+                # Шрифт мог быть зарегистрирован в этом процессе другим кодом
+                if name not in pdfmetrics.getRegisteredFontNames():
+                    pdfmetrics.registerFont(TTFont(name, path))
+            _fonts = FontSet(REGULAR[0], BOLD[0], [regular_path, bold_path])
+        else:
+            print("Warning: Liberation fonts not found, using system fonts")
+            _fonts = FontSet(FALLBACK[0], FALLBACK[1], [])
+        return _fonts
+
+
+def _width_table(font_name):
+    """Return the cached (widths by code point, default width) table of a font."""
+    table = _width_tables.get(font_name)
+    if table is None:
+        font = pdfmetrics.getFont(font_name)
+        if isinstance(font, TTFont):
+            table = (dict(font.face.charWidths), font.face.defaultWidth)
+        else:
+            # Type 1 шрифт: ширины заданы для 256 символов кодировки; остальные
+            # символы (например, кириллица) считаются шириной средней буквы
+            widths = {code: width for code, width in enumerate(font.widths)}
+            table = (widths, widths[ord('n')])
+        _width_tables[font_name] = table
+    return table
+
+
+@lru_cache(maxsize=8192)
+def string_width(text, font_name, size):
+    """Width of text in points, memoized per (text, font, size)."""
+    widths, default = _width_table(font_name)
+    return sum(widths.get(ord(char), default) for char in text) * size / 1000
+
+
+@lru_cache(maxsize=16384)
+def wrap_text(text, font_name, size, width, break_words=True):
+    """Word-wrap text to width points; returns a tuple of lines (at least one).
+
+    Glyph advances come from the cached width table and every character is
+    measured once, so no per-candidate stringWidth calls are made. Results are
+    memoized: collection names repeat across rows and invoices. A word wider
+    than the line is split between characters, or left to overflow with
+    ``break_words=False`` (as a browser does).
+    """
+    widths, default = _width_table(font_name)
+    # Ширина строки в единицах 1/1000 em, чтобы не масштабировать каждый глиф
+    limit = width * 1000 / size
+    space = widths.get(32, default)
+
+    lines = []
+    line = []
+    used = 0
+    for word in text.split():
+        word_width = 0
+        for char in word:
+            word_width += widths.get(ord(char), default)
+
+        if line and used + space + word_width <= limit:
+            line.append(word)
+            used += space + word_width
+            continue
+        if line:
+            lines.append(' '.join(line))
+
+        if break_words and word_width > limit:
+            # Длинное слово режется по символам
+            start = 0
+            word_width = 0
+            for index, char in enumerate(word):
+                char_width = widths.get(ord(char), default)
+                if word_width + char_width > limit and index > start:
+                    lines.append(word[start:index])
+                    start = index
+                    word_width = 0
+                word_width += char_width
+            word = word[start:]
+
+        line = [word]
+        used = word_width
+
+    if line:
+        lines.append(' '.join(line))
+    return tuple(lines) or ('',)
+
+
+def line_count(text, font_name, size, width):
+    """Number of lines text takes in a table cell of width points (HTML wrapping)."""
+    return len(wrap_text(str(text), font_name, size, width, break_words=False))
+
+
+def preload():
+    """Register fonts and build width tables (call in pool worker initializers)."""
+    fonts = register_fonts()
+    for name in (fonts.regular, fonts.bold):
+        _width_table(name)
+    return fonts
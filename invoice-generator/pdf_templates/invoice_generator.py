@@ -7,9 +7,12 @@ using WeasyPrint for PDF conversion.
 import os
 from pathlib import Path
 from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML, CSS
-from weasyprint.text.fonts import FontConfiguration
-import math
+from weasyprint import HTML
+
+from templates.invoice.generator import HTML_LAYOUT, html_item_height
+from utils.pdf_utils import get_asset_bundle, get_css, get_font_config
+from utils.invoice_model import as_invoice, format_date
+from utils.pagination import plan_pages
 
 
 class FeilerInvoiceGenerator:
@@ -19,7 +22,8 @@ class FeilerInvoiceGenerator:
         """Initialize the generator with templates and fonts configuration."""
         self.base_dir = Path(__file__).parent.parent
         self.template_dir = self.base_dir / "data" / "output_html"
-        self.font_config = FontConfiguration()
+        self.font_config = get_font_config()
+        self.assets = get_asset_bundle()
         
         # Setup Jinja2 environment
         self.env = Environment(
@@ -30,60 +34,46 @@ class FeilerInvoiceGenerator:
         # Load CSS
         self.css_path = self.template_dir / "styles.css"
         
-        # Количество товаров на первой и последующих страницах
-        self.products_per_first_page = 8
-        self.products_per_page = 12
-        
     def _prepare_data(self, data):
         """Prepare data for template rendering."""
-        prepared_data = data.copy() if data else {}
-        
-        # Convert newlines in addresses to HTML breaks
-        if "CUSTOMER_FULL_ADDRESS" in prepared_data:
-            prepared_data["CUSTOMER_FULL_ADDRESS_HTML"] = prepared_data["CUSTOMER_FULL_ADDRESS"].replace("\n", "<br>")
-        if "SHIPPING_ADDRESS" in prepared_data:
-            prepared_data["SHIPPING_ADDRESS_HTML"] = prepared_data["SHIPPING_ADDRESS"].replace("\n", "<br>")
+        invoice = as_invoice(data)
+        
+        # Переменные шаблона строятся из модели инвойса, без копирования входных данных
+        prepared_data = {
+            "SENDER": invoice.sender,
+            "CUSTOMER_FULL_ADDRESS_HTML": "<br>".join(line for line in invoice.recipient.lines() if line),
+            "SHIPPING_ADDRESS_HTML": "<br>".join(line for line in invoice.ship_to.lines() if line),
+            "DATE": format_date(invoice.invoice_date),
+            "CUSTOMER_NO": invoice.customer_number,
+            "INVOICE_NO": invoice.invoice_number,
+            "ORDER": invoice.order,
+            "AGENT": invoice.agent,
+            "SELLER": invoice.seller,
+            "CONTACT": invoice.contact,
+            "VAT_INFO": invoice.vat_info,
+            "CORRESPONDENCE": invoice.correspondence_text(),
+            "DELIVERY_NOTE": invoice.delivery_text()
+        }
             
-        # Разделяем товары на страницы
-        products = prepared_data.get("products", [])
-        
-        # Товары для первой страницы
-        first_page_products = products[:self.products_per_first_page]
-        remaining_products = products[self.products_per_first_page:]
+        # Разбиваем товары на страницы по измеренной высоте строк (та же разметка, что у InvoiceGenerator)
+        planned = plan_pages(invoice.items, HTML_LAYOUT, html_item_height, totals=False)
         
         # Генерируем HTML для первой страницы
         first_page_html = []
-        for product in first_page_products:
+        for product in planned[0].items:
             row = self._generate_product_row(product)
             first_page_html.append(row)
         prepared_data["FIRST_PAGE_PRODUCTS"] = "\n".join(first_page_html)
         
         # Генерируем последующие страницы
-        if remaining_products:
-            subsequent_pages = []
-            total_remaining = len(remaining_products)
-            num_subsequent_pages = math.ceil(total_remaining / self.products_per_page)
-            
-            for page_num in range(num_subsequent_pages):
-                start_idx = page_num * self.products_per_page
-                end_idx = start_idx + self.products_per_page
-                page_products = remaining_products[start_idx:end_idx]
-                
-                # Генерируем HTML для страницы
-                page_html = self._generate_subsequent_page(
-                    page_products,
-                    page_num + 2,  # +2 потому что первая страница уже есть
-                    len(products)
-                )
-                subsequent_pages.append(page_html)
-            
-            prepared_data["SUBSEQUENT_PAGES"] = "\n".join(subsequent_pages)
-        else:
-            prepared_data["SUBSEQUENT_PAGES"] = ""
+        subsequent_pages = []
+        for page in planned[1:]:
+            page_html = self._generate_subsequent_page(page.items, page.number, len(invoice.items))
+            subsequent_pages.append(page_html)
+        prepared_data["SUBSEQUENT_PAGES"] = "\n".join(subsequent_pages)
             
         # Общее количество страниц
-        total_pages = 1 + math.ceil(max(0, len(products) - self.products_per_first_page) / self.products_per_page)
-        prepared_data["TOTAL_PAGES"] = str(total_pages)
+        prepared_data["TOTAL_PAGES"] = str(len(planned))
             
         return prepared_data
         
@@ -91,14 +81,14 @@ class FeilerInvoiceGenerator:
         """Generate HTML for a single product row."""
         return f"""
         <tr>
-            <td class="pos">{product.get('pos', '')}</td>
-            <td class="design">{product.get('design', '')}</td>
-            <td class="size">{product.get('size', '')}</td>
-            <td class="color">{product.get('color', '')}</td>
-            <td class="quantity">{product.get('quantity', '')}</td>
-            <td class="qu">{product.get('qu', '')}</td>
-            <td class="price">{product.get('price', '')}</td>
-            <td class="amount">{product.get('amount', '')}</td>
+            <td class="pos">{product.position}</td>
+            <td class="design">{product.design}</td>
+            <td class="size">{product.size}</td>
+            <td class="color">{product.color}</td>
+            <td class="quantity">{product.quantity}</td>
+            <td class="qu">{product.unit}</td>
+            <td class="price">{product.price}</td>
+            <td class="amount">{product.amount}</td>
         </tr>
         """
         
@@ -152,52 +142,82 @@ class FeilerInvoiceGenerator:
     </div>
     """
         
-    def generate_html(self, data, output_path):
-        """Generate HTML invoice from template and data."""
+    def render_html(self, data, output_path):
+        """Render HTML invoice from template and data without writing it to disk."""
         template = self.env.get_template("template.html")
         prepared_data = self._prepare_data(data)
         
         # Add paths for resources
         output_path = Path(output_path)
         css_rel_path = os.path.relpath(self.template_dir / "styles.css", output_path.parent)
-        logo_rel_path = os.path.relpath(self.base_dir / "data" / "sample" / "logo_feiler.png", output_path.parent)
         
         prepared_data["CSS_PATH"] = css_rel_path.replace("\\", "/")
-        prepared_data["LOGO_PATH"] = logo_rel_path.replace("\\", "/")
+        prepared_data["LOGO_PATH"] = self.assets.url("invoice/logo")
         
         # Render HTML
-        html_content = template.render(**prepared_data)
+        return template.render(**prepared_data)
         
-        # Save HTML file
+    def _write_html(self, html_content, output_path):
+        """Save rendered HTML to disk."""
+        output_path = Path(output_path)
         output_path.parent.mkdir(parents=True, exist_ok=True)
         output_path.write_text(html_content, encoding='utf-8')
         
         print(f"HTML invoice generated: {output_path}")
         return output_path
         
-    def generate_pdf(self, html_path, pdf_path, base_url=None):
-        """Generate PDF from HTML using WeasyPrint."""
+    def generate_html(self, data, output_path):
+        """Generate HTML invoice from template and data."""
+        html_content = self.render_html(data, output_path)
+        return self._write_html(html_content, output_path)
+        
+    def generate_pdf(self, html_path, pdf_path, base_url=None, html_content=None):
+        """Generate PDF from HTML using WeasyPrint.
+        
+        If html_content is given, the PDF is rendered straight from the string and
+        html_path is only used to resolve relative resource links.
+        """
         html_path = Path(html_path)
         pdf_path = Path(pdf_path)
         pdf_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Load CSS
-        css = CSS(filename=str(self.css_path), font_config=self.font_config)
+        # Разобранный CSS берется из общего кэша процесса
+        css = get_css(self.css_path)
+        
+        if html_content is not None:
+            # Относительные пути в HTML считаются от места, где лежал бы HTML-файл
+            document = HTML(
+                string=html_content,
+                base_url=base_url or str(html_path),
+                url_fetcher=self.assets.url_fetcher
+            )
+        else:
+            document = HTML(filename=str(html_path), base_url=base_url, url_fetcher=self.assets.url_fetcher)
         
         # Convert to PDF
-        HTML(filename=str(html_path), base_url=base_url).write_pdf(
+        document.write_pdf(
             str(pdf_path),
             stylesheets=[css],
-            font_config=self.font_config
+            font_config=self.font_config,
+            cache=self.assets.image_cache
         )
         
         print(f"PDF invoice generated: {pdf_path}")
         return pdf_path
         
-    def generate_both(self, data, html_path, pdf_path, base_url=None):
-        """Generate both HTML and PDF versions of the invoice."""
-        html_path = self.generate_html(data, html_path)
-        pdf_path = self.generate_pdf(html_path, pdf_path, base_url)
+    def generate_both(self, data, html_path, pdf_path, base_url=None, persist_html=True):
+        """Generate both HTML and PDF versions of the invoice.
+        
+        The rendered HTML goes to WeasyPrint in memory and is written to
+        html_path only if persist_html is true.
+        """
+        html_content = self.render_html(data, html_path)
+        pdf_path = self.generate_pdf(html_path, pdf_path, base_url, html_content=html_content)
+        
+        if not persist_html:
+            return None, pdf_path
+        
+        html_path = self._write_html(html_content, html_path)
         return html_path, pdf_path
         
     def generate_template(self, html_path, pdf_path):
@@ -5,14 +5,20 @@ Exports and anonymizes data from the database.
 """
 
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import text
 from faker import Faker
-import configparser
 from pathlib import Path
 import random
+import sys
 import logging
 from datetime import datetime
 
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.db_bulk import bulk_update
+from utils.db import get_engine
+
 def setup_logging():
     """Setup logging configuration."""
     log_dir = Path(__file__).parent.parent / 'logs'
@@ -31,30 +37,6 @@ def setup_logging():
     )
     return logging.getLogger(__name__)
 
-def get_db_connection():
-    """Create database connection from config file."""
-    config = configparser.ConfigParser()
-    config_path = Path(__file__).parent.parent / 'config' / 'database.ini'
-    
-    if not config_path.exists():
-        raise FileNotFoundError(
-            f"Database configuration file not found at {config_path}. "
-            "Please copy database.ini.example to database.ini and update with your credentials."
-        )
-    
-    config.read(config_path)
-    
-    if 'postgresql' not in config:
-        raise KeyError("PostgreSQL configuration section not found in config file")
-    
-    db_params = config['postgresql']
-    
-    connection_string = (
-        f"postgresql+psycopg2://{db_params['user']}:{db_params['password']}"
-        f"@{db_params['host']}:{db_params['port']}/{db_params['database']}"
-    )
-    return create_engine(connection_string)
-
 def load_product_types():
     """Load multilingual product types from file."""
     logger = logging.getLogger(__name__)
@@ -150,8 +132,7 @@ def update_product_types(connection, product_data):
         stats = {
             'total': total_records,
             'updated': 0,
-            'skipped': 0,
-            'errors': 0
+            'skipped': 0
         }
         
         if len(product_data) < total_records:
@@ -164,54 +145,45 @@ def update_product_types(connection, product_data):
         random.shuffle(product_data)
         logger.info("Starting records update...")
         
+        rows = []
         for record_id, base_name in existing_records.items():
-            try:
-                # Берем случайный набор переводов из product_data
-                translations = product_data[record_id % len(product_data)]
-                
-                connection.execute(
-                    text("""
-                        UPDATE producttypes 
-                        SET base_name_fr = :base_name_fr,
-                            base_name_de = :base_name_de,
-                            base_name_it = :base_name_it,
-                            base_name_uk = :base_name_uk
-                        WHERE id = :id
-                    """),
-                    {
-                        "base_name_fr": translations['base_name_fr'],
-                        "base_name_de": translations['base_name_de'],
-                        "base_name_it": translations['base_name_it'],
-                        "base_name_uk": translations['base_name_uk'],
-                        "id": record_id
-                    }
-                )
-                stats['updated'] += 1
-                
-                if stats['updated'] % 50 == 0:
-                    logger.info(f"Progress: {stats['updated']}/{total_records} records updated ({(stats['updated']/total_records*100):.1f}%)")
-                
-                # Логируем первые несколько обновлений для проверки
-                if stats['updated'] <= 5:
-                    logger.info(f"\nExample update (record {record_id}):")
-                    logger.info(f"Original base_name: {base_name}")
-                    logger.info(f"Added translations:")
-                    logger.info(f"- French:    {translations['base_name_fr']}")
-                    logger.info(f"- German:    {translations['base_name_de']}")
-                    logger.info(f"- Italian:   {translations['base_name_it']}")
-                    logger.info(f"- Ukrainian: {translations['base_name_uk']}")
-                
-            except Exception as e:
-                logger.error(f"Error updating record {record_id}: {str(e)}")
-                stats['errors'] += 1
-                continue
+            # Берем случайный набор переводов из product_data
+            translations = product_data[record_id % len(product_data)]
+            rows.append((
+                record_id,
+                translations['base_name_fr'],
+                translations['base_name_de'],
+                translations['base_name_it'],
+                translations['base_name_uk']
+            ))
+            
+            # Логируем первые несколько обновлений для проверки
+            if len(rows) <= 5:
+                logger.info(f"\nExample update (record {record_id}):")
+                logger.info(f"Original base_name: {base_name}")
+                logger.info(f"Added translations:")
+                logger.info(f"- French:    {translations['base_name_fr']}")
+                logger.info(f"- German:    {translations['base_name_de']}")
+                logger.info(f"- Italian:   {translations['base_name_it']}")
+                logger.info(f"- Ukrainian: {translations['base_name_uk']}")
+        
+        def report(done, total):
+            logger.info(f"Progress: {done}/{total} records updated ({(done/total*100):.1f}%)")
+        
+        # Один UPDATE ... FROM (VALUES ...) на пачку записей
+        result = bulk_update(
+            connection, 'producttypes', 'id',
+            ['base_name_fr', 'base_name_de', 'base_name_it', 'base_name_uk'], rows,
+            progress=report
+        )
+        stats['updated'] = result.matched
+        stats['skipped'] = result.unmatched
         
         # Финальная статистика
         logger.info("\nUpdate completed. Statistics:")
         logger.info(f"- Total records processed: {stats['total']}")
         logger.info(f"- Successfully updated: {stats['updated']}")
         logger.info(f"- Skipped: {stats['skipped']}")
-        logger.info(f"- Errors: {stats['errors']}")
         
         # Проверка результатов
         logger.info("\nVerifying updates...")
@@ -237,7 +209,7 @@ def main():
     logger.info("Starting data preparation process")
     
     try:
-        engine = get_db_connection()
+        engine = get_engine()
         logger.info("Database connection established")
         
         with engine.begin() as connection:
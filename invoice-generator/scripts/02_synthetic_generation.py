@@ -1,23 +1,82 @@
 #!/usr/bin/env python3
 """
 Synthetic data generation script.
-Generates additional synthetic data based on anonymized data patterns.
+Generates synthetic invoices from the distribution model of the source data
+(scripts/profile_distributions.py) and writes them as columnar batches.
+
+Usage: python 02_synthetic_generation.py [<invoices>] [--seed <n>] [--batch-size <n>]
+                                         [--model <path>] [--render <n>]
+    <invoices>        number of invoices to sample (default: 10000)
+    --render <n>      also render the first n invoices to PDF (ReportLab backend)
 """
 
-import pandas as pd
-import numpy as np
-from faker import Faker
+import os
+import sys
+import time
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.distribution_model import DistributionModel
+from utils.synthetic import DEFAULT_BATCH_SIZE, SyntheticSampler, load_colors
+
+OUTPUT_DIR = Path(__file__).parent.parent / 'data' / 'synthetic' / 'batches'
+
+def option(name, default=None):
+    """Value following a command line option, or default."""
+    if name in sys.argv:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+def generate_synthetic_data(invoice_count=10000, seed=0, batch_size=DEFAULT_BATCH_SIZE, model_path=None,
+                            output_dir=OUTPUT_DIR):
+    """Sample synthetic invoices in batches and save them as .npz files; returns the batch paths."""
+    model = DistributionModel.load(model_path)
+    sampler = SyntheticSampler(model, load_colors(), seed=seed)
+
+    paths = []
+    line_count = 0
+    sampling_time = 0.0
+    started = time.perf_counter()
+    for batch_index, batch in enumerate(sampler.iter_batches(invoice_count, batch_size)):
+        # Время выборки: от конца записи предыдущей порции до готовой порции
+        sampling_time += time.perf_counter() - started
+        line_count += int(batch.items.offsets[-1])
+        paths.append(batch.save(Path(output_dir) / f'batch_{batch_index:05d}.npz'))
+        started = time.perf_counter()
+
+    rate = line_count / sampling_time if sampling_time else 0.0
+    print(f"Sampled {invoice_count} invoices, {line_count} line items in {sampling_time:.2f}s "
+          f"({rate / 1e6:.2f}M line items/s)")
+    return paths
+
+def render_invoices(batch_path, count):
+    """Render the first count invoices of a saved batch with the ReportLab backend."""
+    from templates.invoice.feiler.generator import FeilerInvoiceGenerator
+    from utils.synthetic import SyntheticBatch
 
-def generate_synthetic_data():
-    """Generate synthetic data based on patterns from real data."""
-    # TODO: Implement synthetic data generation logic
-    pass
+    batch = SyntheticBatch.load(batch_path)
+    invoices = [batch.invoice(index) for index in range(min(count, len(batch)))]
+    out_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'output')
+    # Синтетические инвойсы уже обезличены: замена шапки только исказила бы выборку
+    return FeilerInvoiceGenerator(backend='reportlab').generate_many(invoices, out_dir, anonymize=False)
 
 def main():
     """Main function for synthetic data generation."""
     print("Starting synthetic data generation...")
-    generate_synthetic_data()
+    args = [arg for index, arg in enumerate(sys.argv[1:], 1)
+            if not arg.startswith('--') and not sys.argv[index - 1].startswith('--')]
+    paths = generate_synthetic_data(
+        invoice_count=int(args[0]) if args else 10000,
+        seed=int(option('--seed', 0)),
+        batch_size=int(option('--batch-size', DEFAULT_BATCH_SIZE)),
+        model_path=option('--model')
+    )
+    if "--render" in sys.argv and paths:
+        for html_path, pdf_path in render_invoices(paths[0], int(option('--render'))):
+            print(f"Rendered {pdf_path}")
     print("Synthetic data generation completed.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
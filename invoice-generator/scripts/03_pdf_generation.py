@@ -13,6 +13,8 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from pdf_templates.feiler_template import FeilerInvoiceTemplate
+from utils.invoice_model import as_invoice
+from utils.render_cache import RenderCache
 
 def generate_pdfs():
     """Generate PDF documents using templates."""
@@ -22,6 +24,7 @@ def generate_pdfs():
 def main():
     """Main function for PDF generation."""
     print("Starting PDF generation...")
+    use_cache = "--no-cache" not in sys.argv
     
     # Создаем директорию для выходных файлов, если её нет
     output_dir = Path(__file__).parent.parent / "data" / "output"
@@ -30,7 +33,17 @@ def main():
     # Генерируем шаблонный PDF
     template = FeilerInvoiceTemplate()
     output_path = output_dir / "template_invoice.pdf"
-    template.render(data=None, output_path=str(output_path))
+    
+    if use_cache:
+        cache = RenderCache()
+        key = template.cache_key(cache, as_invoice(None))
+        if cache.render(key, output_path, lambda path: template.render(data=None, output_path=path)):
+            print(f"PDF taken from render cache: {output_path}")
+        else:
+            print(f"PDF template saved to {output_path}")
+    else:
+        template.render(data=None, output_path=str(output_path))
+        print(f"PDF template saved to {output_path}")
     
     print("PDF generation completed.")
 
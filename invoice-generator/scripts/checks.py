@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+"""
+Runner for the script-style checks (scripts/test_*.py).
+
+A check file defines plain ``test_*`` functions with asserts, so pytest
+collects it as well; ``run_checks`` runs the same functions without pytest:
+
+    if __name__ == "__main__":
+        run_checks(globals())
+"""
+
+
+def run_checks(namespace):
+    """Run every test_* function of a check module in name order."""
+    tests = [value for name, value in sorted(namespace.items()) if name.startswith('test_') and callable(value)]
+    for test in tests:
+        test()
+        print(f"ok  {test.__name__}")
+    print(f"\n{len(tests)} checks passed")
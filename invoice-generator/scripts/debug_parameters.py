@@ -1,58 +1,51 @@
-import psycopg2
+import sys
+from pathlib import Path
 from psycopg2.extras import RealDictCursor
 
-def get_db_connection():
-    """Создает подключение к базе данных."""
-    return psycopg2.connect(
-        dbname="latest",
-        user="latest",
-        password="Ew0L3h3w1eV9r1g2",
-        host="188.165.228.146",
-        port="5441",
-        cursor_factory=RealDictCursor
-    )
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.db import connection, execute_prepared, prepare_statement
+
+# Атрибуты продукта в том же виде, что и в fetch_invoice_data.sql
+PRODUCT_ATTRIBUTES = prepare_statement('product_attributes', """
+    SELECT
+        p.id,
+        p.name,
+        p.sku,
+        COALESCE((
+            SELECT jsonb_object_agg(pa.attribute_name, pav.value)
+            FROM product_attribute_values pav
+            JOIN product_attributes pa ON pa.id = pav.attribute_id
+            WHERE pav.product_id = p.id
+        ), '{}'::jsonb) AS parameters
+    FROM products p
+    WHERE p.id = %s
+""")
 
 def debug_product_parameters(product_id):
     """Получает и выводит параметры продукта для отладки."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            # Получаем параметры продукта
-            cur.execute("""
-                SELECT 
-                    p.id,
-                    p.name,
-                    p.sku,
-                    get_product_attribute_values_only_string(p.id) AS parameters
-                FROM products p
-                WHERE p.id = %s
-            """, (product_id,))
-            
-            product = cur.fetchone()
-            if product:
-                print("\nИнформация о продукте:")
-                print(f"ID: {product['id']}")
-                print(f"Название: {product['name']}")
-                print(f"SKU: {product['sku']}")
-                print("\nПараметры (raw):")
-                print(f"Тип: {type(product['parameters'])}")
-                print(f"Значение: {repr(product['parameters'])}")
-                
-                if product['parameters']:
-                    print("\nПопытка разбора параметров:")
-                    try:
-                        params = dict(param.strip().split(': ') for param in product['parameters'].split(', '))
-                        print("Разобранные параметры:", params)
-                    except Exception as e:
-                        print(f"Ошибка при разборе параметров: {e}")
-            else:
-                print(f"Продукт с ID {product_id} не найден")
-            
-    finally:
-        conn.close()
+    with connection(RealDictCursor) as conn:
+        rows = execute_prepared(conn, PRODUCT_ATTRIBUTES, (product_id,))
+        
+    if rows:
+        product = rows[0]
+        print("\nИнформация о продукте:")
+        print(f"ID: {product['id']}")
+        print(f"Название: {product['name']}")
+        print(f"SKU: {product['sku']}")
+        print("\nПараметры (raw):")
+        print(f"Тип: {type(product['parameters'])}")
+        print(f"Значение: {repr(product['parameters'])}")
+        
+        if product['parameters']:
+            print("\nПараметры по ключам:")
+            for key, value in product['parameters'].items():
+                print(f"  {key}: {value}")
+    else:
+        print(f"Продукт с ID {product_id} не найден")
 
 if __name__ == '__main__':
-    import sys
     if len(sys.argv) != 2:
         print("Использование: python debug_parameters.py <product_id>")
         sys.exit(1)
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Script for exporting the tables used by invoice generation into a local
+SQLite snapshot (utils/snapshot.py).
+
+Usage: python export_snapshot.py [<snapshot_path>] [--full]
+    <snapshot_path>  snapshot file (default: data/snapshot/source.sqlite3)
+    --full           reload all tables instead of fetching rows above the watermarks
+"""
+
+import sys
+from pathlib import Path
+import logging
+from datetime import datetime
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.snapshot import DEFAULT_SNAPSHOT_PATH, SnapshotReader, export_snapshot
+
+def setup_logging():
+    """Setup logging configuration."""
+    log_dir = Path(__file__).parent.parent / 'logs'
+    log_dir.mkdir(exist_ok=True)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_file = log_dir / f'export_snapshot_{timestamp}.log'
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler()
+        ]
+    )
+    return logging.getLogger(__name__)
+
+def main():
+    """Main function for exporting the snapshot."""
+    logger = setup_logging()
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    snapshot_path = Path(args[0]) if args else DEFAULT_SNAPSHOT_PATH
+    full = "--full" in sys.argv
+
+    logger.info(f"{'Full export' if full else 'Incremental refresh'} of snapshot {snapshot_path}")
+    try:
+        export_snapshot(
+            snapshot_path, full=full,
+            progress=lambda table, rows: logger.info(f"{table}: fetched {rows} rows")
+        )
+
+        with SnapshotReader(snapshot_path) as reader:
+            for info in reader.table_info():
+                logger.info(f"{info['table_name']}: {info['row_count']} rows, watermark {info['watermark']}")
+
+        logger.info("Snapshot export completed successfully")
+
+    except Exception as e:
+        logger.error(f"Fatal error in main: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    main()
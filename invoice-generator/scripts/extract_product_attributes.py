@@ -2,14 +2,23 @@
 """
 Script for extracting unique attribute names from product_types_separated.txt
 and inserting them into product_attributes table.
+
+Usage: python extract_product_attributes.py [--with-values]
+    --with-values  also load product attribute values in the same run, reusing
+                   the name -> id map returned by the upsert
 """
 
-from sqlalchemy import create_engine, text
-import configparser
+from sqlalchemy import text
+import sys
 from pathlib import Path
 import logging
 from datetime import datetime
 
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.db import get_engine
+
 def setup_logging():
     """Setup logging configuration."""
     log_dir = Path(__file__).parent.parent / 'logs'
@@ -28,30 +37,6 @@ def setup_logging():
     )
     return logging.getLogger(__name__)
 
-def get_db_connection():
-    """Create database connection from config file."""
-    config = configparser.ConfigParser()
-    config_path = Path(__file__).parent.parent / 'config' / 'database.ini'
-    
-    if not config_path.exists():
-        raise FileNotFoundError(
-            f"Database configuration file not found at {config_path}. "
-            "Please copy database.ini.example to database.ini and update with your credentials."
-        )
-    
-    config.read(config_path)
-    
-    if 'postgresql' not in config:
-        raise KeyError("PostgreSQL configuration section not found in config file")
-    
-    db_params = config['postgresql']
-    
-    connection_string = (
-        f"postgresql+psycopg2://{db_params['user']}:{db_params['password']}"
-        f"@{db_params['host']}:{db_params['port']}/{db_params['database']}"
-    )
-    return create_engine(connection_string)
-
 def extract_attribute_names():
     """Extract unique attribute names from the file."""
     logger = logging.getLogger(__name__)
@@ -85,62 +70,67 @@ def extract_attribute_names():
     
     return sorted(list(attribute_names))
 
+def ensure_unique_index(connection):
+    """Create the unique index on attribute_name used by ON CONFLICT."""
+    connection.execute(text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS product_attributes_attribute_name_key
+        ON product_attributes (attribute_name)
+    """))
+
 def insert_attribute_names(connection, attribute_names):
-    """Insert unique attribute names into the database."""
+    """Insert unique attribute names into the database.
+    
+    One statement inserts the missing names and returns the ids of all given
+    names, new and existing. Returns the attribute name -> id map.
+    """
     logger = logging.getLogger(__name__)
     try:
         logger.info("Starting attribute names insertion process")
+        ensure_unique_index(connection)
+        
+        # RETURNING при ON CONFLICT DO NOTHING возвращает только вставленные строки,
+        # поэтому существующие атрибуты добираются из той же выборки имен
+        result = connection.execute(
+            text("""
+                WITH input AS (
+                    SELECT DISTINCT unnest(CAST(:names AS text[])) AS attribute_name
+                ),
+                inserted AS (
+                    INSERT INTO product_attributes (attribute_name)
+                    SELECT attribute_name FROM input
+                    ON CONFLICT (attribute_name) DO NOTHING
+                    RETURNING id, attribute_name
+                )
+                SELECT id, attribute_name, TRUE AS is_new FROM inserted
+                UNION ALL
+                SELECT a.id, a.attribute_name, FALSE
+                FROM product_attributes a
+                JOIN input USING (attribute_name)
+            """),
+            {"names": list(attribute_names)}
+        )
+        
+        attribute_map = {}
+        inserted = []
+        for attribute_id, attribute_name, is_new in result:
+            attribute_map[attribute_name] = attribute_id
+            if is_new:
+                inserted.append(attribute_name)
         
         # Статистика вставки
         stats = {
             'total': len(attribute_names),
-            'inserted': 0,
-            'skipped': 0,
-            'errors': 0
+            'inserted': len(inserted),
+            'skipped': len(attribute_map) - len(inserted)
         }
-        
-        # Вставляем названия атрибутов
-        for attribute_name in attribute_names:
-            try:
-                # Проверяем, существует ли уже такой атрибут
-                result = connection.execute(
-                    text("""
-                        SELECT id FROM product_attributes 
-                        WHERE attribute_name = :name
-                    """),
-                    {"name": attribute_name}
-                )
-                
-                if result.fetchone() is None:
-                    # Если атрибут не существует, вставляем его
-                    connection.execute(
-                        text("""
-                            INSERT INTO product_attributes (attribute_name)
-                            VALUES (:name)
-                        """),
-                        {"name": attribute_name}
-                    )
-                    stats['inserted'] += 1
-                    if stats['inserted'] <= 5:  # Показываем первые 5 вставок
-                        logger.info(f"Inserted attribute: {attribute_name}")
-                else:
-                    stats['skipped'] += 1
-                    logger.debug(f"Attribute already exists: {attribute_name}")
-                
-                if stats['inserted'] % 100 == 0:
-                    logger.info(f"Progress: {stats['inserted']}/{stats['total']} attributes inserted ({(stats['inserted']/stats['total']*100):.1f}%)")
-                
-            except Exception as e:
-                logger.error(f"Error inserting attribute {attribute_name}: {str(e)}")
-                stats['errors'] += 1
-                continue
+        for attribute_name in inserted[:5]:  # Показываем первые 5 вставок
+            logger.info(f"Inserted attribute: {attribute_name}")
         
         # Финальная статистика
         logger.info("\nInsertion completed. Statistics:")
         logger.info(f"- Total attributes to process: {stats['total']}")
         logger.info(f"- Successfully inserted: {stats['inserted']}")
         logger.info(f"- Skipped (already exist): {stats['skipped']}")
-        logger.info(f"- Errors: {stats['errors']}")
         
         # Проверка результатов
         logger.info("\nVerifying results...")
@@ -151,6 +141,8 @@ def insert_attribute_names(connection, attribute_names):
         total_attributes = result.fetchone()[0]
         logger.info(f"Total attributes in database: {total_attributes}")
         
+        return attribute_map
+        
     except Exception as e:
         logger.error(f"Error in insert_attribute_names: {str(e)}")
         raise
@@ -161,7 +153,7 @@ def main():
     logger.info("Starting attribute names extraction and insertion process")
     
     try:
-        engine = get_db_connection()
+        engine = get_engine()
         logger.info("Database connection established")
         
         with engine.begin() as connection:
@@ -171,7 +163,12 @@ def main():
             attribute_names = extract_attribute_names()
             logger.info(f"Extracted {len(attribute_names)} unique attribute names")
             
-            insert_attribute_names(connection, attribute_names)
+            attribute_map = insert_attribute_names(connection, attribute_names)
+            
+            if '--with-values' in sys.argv:
+                # Значения атрибутов загружаются в той же транзакции по уже полученной карте
+                from scripts.insert_product_attribute_values import process_product_types
+                process_product_types(connection, attribute_map=attribute_map)
             
         logger.info("Process completed successfully")
         
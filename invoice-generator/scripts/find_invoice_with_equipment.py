@@ -1,43 +1,46 @@
-import psycopg2
+import sys
+from pathlib import Path
 from psycopg2.extras import RealDictCursor
 
-def get_db_connection():
-    return psycopg2.connect(
-        dbname="latest",
-        user="latest",
-        password="Ew0L3h3w1eV9r1g2",
-        host="188.165.228.146",
-        port="5441",
-        cursor_factory=RealDictCursor
-    )
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
 
-def find_invoice_with_equipment():
-    conn = get_db_connection()
-    try:
+from utils.db import connection
+
+def find_invoice_with_equipment(attribute_name='Equipment'):
+    with connection(RealDictCursor) as conn:
         with conn.cursor() as cur:
+            # Поиск идет от атрибута по индексам (attribute_name, attribute_id, product_id),
+            # а не сканированием строк параметров всех позиций
             cur.execute("""
                 SELECT 
                     ii.id,
                     ii.created_date,
                     p.id as product_id,
-                    get_product_attributes_string_v2(p.id) AS parameters
-                FROM invoicesin ii
-                JOIN invoiceincontents iic ON ii.id = iic.invoice_in_id
-                JOIN products p ON iic.product_id = p.id
-                WHERE get_product_attributes_string_v2(p.id) LIKE '%Equipment%'
+                    attrs.attributes AS parameters
+                FROM product_attributes pa
+                JOIN product_attribute_values pav ON pav.attribute_id = pa.id
+                JOIN invoiceincontents iic ON iic.product_id = pav.product_id
+                JOIN invoicesin ii ON ii.id = iic.invoice_in_id
+                JOIN products p ON p.id = iic.product_id
+                CROSS JOIN LATERAL (
+                    SELECT jsonb_object_agg(a.attribute_name, v.value) AS attributes
+                    FROM product_attribute_values v
+                    JOIN product_attributes a ON a.id = v.attribute_id
+                    WHERE v.product_id = p.id
+                ) attrs
+                WHERE pa.attribute_name = %s
                 LIMIT 1
-            """)
+            """, (attribute_name,))
             result = cur.fetchone()
             if result:
-                print(f"\nНайден инвойс с параметром Equipment:")
+                print(f"\nНайден инвойс с параметром {attribute_name}:")
                 print(f"ID инвойса: {result['id']}")
                 print(f"Дата создания: {result['created_date']}")
                 print(f"ID продукта: {result['product_id']}")
                 print(f"Параметры: {result['parameters']}")
             else:
-                print("Инвойсы с параметром Equipment не найдены")
-    finally:
-        conn.close()
+                print(f"Инвойсы с параметром {attribute_name} не найдены")
 
 if __name__ == '__main__':
-    find_invoice_with_equipment() 
\ No newline at end of file
+    find_invoice_with_equipment(sys.argv[1] if len(sys.argv) > 1 else 'Equipment')
@@ -1,24 +1,21 @@
 import os
 import sys
 from datetime import datetime
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import random
 import string
+from itertools import groupby
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from templates.invoice.feiler.generator import FeilerInvoiceGenerator
+from utils.db import connection, execute_prepared, prepare_statement
+from utils.invoice_model import Address, Invoice, LineItem
+from utils.line_items import LineItemBatch
+from utils.render_cache import RenderCache
+from utils.snapshot import DEFAULT_SNAPSHOT_PATH, SnapshotReader
 
-def get_db_connection():
-    """Создает подключение к базе данных."""
-    return psycopg2.connect(
-        dbname="latest",
-        user="latest",
-        password="Ew0L3h3w1eV9r1g2",
-        host="188.165.228.146",
-        port="5441",
-        cursor_factory=RealDictCursor
-    )
+# Строк, которые именованный курсор передает клиенту за один запрос
+DEFAULT_ITERSIZE = 2000
 
 def read_sql_query(filename):
     """Читает SQL запрос из файла."""
@@ -36,13 +33,52 @@ def read_sql_query(filename):
                 lines.append(line.strip())
         return ' '.join(lines)
 
+# Строки одного инвойса: запрос разбирается и планируется один раз на соединение пула
+INVOICE_LINES = prepare_statement('invoice_lines', read_sql_query('fetch_invoice_data.sql'))
+
 def fetch_invoice_data(conn, invoice_id):
     """Получает данные инвойса из базы данных."""
-    query = read_sql_query('fetch_invoice_data.sql')
+    return execute_prepared(conn, INVOICE_LINES, (invoice_id,))
+
+def parse_invoice_selection(spec):
+    """Разбирает выбор инвойсов: 'all', диапазон '<first>-<last>' или список '<id>,<id>,...'.
+    
+    Возвращает (ids, first_id, last_id); None означает отсутствие ограничения.
+    """
+    if spec == 'all':
+        return None, None, None
+    if '-' in spec:
+        first_id, last_id = (int(part) for part in spec.split('-', 1))
+        if first_id > last_id:
+            raise ValueError(f"Пустой диапазон инвойсов: {spec}")
+        return None, first_id, last_id
+    return [int(part) for part in spec.split(',') if part.strip()], None, None
+
+def stream_invoices(conn, ids=None, first_id=None, last_id=None, itersize=DEFAULT_ITERSIZE):
+    """Выгружает инвойсы одним запросом и отдает их по одному: (invoice_id, строки).
+    
+    Строки читаются именованным (серверным) курсором порциями по itersize,
+    поэтому в памяти клиента находится одна порция и строки текущего инвойса,
+    независимо от размера выгрузки.
+    """
+    query = read_sql_query('fetch_invoices_data.sql')
+    params = {'ids': ids, 'first_id': first_id, 'last_id': last_id}
     
-    with conn.cursor() as cur:
-        cur.execute(query, (invoice_id,))
-        return cur.fetchall()
+    with conn.cursor(name='invoice_rows') as cur:
+        cur.itersize = itersize
+        cur.execute(query, params)
+        # Запрос упорядочен по инвойсу: группа заканчивается, когда меняется ID
+        for invoice_id, rows in groupby(cur, key=lambda row: row['invoice_in_number']):
+            yield invoice_id, list(rows)
+
+def invoice_stream(ids=None, first_id=None, last_id=None, itersize=DEFAULT_ITERSIZE, snapshot=None):
+    """Инвойсы выборки по одному: из локального снимка (snapshot) или из PostgreSQL."""
+    if snapshot:
+        with SnapshotReader(snapshot) as reader:
+            yield from reader.stream_invoices(ids, first_id, last_id)
+    else:
+        with connection(RealDictCursor) as conn:
+            yield from stream_invoices(conn, ids, first_id, last_id, itersize)
 
 def load_colors():
     """Загружает список цветов из файла."""
@@ -84,64 +120,37 @@ def get_random_color(colors):
         
     return color_id, color_name
 
-def parse_parameters(parameters_str):
-    """Разбирает строку параметров в формате <Key><Value>;<Key><Value>."""
-    # Возвращаем пустые значения, если параметры не указаны
-    if not parameters_str:
-        return "", "", ""
-    
-    print(f"\nПарсинг параметров:")
-    print(f"Исходная строка: {parameters_str}")
-    
-    # Инициализируем значения по умолчанию
-    size = ""
-    color = ""
-    color_id = ""
-    
-    # Разбиваем строку на отдельные параметры
-    params = parameters_str.split(';')
-    print(f"Разделенные параметры: {params}")
-    
-    for param in params:
-        # Извлекаем ключ и значение из формата <Key><Value>
-        if param and '<' in param and '>' in param:
-            parts = param.split('><')
-            if len(parts) == 2:
-                key = parts[0].strip('<')
-                value = parts[1].strip('>')
-                print(f"Найден параметр: {key} = {value}")
-                
-                # Определяем, куда записать значение
-                if key == 'Size':
-                    size = value
-                elif key == 'Color':
-                    color = value
-                elif key == 'ColorID':
-                    color_id = value
-    
-    print(f"Результат парсинга: size='{size}', color='{color}', color_id='{color_id}'")
-    return size, color, color_id
-
-def prepare_invoice_data(sql_data):
-    """Преобразует данные из SQL в формат для генератора инвойсов."""
+def prepare_invoice_data(sql_data, colors=None):
+    """Преобразует данные из SQL в модель инвойса (utils.invoice_model.Invoice)."""
     if not sql_data:
         raise ValueError("Нет данных для формирования инвойса")
         
     # Получаем первую запись для общей информации об инвойсе
     first_record = sql_data[0]
     
-    # Загружаем список цветов
-    colors = load_colors()
+    # Загружаем список цветов (в пакетном режиме он передается готовым)
+    if colors is None:
+        colors = load_colors()
     
     # Функция для генерации случайной строки
     def generate_random_string(length):
         chars = string.ascii_letters + string.digits + " "
         return ''.join(random.choice(chars) for _ in range(length))
     
+    # Цены и суммы считаются в целых центах и форматируются одним векторным проходом
+    line_items = LineItemBatch.from_records([sql_data])
+    prices = line_items.formatted_prices('de').tolist()
+    amounts = line_items.formatted_amounts('de').tolist()
+    amount_cents = line_items.amount_cents.tolist()
+    
     # Подготавливаем список товаров
     items = []
     for position, record in enumerate(sql_data, 1):
-        size, color, color_id = parse_parameters(record['parameters'])
+        # Атрибуты продукта приходят из запроса готовым JSON-объектом
+        parameters = record['parameters'] or {}
+        size = parameters.get('Size', '')
+        color = parameters.get('Color', '')
+        color_id = parameters.get('ColorID', '')
         
         # Если цвет не указан, выбираем случайный
         if not color or not color_id:
@@ -153,79 +162,69 @@ def prepare_invoice_data(sql_data):
         # Генерируем короткую строку для HS-Code с дополнительными 20 символами
         hs_code_text = "63029100 Chenille towels, 100% cotton " + generate_random_string(20)
         
-        # Формируем три строки для каждой позиции
-        item = {
-            'item_position': position,  # Номер позиции
-            'lines': [
-                {
-                    'is_bold': True,  # Первая строка всегда жирным шрифтом
-                    'content': {
-                        'collection': record['collection_name'].upper(),  # Преобразуем в верхний регистр
-                        'size': size,  # Размер из параметров
-                        'color_id': color_id,  # ID цвета
-                        'quantity': f"{record['quantity']} pcs",  # Количество
-                        'price': f"{float(record['purchase_price']):.2f}".replace('.', ','),  # Цена с форматированием
-                        'product_type': record['product_type_name']  # Тип продукта
-                    }
-                },
-                {
-                    'is_bold': False,  # Вторая строка обычным шрифтом
-                    'content': {
-                        'prefix': 'Article No.:',
-                        'value': record['product_sku'],  # Артикул
-                        'color': color  # Название цвета
-                    }
-                },
-                {
-                    'is_bold': False,  # Третья строка обычным шрифтом
-                    'content': {
-                        'prefix': 'HS-Code',
-                        'value': hs_code_text  # HS-Code с дополнительными символами
-                    }
-                }
-            ],
-            'amount': f"{float(record['item_amount']):.2f}".replace('.', ',')  # Сумма по позиции
-        }
-        items.append(item)
+        # Позиция: основная строка, артикул с цветом и HS-Code
+        items.append(LineItem(
+            position=position,
+            design=record['collection_name'].upper(),  # Преобразуем в верхний регистр
+            size=size,
+            color=color_id,
+            quantity=str(record['quantity']),
+            unit='pcs',
+            price=prices[position - 1],
+            amount=amounts[position - 1],  # Сумма по позиции (цена × количество)
+            amount_cents=amount_cents[position - 1],
+            color_name=color,
+            article_no=record['product_sku'],
+            hs_code=f"HS-Code: {hs_code_text}",
+            product_type=record['product_type_name']
+        ))
     
-    # Формируем данные для инвойса
-    invoice_data = {
-        'recipient_name': 'Home Sweet Home',
-        'recipient_street': 'Perekopskaya Street 123',
-        'recipient_postal_code': '73022',
-        'recipient_city': 'KHERSON',
-        'recipient_country': 'UKRAINE',
-        'invoice_date': first_record['invoice_date'],
-        'customer_number': '29060',
-        'invoice_number': str(first_record['invoice_in_number']),
-        'seller': 'Emanuel Baur Asien/Drittland',
-        'contact': 'Anja Konig',
-        'agent': '49112',
-        'order': '2069354',
-        'items': items,
-        'correspondence_number': '09-2024',
-        'correspondence_date': datetime.now(),
-        'correspondence_person': 'Tatjana Parygin',
-        'delivery_note_number': '4059965',
-        'delivery_date': datetime.now()
-    }
+    # Формируем инвойс: модель создается один раз и передается любому бэкенду
+    invoice_data = Invoice(
+        recipient=Address(
+            name='Home Sweet Home',
+            street='Perekopskaya Street 123',
+            postal_code='73022',
+            city='KHERSON',
+            country='UKRAINE'
+        ),
+        invoice_date=first_record['invoice_date'],
+        customer_number='29060',
+        invoice_number=str(first_record['invoice_in_number']),
+        seller='Emanuel Baur Asien/Drittland',
+        contact='Anja Konig',
+        agent='49112',
+        order='2069354',
+        items=tuple(items),
+        correspondence_number='09-2024',
+        correspondence_date=datetime.now(),
+        correspondence_person='Tatjana Parygin',
+        delivery_note_number='4059965',
+        delivery_date=datetime.now()
+    )
     
     return invoice_data
 
-def generate_invoice_from_sql(invoice_id, anonymize=True):
-    """Генерирует инвойс на основе данных из SQL."""
+def generate_invoice_from_sql(invoice_id, anonymize=True, use_cache=True, backend='weasyprint', snapshot=None):
+    """Генерирует инвойс на основе данных из SQL (или локального снимка базы)."""
     try:
-        # Подключаемся к базе данных
-        conn = get_db_connection()
+        if snapshot:
+            with SnapshotReader(snapshot) as reader:
+                sql_data = reader.fetch_invoice_data(invoice_id)
+        else:
+            # Соединение берется из пула процесса и сразу возвращается в него
+            with connection(RealDictCursor) as conn:
+                sql_data = fetch_invoice_data(conn, invoice_id)
         
-        # Получаем данные из базы
-        sql_data = fetch_invoice_data(conn, invoice_id)
+        # Случайные значения (цвета, HS-Code, анонимизация) зависят только от ID инвойса,
+        # поэтому повторный запуск дает тот же документ и может взять PDF из кэша
+        random.seed(invoice_id)
         
         # Подготавливаем данные для генератора
         invoice_data = prepare_invoice_data(sql_data)
         
         # Создаем генератор
-        generator = FeilerInvoiceGenerator()
+        generator = FeilerInvoiceGenerator(backend=backend)
         
         # Определяем пути для выходных файлов
         output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'output')
@@ -234,8 +233,15 @@ def generate_invoice_from_sql(invoice_id, anonymize=True):
         output_html = os.path.join(output_dir, f'invoice_{invoice_id}.html')
         output_pdf = os.path.join(output_dir, f'invoice_{invoice_id}.pdf')
         
+        # Кэш рендеринга: PDF перерисовывается только если изменились входные данные
+        cache = RenderCache() if use_cache else None
+        
         # Генерируем инвойс с опцией анонимизации
-        html_path, pdf_path = generator.generate(invoice_data, output_html, output_pdf, anonymize=anonymize)
+        html_path, pdf_path = generator.generate(invoice_data, output_html, output_pdf,
+                                                 anonymize=anonymize, cache=cache)
+        
+        if cache is not None and cache.hits:
+            print("\nPDF взят из кэша рендеринга (входные данные не изменились)")
         
         print(f"\nИнвойс успешно сгенерирован:")
         print(f"HTML: {html_path}")
@@ -246,15 +252,89 @@ def generate_invoice_from_sql(invoice_id, anonymize=True):
     except Exception as e:
         print(f"Ошибка при генерации инвойса: {e}")
         raise
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def generate_invoices_bulk(selection, anonymize=True, use_cache=True, backend='weasyprint',
+                           bundle_path=None, itersize=DEFAULT_ITERSIZE, snapshot=None, pipeline=False,
+                           workers=None):
+    """Генерирует инвойсы из одной выгрузки серверным курсором.
+    
+    selection - 'all', '<first>-<last>' или '<id>,<id>,...'. Каждый инвойс
+    рендерится сразу после того, как пришла его последняя строка. С bundle_path
+    все инвойсы пишутся в один PDF (utils.pdf_bundle). Возвращает список путей
+    (html, pdf) или (pdf, оглавление) для пакета. С snapshot данные читаются
+    из локального снимка базы (utils.snapshot). С pipeline чтение, подготовка
+    и рендеринг в пуле из workers процессов идут одновременно (utils.pipeline).
+    """
+    ids, first_id, last_id = parse_invoice_selection(selection)
+    colors = load_colors()
+    generator = FeilerInvoiceGenerator(backend=backend)
+    output_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'output')
+    os.makedirs(output_dir, exist_ok=True)
+    
+    def invoices():
+        for invoice_id, rows in invoice_stream(ids, first_id, last_id, itersize, snapshot):
+            # Тот же seed, что и при генерации одного инвойса: документы совпадают
+            random.seed(invoice_id)
+            yield invoice_id, prepare_invoice_data(rows, colors)
+    
+    if bundle_path:
+        pdf_path, index_path = generator.generate_bundle(
+            (invoice for _, invoice in invoices()), bundle_path, anonymize=anonymize)
+        print(f"\nПакет инвойсов: {pdf_path}")
+        print(f"Оглавление: {index_path}")
+        return [(pdf_path, index_path)]
+    
+    cache = RenderCache() if use_cache else None
+    if pipeline:
+        def prepare(item):
+            invoice_id, rows = item
+            random.seed(invoice_id)
+            return f'invoice_{invoice_id}', prepare_invoice_data(rows, colors)
+        
+        result = generator.generate_pipeline(invoice_stream(ids, first_id, last_id, itersize, snapshot),
+                                             output_dir, prepare=prepare, workers=workers,
+                                             anonymize=anonymize, cache=cache)
+        print(f"\nСгенерировано инвойсов: {len(result.results)} за {result.wall_time:.2f} с")
+        for stage in result.stages:
+            print(f"  {stage}")
+        return result.results
+    
+    results = []
+    for invoice_id, invoice_data in invoices():
+        output_html = os.path.join(output_dir, f'invoice_{invoice_id}.html')
+        output_pdf = os.path.join(output_dir, f'invoice_{invoice_id}.pdf')
+        results.append(generator.generate(invoice_data, output_html, output_pdf,
+                                          anonymize=anonymize, cache=cache))
+        print(f"Инвойс {invoice_id}: {output_pdf}")
+    
+    print(f"\nСгенерировано инвойсов: {len(results)}")
+    if cache is not None and cache.hits:
+        print(f"Взято из кэша рендеринга: {cache.hits}")
+    return results
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        print("Использование: python generate_invoice_from_sql.py <invoice_id> [--no-anonymize]")
+        print("Использование: python generate_invoice_from_sql.py <invoice_id> [--no-anonymize] [--no-cache] [--reportlab]")
+        print("               python generate_invoice_from_sql.py all|<first>-<last>|<id>,<id>,... [--bundle <pdf>] [...]")
+        print("Данные из локального снимка базы: [--snapshot [<path>]] (см. export_snapshot.py)")
+        print("Конвейер чтение/подготовка/рендеринг в пакетном режиме: [--pipeline] [--workers <n>]")
         sys.exit(1)
         
-    invoice_id = int(sys.argv[1])
+    selection = sys.argv[1]
     anonymize = "--no-anonymize" not in sys.argv
-    generate_invoice_from_sql(invoice_id, anonymize) 
\ No newline at end of file
+    use_cache = "--no-cache" not in sys.argv
+    # Быстрый рендеринг на холсте ReportLab вместо WeasyPrint
+    backend = 'reportlab' if "--reportlab" in sys.argv else 'weasyprint'
+    snapshot = None
+    if "--snapshot" in sys.argv:
+        position = sys.argv.index("--snapshot") + 1
+        has_path = position < len(sys.argv) and not sys.argv[position].startswith('--')
+        snapshot = sys.argv[position] if has_path else DEFAULT_SNAPSHOT_PATH
+    if selection.isdigit():
+        generate_invoice_from_sql(int(selection), anonymize, use_cache, backend, snapshot)
+    else:
+        # Пакетный режим: один запрос с серверным курсором вместо подключения на каждый инвойс
+        bundle_path = sys.argv[sys.argv.index("--bundle") + 1] if "--bundle" in sys.argv else None
+        workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else None
+        generate_invoices_bulk(selection, anonymize, use_cache, backend, bundle_path, snapshot=snapshot,
+                               pipeline="--pipeline" in sys.argv, workers=workers) 
\ No newline at end of file
@@ -1,19 +1,14 @@
-import psycopg2
+import sys
+from pathlib import Path
 from psycopg2.extras import RealDictCursor
 
-def get_db_connection():
-    return psycopg2.connect(
-        dbname="latest",
-        user="latest",
-        password="Ew0L3h3w1eV9r1g2",
-        host="188.165.228.146",
-        port="5441",
-        cursor_factory=RealDictCursor
-    )
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.db import connection
 
 def get_sample_product():
-    conn = get_db_connection()
-    try:
+    with connection(RealDictCursor) as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 SELECT 
@@ -31,8 +26,6 @@ def get_sample_product():
                 print(f"SKU: {product['sku']}")
             else:
                 print("Продукты не найдены")
-    finally:
-        conn.close()
 
 if __name__ == '__main__':
     get_sample_product() 
\ No newline at end of file
@@ -4,11 +4,18 @@ Script for exporting product type IDs and names from the database.
 Saves data to a text file with '::' as delimiter.
 """
 
-from sqlalchemy import create_engine, text
-import configparser
+from sqlalchemy import text
 from pathlib import Path
 import logging
 from datetime import datetime
+import sys
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.db import execute_prepared, get_engine, prepare_statement
+
+PRODUCT_TYPES = prepare_statement('product_types', "SELECT id, name FROM producttypes ORDER BY id")
 
 def setup_logging():
     """Setup logging configuration."""
@@ -28,37 +35,12 @@ def setup_logging():
     )
     return logging.getLogger(__name__)
 
-def get_db_connection():
-    """Create database connection from config file."""
-    config = configparser.ConfigParser()
-    config_path = Path(__file__).parent.parent / 'config' / 'database.ini'
-    
-    if not config_path.exists():
-        raise FileNotFoundError(
-            f"Database configuration file not found at {config_path}. "
-            "Please copy database.ini.example to database.ini and update with your credentials."
-        )
-    
-    config.read(config_path)
-    
-    if 'postgresql' not in config:
-        raise KeyError("PostgreSQL configuration section not found in config file")
-    
-    db_params = config['postgresql']
-    
-    connection_string = (
-        f"postgresql+psycopg2://{db_params['user']}:{db_params['password']}"
-        f"@{db_params['host']}:{db_params['port']}/{db_params['database']}"
-    )
-    return create_engine(connection_string)
-
 def export_product_types(connection, output_file):
     """Export product type IDs and names to a text file."""
     logger = logging.getLogger(__name__)
     try:
         # Получаем все записи из таблицы
-        result = connection.execute(text("SELECT id, name FROM producttypes ORDER BY id"))
-        records = result.fetchall()
+        records = execute_prepared(connection, PRODUCT_TYPES)
         
         logger.info(f"Found {len(records)} records to export")
         
@@ -91,7 +73,7 @@ def main():
     logger.info("Starting product types export process")
     
     try:
-        engine = get_db_connection()
+        engine = get_engine()
         logger.info("Database connection established")
         
         # Определяем путь для выходного файла
@@ -4,13 +4,34 @@ Script for inserting product attribute values into product_attribute_values tabl
 Reads product types and their attributes from product_types_separated.txt file,
 finds corresponding products and attributes in the database,
 and creates attribute value records.
+
+The whole file is parsed into (product_type_id, attribute_id, value) rows,
+streamed with COPY into a temporary staging table and expanded to products
+with a single INSERT ... SELECT. Existing values are skipped
+(ON CONFLICT DO NOTHING), so the script can be re-run safely.
 """
 
-from sqlalchemy import create_engine, text
-import configparser
+from sqlalchemy import text
+import csv
+import io
 from pathlib import Path
 import logging
 from datetime import datetime
+import sys
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.db import get_engine
+
+# Удаление повторных пар (product_id, attribute_id), остается строка с наименьшим id
+DEDUPLICATE_ATTRIBUTE_VALUES = """
+    DELETE FROM product_attribute_values pav
+    USING product_attribute_values keep
+    WHERE keep.product_id = pav.product_id
+      AND keep.attribute_id = pav.attribute_id
+      AND keep.id < pav.id
+"""
 
 def setup_logging():
     """Setup logging configuration."""
@@ -30,30 +51,6 @@ def setup_logging():
     )
     return logging.getLogger(__name__)
 
-def get_db_connection():
-    """Create database connection from config file."""
-    config = configparser.ConfigParser()
-    config_path = Path(__file__).parent.parent / 'config' / 'database.ini'
-    
-    if not config_path.exists():
-        raise FileNotFoundError(
-            f"Database configuration file not found at {config_path}. "
-            "Please copy database.ini.example to database.ini and update with your credentials."
-        )
-    
-    config.read(config_path)
-    
-    if 'postgresql' not in config:
-        raise KeyError("PostgreSQL configuration section not found in config file")
-    
-    db_params = config['postgresql']
-    
-    connection_string = (
-        f"postgresql+psycopg2://{db_params['user']}:{db_params['password']}"
-        f"@{db_params['host']}:{db_params['port']}/{db_params['database']}"
-    )
-    return create_engine(connection_string)
-
 def get_attribute_id_map(connection):
     """Get mapping of attribute names to their IDs."""
     logger = logging.getLogger(__name__)
@@ -68,8 +65,100 @@ def get_attribute_id_map(connection):
     logger.info(f"Loaded {len(attribute_map)} attribute mappings")
     return attribute_map
 
-def process_product_types(connection):
-    """Process product types and their attributes from the file."""
+def parse_product_types(input_file, attribute_map, stats):
+    """Parse the file into (product_type_id, attribute_id, value) rows."""
+    logger = logging.getLogger(__name__)
+    rows = []
+    
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            stats['total_lines'] += 1
+            line = line.strip()
+            if not line:
+                continue
+            
+            parts = line.split('::')
+            if len(parts) < 3:  # Минимум код, категория и одна пара атрибут-значение
+                logger.warning(f"Line {line_num}: Invalid format - not enough parts")
+                continue
+            
+            try:
+                product_type_id = int(parts[0])
+            except ValueError as e:
+                logger.error(f"Line {line_num}: Invalid product type ID format: {str(e)}")
+                stats['errors'] += 1
+                continue
+            
+            # Обрабатываем пары атрибут-значение
+            for i in range(2, len(parts) - 1, 2):
+                attribute_name = parts[i].strip()
+                attribute_value = parts[i + 1].strip()
+                
+                if not attribute_name or not attribute_value:
+                    continue
+                
+                # Получаем ID атрибута
+                attribute_id = attribute_map.get(attribute_name)
+                if not attribute_id:
+                    logger.warning(f"Line {line_num}: Attribute not found in database: {attribute_name}")
+                    stats['unknown_attributes'] += 1
+                    continue
+                
+                rows.append((product_type_id, attribute_id, attribute_value))
+    
+    return rows
+
+def ensure_unique_index(connection):
+    """Create the (product_id, attribute_id) unique index used by ON CONFLICT.
+    
+    Earlier versions of this script inserted without a uniqueness check, so a
+    re-run left duplicate pairs and the index could not be built. Duplicates
+    are removed first, keeping the row with the lowest id. Returns the number
+    of removed rows.
+    """
+    exists = connection.execute(text(
+        "SELECT to_regclass('product_attribute_values_product_attribute_key') IS NOT NULL"
+    )).scalar()
+    if exists:
+        return 0
+    
+    result = connection.execute(text(DEDUPLICATE_ATTRIBUTE_VALUES))
+    connection.execute(text("""
+        CREATE UNIQUE INDEX product_attribute_values_product_attribute_key
+        ON product_attribute_values (product_id, attribute_id)
+    """))
+    return result.rowcount
+
+def copy_to_staging(connection, rows):
+    """Stream rows into a temporary staging table with COPY."""
+    connection.execute(text("""
+        CREATE TEMP TABLE product_attribute_staging (
+            product_type_id integer NOT NULL,
+            attribute_id integer NOT NULL,
+            value text NOT NULL
+        ) ON COMMIT DROP
+    """))
+    
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    
+    # COPY выполняется на том же соединении psycopg2, внутри текущей транзакции
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            "COPY product_attribute_staging (product_type_id, attribute_id, value) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+def process_product_types(connection, attribute_map=None):
+    """Process product types and their attributes from the file.
+    
+    attribute_map (name -> id) can be passed by a caller that has just
+    upserted the attribute names; otherwise it is loaded from the database.
+    """
     logger = logging.getLogger(__name__)
     input_file = Path(__file__).parent.parent / 'data' / 'product_types_separated.txt'
     
@@ -77,110 +166,55 @@ def process_product_types(connection):
         logger.error(f"Input file not found: {input_file}")
         raise FileNotFoundError(f"Input file not found: {input_file}")
     
-    # Загружаем маппинг атрибутов
-    attribute_map = get_attribute_id_map(connection)
+    # Загружаем маппинг атрибутов, если он не передан
+    if attribute_map is None:
+        attribute_map = get_attribute_id_map(connection)
     
     # Статистика обработки
     stats = {
         'total_lines': 0,
-        'products_found': 0,
+        'rows_staged': 0,
+        'unknown_attributes': 0,
+        'types_without_products': 0,
+        'duplicates_removed': 0,
         'attributes_inserted': 0,
         'errors': 0
     }
     
     logger.info(f"Starting to process product types from {input_file}")
+    rows = parse_product_types(input_file, attribute_map, stats)
+    stats['rows_staged'] = len(rows)
+    logger.info(f"Parsed {len(rows)} attribute values from {stats['total_lines']} lines")
     
-    with open(input_file, 'r', encoding='utf-8') as f:
-        for line_num, line in enumerate(f, 1):
-            stats['total_lines'] += 1
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                parts = line.split('::')
-                if len(parts) < 3:  # Минимум код, категория и одна пара атрибут-значение
-                    logger.warning(f"Line {line_num}: Invalid format - not enough parts")
-                    continue
-                
-                product_type_id = int(parts[0])
-                
-                # Находим все продукты с данным product_type_id
-                result = connection.execute(
-                    text("""
-                        SELECT id 
-                        FROM products 
-                        WHERE product_type_id = :type_id
-                    """),
-                    {"type_id": product_type_id}
-                )
-                
-                product_ids = [row[0] for row in result]
-                if not product_ids:
-                    logger.debug(f"Line {line_num}: No products found for type_id {product_type_id}")
-                    continue
-                
-                stats['products_found'] += len(product_ids)
-                
-                # Обрабатываем пары атрибут-значение
-                for i in range(2, len(parts), 2):
-                    if i + 1 >= len(parts):
-                        break
-                    
-                    attribute_name = parts[i].strip()
-                    attribute_value = parts[i + 1].strip()
-                    
-                    if not attribute_name or not attribute_value:
-                        continue
-                    
-                    # Получаем ID атрибута
-                    attribute_id = attribute_map.get(attribute_name)
-                    if not attribute_id:
-                        logger.warning(f"Line {line_num}: Attribute not found in database: {attribute_name}")
-                        continue
-                    
-                    # Вставляем значения атрибутов для каждого продукта
-                    for product_id in product_ids:
-                        try:
-                            connection.execute(
-                                text("""
-                                    INSERT INTO product_attribute_values 
-                                    (product_id, attribute_id, value)
-                                    VALUES (:product_id, :attribute_id, :value)
-                                """),
-                                {
-                                    "product_id": product_id,
-                                    "attribute_id": attribute_id,
-                                    "value": attribute_value
-                                }
-                            )
-                            stats['attributes_inserted'] += 1
-                            
-                        except Exception as e:
-                            logger.error(f"Error inserting attribute value for product {product_id}, "
-                                       f"attribute {attribute_name}: {str(e)}")
-                            stats['errors'] += 1
-                            continue
-                
-                if line_num % 100 == 0:
-                    logger.info(f"Progress: {line_num} lines processed")
-                    logger.info(f"- Products found: {stats['products_found']}")
-                    logger.info(f"- Attributes inserted: {stats['attributes_inserted']}")
-                    logger.info(f"- Errors: {stats['errors']}")
-                
-            except ValueError as e:
-                logger.error(f"Line {line_num}: Invalid product type ID format: {str(e)}")
-                stats['errors'] += 1
-                continue
-            except Exception as e:
-                logger.error(f"Line {line_num}: Unexpected error: {str(e)}")
-                stats['errors'] += 1
-                continue
+    stats['duplicates_removed'] = ensure_unique_index(connection)
+    if stats['duplicates_removed']:
+        logger.warning(f"Removed {stats['duplicates_removed']} duplicate attribute values before creating the unique index")
+    copy_to_staging(connection, rows)
+    
+    result = connection.execute(text("""
+        SELECT COUNT(DISTINCT s.product_type_id)
+        FROM product_attribute_staging s
+        WHERE NOT EXISTS (SELECT 1 FROM products p WHERE p.product_type_id = s.product_type_id)
+    """))
+    stats['types_without_products'] = result.scalar()
+    
+    # Один INSERT на все продукты всех типов; уже существующие значения пропускаются
+    result = connection.execute(text("""
+        INSERT INTO product_attribute_values (product_id, attribute_id, value)
+        SELECT p.id, s.attribute_id, s.value
+        FROM product_attribute_staging s
+        JOIN products p ON p.product_type_id = s.product_type_id
+        ON CONFLICT (product_id, attribute_id) DO NOTHING
+    """))
+    stats['attributes_inserted'] = result.rowcount
     
     # Финальная статистика
     logger.info("\nProcessing completed. Statistics:")
     logger.info(f"- Total lines processed: {stats['total_lines']}")
-    logger.info(f"- Products found: {stats['products_found']}")
+    logger.info(f"- Attribute values staged: {stats['rows_staged']}")
+    logger.info(f"- Unknown attributes skipped: {stats['unknown_attributes']}")
+    logger.info(f"- Product types without products: {stats['types_without_products']}")
+    logger.info(f"- Duplicate values removed: {stats['duplicates_removed']}")
     logger.info(f"- Attributes inserted: {stats['attributes_inserted']}")
     logger.info(f"- Errors: {stats['errors']}")
     
@@ -192,6 +226,7 @@ def process_product_types(connection):
     """))
     total_values = result.fetchone()[0]
     logger.info(f"Total attribute values in database: {total_values}")
+    return stats
 
 def main():
     """Main function for processing product types and inserting attribute values."""
@@ -199,7 +234,7 @@ def main():
     logger.info("Starting product attribute values insertion process")
     
     try:
-        engine = get_db_connection()
+        engine = get_engine()
         logger.info("Database connection established")
         
         with engine.begin() as connection:
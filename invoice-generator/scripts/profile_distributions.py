@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Script for profiling the source database into a distribution model for
+synthetic generation (utils/distribution_model.py).
+
+A handful of aggregate queries compute items per invoice, quantity and price
+histograms per product type, collection/product type co-occurrence and
+attribute value frequencies. Only aggregates leave the database.
+
+Usage: python profile_distributions.py [<model_path>]
+    <model_path>  output file (default: data/synthetic/distribution_model.json)
+"""
+
+import sys
+from collections import defaultdict
+from pathlib import Path
+import logging
+from datetime import datetime
+
+from sqlalchemy import text
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.db import get_engine
+from utils.distribution_model import DistributionModel, Histogram, ProductTypeProfile
+
+SUMMARY_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM manufacturers) AS manufacturers,
+        (SELECT COUNT(*) FROM collections) AS collections,
+        (SELECT COUNT(*) FROM invoicesin) AS invoices,
+        (SELECT COUNT(*) FROM invoiceincontents) AS line_items
+"""
+
+ITEMS_PER_INVOICE_QUERY = """
+    SELECT items, COUNT(*) AS invoices
+    FROM (
+        SELECT invoice_in_id, COUNT(*) AS items
+        FROM invoiceincontents
+        GROUP BY invoice_in_id
+    ) per_invoice
+    GROUP BY items
+"""
+
+# Совместное распределение количества и цены по типу; гистограммы считаются из него
+TYPE_LINES_QUERY = """
+    SELECT
+        p.product_type_id,
+        pt.name,
+        iic.quantity,
+        CAST(ROUND(iic.purchase_price * 100) AS INTEGER) AS price_cents,
+        COUNT(*) AS lines
+    FROM invoiceincontents iic
+    JOIN products p ON p.id = iic.product_id
+    JOIN producttypes pt ON pt.id = p.product_type_id
+    GROUP BY p.product_type_id, pt.name, iic.quantity, price_cents
+"""
+
+COLLECTION_TYPES_QUERY = """
+    SELECT p.collection_id, col.name, p.product_type_id, COUNT(*) AS lines
+    FROM invoiceincontents iic
+    JOIN products p ON p.id = iic.product_id
+    JOIN collections col ON col.id = p.collection_id
+    GROUP BY p.collection_id, col.name, p.product_type_id
+"""
+
+ATTRIBUTE_VALUES_QUERY = """
+    SELECT p.product_type_id, pa.attribute_name, pav.value, COUNT(*) AS lines
+    FROM invoiceincontents iic
+    JOIN products p ON p.id = iic.product_id
+    JOIN product_attribute_values pav ON pav.product_id = p.id
+    JOIN product_attributes pa ON pa.id = pav.attribute_id
+    GROUP BY p.product_type_id, pa.attribute_name, pav.value
+"""
+
+def setup_logging():
+    """Setup logging configuration."""
+    log_dir = Path(__file__).parent.parent / 'logs'
+    log_dir.mkdir(exist_ok=True)
+
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    log_file = log_dir / f'profile_distributions_{timestamp}.log'
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler()
+        ]
+    )
+    return logging.getLogger(__name__)
+
+def profile_distributions(connection) -> DistributionModel:
+    """Compute the distribution model from the database."""
+    summary = dict(connection.execute(text(SUMMARY_QUERY)).mappings().one())
+    items_per_invoice = Histogram.from_pairs(connection.execute(text(ITEMS_PER_INVOICE_QUERY)))
+    if items_per_invoice.values:
+        summary.update(
+            items_per_invoice_min=items_per_invoice.values[0],
+            items_per_invoice_max=items_per_invoice.values[-1],
+            items_per_invoice_mean=round(items_per_invoice.mean(), 2)
+        )
+
+    type_names = {}
+    quantities = defaultdict(list)
+    prices = defaultdict(list)
+    for type_id, name, quantity, price_cents, lines in connection.execute(text(TYPE_LINES_QUERY)):
+        type_names[type_id] = name
+        quantities[type_id].append((quantity, lines))
+        prices[type_id].append((price_cents, lines))
+
+    attributes = defaultdict(lambda: defaultdict(list))
+    for type_id, attribute_name, value, lines in connection.execute(text(ATTRIBUTE_VALUES_QUERY)):
+        attributes[type_id][attribute_name].append((value, lines))
+
+    product_types = {
+        type_id: ProductTypeProfile(
+            name=name,
+            quantity=Histogram.from_pairs(quantities[type_id]),
+            price_cents=Histogram.from_pairs(prices[type_id]),
+            attributes={attribute_name: Histogram.from_pairs(pairs)
+                        for attribute_name, pairs in attributes[type_id].items()}
+        )
+        for type_id, name in type_names.items()
+    }
+
+    collections = {}
+    collection_types = defaultdict(list)
+    for collection_id, name, type_id, lines in connection.execute(text(COLLECTION_TYPES_QUERY)):
+        collections[collection_id] = name
+        collection_types[collection_id].append((type_id, lines))
+
+    return DistributionModel(
+        summary=summary,
+        items_per_invoice=items_per_invoice,
+        product_types=product_types,
+        collections=collections,
+        collection_types={key: Histogram.from_pairs(pairs) for key, pairs in collection_types.items()}
+    )
+
+def main():
+    """Main function for profiling the database."""
+    logger = setup_logging()
+    model_path = Path(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    try:
+        engine = get_engine()
+        with engine.connect() as connection:
+            model = profile_distributions(connection)
+
+        path = model.save(model_path)
+        for key, value in model.summary.items():
+            logger.info(f"{key}: {value}")
+        logger.info(f"Product types: {len(model.product_types)}, collections on invoices: {len(model.collections)}")
+        logger.info(f"Distribution model saved to {path} ({path.stat().st_size} bytes)")
+
+    except Exception as e:
+        logger.error(f"Fatal error in main: {str(e)}")
+        raise
+
+if __name__ == "__main__":
+    main()
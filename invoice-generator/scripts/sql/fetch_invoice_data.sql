@@ -8,7 +8,7 @@
 --   - ID продукта (product_id)
 --   - Наименование продукта с коллекцией (product_design)
 --   - Артикул продукта (product_sku)
---   - Параметры продукта (parameters) в формате <Key><Value>;<Key><Value>
+--   - Параметры продукта (parameters) в виде JSON-объекта {"Size": "...", "Color": "...", ...}
 --   - Количество (quantity)
 --   - Цену закупки (purchase_price)
 --   - Сумму по позиции (item_amount)
@@ -22,7 +22,7 @@ SELECT
     p.name AS product_name,
     pt.name AS product_type_name,
     p.sku AS product_sku,
-    get_product_attributes_string_v2(p.id) AS parameters,
+    COALESCE(attrs.attributes, '{}'::jsonb) AS parameters,
     iic.quantity,
     iic.purchase_price,
     (iic.quantity * iic.purchase_price) AS item_amount
@@ -36,6 +36,13 @@ FROM
     collections col ON p.collection_id = col.id
         LEFT JOIN
     producttypes pt ON p.product_type_id = pt.id
+        LEFT JOIN LATERAL (
+            -- Атрибуты продукта одной агрегацией по индексу (product_id, attribute_id)
+            SELECT jsonb_object_agg(pa.attribute_name, pav.value) AS attributes
+            FROM product_attribute_values pav
+            JOIN product_attributes pa ON pa.id = pav.attribute_id
+            WHERE pav.product_id = p.id
+        ) attrs ON TRUE
 WHERE
     ii.id = %s
 ORDER BY
@@ -0,0 +1,45 @@
+-- Запрос для пакетной выгрузки инвойсов (именованный курсор на сервере)
+-- Параметры:
+--   %(ids)s: список ID инвойсов (bigint[]) или NULL
+--   %(first_id)s, %(last_id)s: границы диапазона ID (включительно) или NULL
+--   Все параметры NULL - выгружаются все инвойсы
+-- Возвращает те же колонки, что и fetch_invoice_data.sql.
+-- Строки упорядочены по инвойсу, поэтому клиент собирает инвойсы на лету,
+-- не держа в памяти всю выгрузку.
+SELECT
+    ii.id AS invoice_in_number,
+    ii.created_date AS invoice_date,
+    iic.id AS item_position,
+    iic.product_id,
+    col.name AS collection_name,
+    p.name AS product_name,
+    pt.name AS product_type_name,
+    p.sku AS product_sku,
+    COALESCE(attrs.attributes, '{}'::jsonb) AS parameters,
+    iic.quantity,
+    iic.purchase_price,
+    (iic.quantity * iic.purchase_price) AS item_amount
+FROM
+    invoicesin ii
+        JOIN
+    invoiceincontents iic ON ii.id = iic.invoice_in_id
+        JOIN
+    products p ON iic.product_id = p.id
+        LEFT JOIN
+    collections col ON p.collection_id = col.id
+        LEFT JOIN
+    producttypes pt ON p.product_type_id = pt.id
+        LEFT JOIN LATERAL (
+            -- Атрибуты продукта одной агрегацией по индексу (product_id, attribute_id)
+            SELECT jsonb_object_agg(pa.attribute_name, pav.value) AS attributes
+            FROM product_attribute_values pav
+            JOIN product_attributes pa ON pa.id = pav.attribute_id
+            WHERE pav.product_id = p.id
+        ) attrs ON TRUE
+WHERE
+    (CAST(%(ids)s AS bigint[]) IS NULL OR ii.id = ANY(CAST(%(ids)s AS bigint[])))
+    AND (%(first_id)s IS NULL OR ii.id >= %(first_id)s)
+    AND (%(last_id)s IS NULL OR ii.id <= %(last_id)s)
+ORDER BY
+    ii.id,
+    iic.id
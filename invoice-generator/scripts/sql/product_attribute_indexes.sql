@@ -0,0 +1,27 @@
+-- Индексы для выборки атрибутов продуктов без функций get_product_attributes_string*
+-- Применение: psql -f scripts/sql/product_attribute_indexes.sql
+--   - (product_id, attribute_id): атрибуты продукта для jsonb_object_agg в fetch_invoice_data.sql
+--     и ON CONFLICT в insert_product_attribute_values.py
+--   - attribute_name: поиск атрибута по имени и ON CONFLICT в extract_product_attributes.py
+--   - attribute_id, product_id: фильтры по атрибуту (find_invoice_with_equipment.py)
+
+-- Повторные запуски старого insert_product_attribute_values.py оставляли дубли пар
+-- (product_id, attribute_id); без их удаления уникальный индекс не создается.
+-- Остается строка с наименьшим id.
+DELETE FROM product_attribute_values pav
+USING product_attribute_values keep
+WHERE keep.product_id = pav.product_id
+  AND keep.attribute_id = pav.attribute_id
+  AND keep.id < pav.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS product_attribute_values_product_attribute_key
+    ON product_attribute_values (product_id, attribute_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS product_attributes_attribute_name_key
+    ON product_attributes (attribute_name);
+
+CREATE INDEX IF NOT EXISTS product_attribute_values_attribute_id_idx
+    ON product_attribute_values (attribute_id);
+
+CREATE INDEX IF NOT EXISTS invoiceincontents_product_id_idx
+    ON invoiceincontents (product_id);
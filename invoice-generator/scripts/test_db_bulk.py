@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Checks for utils/db_bulk.py without a database.
+
+A fake connection applies each UPDATE ... FROM (VALUES ...) chunk to an
+in-memory table and returns the matched keys, as RETURNING does.
+Run: python scripts/test_db_bulk.py (or pytest)
+"""
+
+import re
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.checks import run_checks
+from utils.db_bulk import bulk_update
+
+
+class FakeConnection:
+    """Table {id: {column: value}}; every execute() is one chunk of bulk_update."""
+
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.statements = []
+
+    def execute(self, statement, params):
+        self.statements.append(str(statement))
+        width = len(self.columns) + 1
+        matched = []
+        for row in range(len(params) // width):
+            key = params[f"v{row}_0"]
+            if key in self.rows:
+                for index, column in enumerate(self.columns, 1):
+                    self.rows[key][column] = params[f"v{row}_{index}"]
+                matched.append((key,))
+        return matched
+
+
+def test_matched_and_unmatched():
+    connection = FakeConnection({1: {'name': 'a'}, 2: {'name': 'b'}}, ['name'])
+    result = bulk_update(connection, 'products', 'id', ['name'], [(1, 'x'), (3, 'y'), (2, 'z')])
+    assert connection.rows == {1: {'name': 'x'}, 2: {'name': 'z'}}
+    assert (result.matched, result.unmatched, result.unmatched_keys, result.chunks) == (2, 1, [3], 1)
+
+
+def test_chunks_and_progress():
+    connection = FakeConnection({key: {'name': ''} for key in range(10)}, ['name'])
+    progress = []
+    result = bulk_update(connection, 'products', 'id', ['name'], [(key, str(key)) for key in range(10)],
+                         chunk_size=4, progress=lambda done, total: progress.append((done, total)))
+    assert result.chunks == 3 and result.matched == 10
+    assert progress == [(4, 10), (8, 10), (10, 10)]
+    assert all(connection.rows[key]['name'] == str(key) for key in range(10))
+
+
+def test_last_duplicate_key_wins():
+    """As with sequential UPDATEs, the last row of a repeated key is applied."""
+    connection = FakeConnection({1: {'name': 'a'}}, ['name'])
+    result = bulk_update(connection, 'products', 'id', ['name'], [(1, 'first'), (1, 'last')])
+    assert connection.rows[1]['name'] == 'last'
+    assert result.matched == 1 and result.unmatched == 0
+
+
+def test_types_cast_first_values_row():
+    connection = FakeConnection({1: {'product_type_id': 0}, 2: {'product_type_id': 0}}, ['product_type_id'])
+    bulk_update(connection, 'products', 'id', ['product_type_id'], [(1, 5), (2, 6)],
+                types={'id': 'integer', 'product_type_id': 'integer'})
+    statement = connection.statements[0]
+    assert len(re.findall(r'CAST\(', statement)) == 2, "types are cast only in the first VALUES row"
+    assert 'CAST(:v0_0 AS integer)' in statement and 'CAST(:v1_0' not in statement
+
+
+def test_wrong_row_width():
+    connection = FakeConnection({}, ['name'])
+    try:
+        bulk_update(connection, 'products', 'id', ['name'], [(1, 'a', 'extra')])
+    except ValueError:
+        return
+    raise AssertionError("a row with the wrong number of values must be rejected")
+
+
+def test_no_rows():
+    connection = FakeConnection({}, ['name'])
+    result = bulk_update(connection, 'products', 'id', ['name'], [])
+    assert result.chunks == 0 and not connection.statements
+
+
+if __name__ == "__main__":
+    run_checks(globals())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Checks for the distribution model (utils/distribution_model.py) and the
+profiling queries of scripts/profile_distributions.py.
+
+The queries run through SQLAlchemy against an in-memory SQLite database with
+the few source tables they read, so no PostgreSQL server is needed.
+Run: python scripts/test_distribution_model.py (or pytest)
+"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.checks import run_checks
+from scripts.profile_distributions import profile_distributions
+from utils.distribution_model import MODEL_VERSION, DistributionModel, Histogram, ProductTypeProfile
+
+SOURCE = (
+    "CREATE TABLE manufacturers (id INTEGER)",
+    "CREATE TABLE collections (id INTEGER, name TEXT)",
+    "CREATE TABLE producttypes (id INTEGER, name TEXT)",
+    "CREATE TABLE products (id INTEGER, collection_id INTEGER, product_type_id INTEGER)",
+    "CREATE TABLE product_attributes (id INTEGER, attribute_name TEXT)",
+    "CREATE TABLE product_attribute_values (product_id INTEGER, attribute_id INTEGER, value TEXT)",
+    "CREATE TABLE invoicesin (id INTEGER)",
+    "CREATE TABLE invoiceincontents (invoice_in_id INTEGER, product_id INTEGER, quantity INTEGER, "
+    "purchase_price NUMERIC)",
+    "INSERT INTO manufacturers VALUES (1)",
+    "INSERT INTO collections VALUES (5, 'Lugano'), (6, 'Cannes')",
+    "INSERT INTO producttypes VALUES (7, 'Towel'), (8, 'Bathrobe')",
+    "INSERT INTO products VALUES (100, 5, 7), (101, 5, 8), (102, 6, 7)",
+    "INSERT INTO product_attributes VALUES (1, 'Size')",
+    "INSERT INTO product_attribute_values VALUES (100, 1, '50x100'), (102, 1, '30x50')",
+    "INSERT INTO invoicesin VALUES (1), (2), (3)",
+    # Инвойс 1: 3 позиции, инвойс 2: 1 позиция, инвойс 3: 1 позиция
+    "INSERT INTO invoiceincontents VALUES (1, 100, 2, 3.5), (1, 101, 1, 59.9), (1, 102, 2, 3.5), "
+    "(2, 100, 4, 3.5), (3, 102, 2, 1.25)",
+)
+
+
+def make_model():
+    return DistributionModel(
+        summary={'invoices': 3},
+        items_per_invoice=Histogram([1, 3], [2, 1]),
+        product_types={7: ProductTypeProfile('Towel', Histogram([2, 4], [3, 1]), Histogram([125, 350], [1, 3]),
+                                             {'Size': Histogram(['30x50', '50x100'], [2, 2])})},
+        collections={5: 'Lugano', 6: None},
+        collection_types={5: Histogram([7], [3]), 6: Histogram([7], [2])}
+    )
+
+
+def test_histogram_from_pairs():
+    histogram = Histogram.from_pairs([(3, 1), (1, 2), (3, 4), (None, 1)])
+    # Повторы суммируются, значения сортируются, None в конце
+    assert (histogram.values, histogram.counts) == ([1, 3, None], [2, 5, 1])
+    assert histogram.total == 8
+    assert Histogram.from_pairs([(1, 1), (4, 3)]).mean() == 3.25
+    assert Histogram.from_pairs([]) == Histogram()
+
+
+def test_json_roundtrip():
+    model = make_model()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = model.save(Path(tmp) / 'model.json')
+        loaded = DistributionModel.load(path)
+        assert loaded == model
+        # Ключи JSON - строки, после загрузки снова int
+        assert list(loaded.product_types) == [7] and sorted(loaded.collection_types) == [5, 6]
+        # Тот же JSON при повторном сохранении
+        first = path.read_bytes()
+        loaded.save(path)
+        assert path.read_bytes() == first
+
+
+def test_unsupported_version_is_rejected():
+    data = make_model().to_dict()
+    data['version'] = MODEL_VERSION + 1
+    try:
+        DistributionModel.from_dict(json.loads(json.dumps(data)))
+    except ValueError:
+        return
+    raise AssertionError("a model of another version must be rejected")
+
+
+def test_profile_distributions():
+    engine = create_engine('sqlite://')
+    with engine.begin() as connection:
+        for statement in SOURCE:
+            connection.execute(text(statement))
+        model = profile_distributions(connection)
+
+    assert model.summary['invoices'] == 3 and model.summary['line_items'] == 5
+    assert (model.items_per_invoice.values, model.items_per_invoice.counts) == ([1, 3], [2, 1])
+    assert model.summary['items_per_invoice_mean'] == 1.67
+
+    towel, bathrobe = model.product_types[7], model.product_types[8]
+    assert (towel.name, towel.lines) == ('Towel', 4)
+    assert (towel.quantity.values, towel.quantity.counts) == ([2, 4], [3, 1])
+    assert (towel.price_cents.values, towel.price_cents.counts) == ([125, 350], [1, 3])
+    assert (towel.attributes['Size'].values, towel.attributes['Size'].counts) == (['30x50', '50x100'], [2, 2])
+    assert (bathrobe.price_cents.values, bathrobe.attributes) == ([5990], {})
+
+    assert model.collections == {5: 'Lugano', 6: 'Cannes'}
+    assert (model.collection_types[5].values, model.collection_types[5].counts) == ([7, 8], [2, 1])
+    assert (model.collection_types[6].values, model.collection_types[6].counts) == ([7], [2])
+
+
+if __name__ == "__main__":
+    run_checks(globals())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Checks for the backend-neutral invoice model (utils/invoice_model.py).
+
+Run: python scripts/test_invoice_model.py (or pytest)
+"""
+
+import sys
+from datetime import date
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.checks import run_checks
+from utils.invoice_model import Address, Invoice, as_invoice, build_items, format_date
+
+
+def row(position, amount, **fields):
+    """Field dict of one line item as build_items expects it."""
+    values = dict(position=position, design='LUGANO', size='50x100', color='147', quantity='2',
+                  unit='pcs', price='1,00', amount=amount)
+    values.update(fields)
+    return values
+
+
+def test_build_items_amounts():
+    items = build_items([row(1, '12,50'), row(2, '0.99'), row(3, '[Amount]')])
+    assert [item.amount_cents for item in items] == [1250, 99, None]
+    # Поля для вывода не меняются
+    assert [item.amount for item in items] == ['12,50', '0.99', '[Amount]']
+    assert items[0].position == 1 and items[0].design == 'LUGANO' and items[0].color_name == ''
+    assert build_items([]) == ()
+
+
+def test_build_items_malformed_amount_counts_as_zero():
+    items = build_items([row(1, '1.234,56'), row(2, '3,00')])
+    assert [item.amount_cents for item in items] == [0, 300]
+
+
+def test_total_cents():
+    assert Invoice().total_cents is None
+    invoice = Invoice(items=build_items([row(1, '12,50'), row(2, '7,50')]))
+    assert invoice.total_cents == 2000
+    assert invoice.net_cents == invoice.gross_cents == 2000 + invoice.transport_charge_cents
+
+    # Плейсхолдер шаблона-заготовки скрывает итоги, неверная сумма - нет
+    assert Invoice(items=build_items([row(1, '12,50'), row(2, '[Amount]')])).total_cents is None
+    assert Invoice(items=build_items([row(1, '12,50'), row(2, 'n/a')])).total_cents == 1250
+
+
+def test_texts_and_dates():
+    invoice = Invoice(correspondence_number='09-2024', correspondence_date=date(2024, 9, 3),
+                      correspondence_person='Tatjana Parygin', delivery_note_number='4059965',
+                      delivery_date=date(2024, 9, 5))
+    assert invoice.correspondence_text() == ("Your Correspondence Number 09-2024 dated 03.09.2024 "
+                                             "placed by Tatjana Parygin")
+    assert invoice.delivery_text() == "Delivery Note No. 4059965, Delivery Date 05.09.2024"
+    assert Invoice().correspondence_text() == '' and Invoice().delivery_text() == ''
+    assert format_date(None) == '' and format_date('Juni 2024') == 'Juni 2024'
+
+
+def test_ship_to_and_replace():
+    recipient = Address('Home Sweet Home', 'Perekopskaya Street 123', '73022', 'KHERSON', 'UKRAINE')
+    invoice = Invoice(recipient=recipient, items=build_items([row(1, '1,00')]))
+    assert invoice.ship_to is recipient
+    assert recipient.lines() == ['Home Sweet Home', 'Perekopskaya Street 123', '73022 KHERSON', 'UKRAINE']
+
+    changed = invoice.replace(invoice_number='42')
+    assert changed.invoice_number == '42' and changed.items is invoice.items
+    assert invoice.invoice_number == ''
+
+
+def test_as_invoice_legacy_dicts():
+    flat = as_invoice({
+        'INVOICE_NO': '7', 'CUSTOMER_FULL_ADDRESS': 'Name\nStreet 1\n12345 City\nCountry',
+        'products': [{'pos': 1, 'design': 'X', 'quantity': 3, 'qu': 'pcs', 'price': '1,00', 'amount': '3,00'}]
+    })
+    assert flat.invoice_number == '7' and flat.total_cents == 300
+    assert flat.recipient == Address('Name', 'Street 1', '12345', 'City', 'Country')
+
+    nested = as_invoice({'invoice_number': 8, 'items': [{
+        'item_position': 1, 'amount': '4,00',
+        'lines': [{'content': {'collection': 'X', 'quantity': '2 pcs', 'price': '2,00'}},
+                  {'content': {'color': 'pebble', 'value': 'x.0001.147'}},
+                  {'content': {'prefix': 'HS-Code', 'value': '63029100'}}]
+    }]})
+    item = nested.items[0]
+    assert nested.invoice_number == '8' and nested.total_cents == 400
+    assert (item.quantity, item.unit, item.hs_code) == ('2', 'pcs', 'HS-Code: 63029100')
+
+    assert as_invoice(None) == Invoice() and as_invoice(flat) is flat
+
+
+if __name__ == "__main__":
+    run_checks(globals())
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Checks for the columnar line-item engine (utils/line_items.py).
+
+Run: python scripts/test_line_items.py (or pytest)
+"""
+
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.checks import run_checks
+from utils.line_items import LineItemBatch, to_cents, format_cents
+
+
+def test_to_cents_inputs():
+    assert to_cents([]).tolist() == []
+    assert to_cents(['12,50', '0.99', '1234']).tolist() == [1250, 99, 123400]
+    assert to_cents([Decimal('3.50'), Decimal('-0.05')]).tolist() == [350, -5]
+    assert to_cents([19.99, 0.1 + 0.2]).tolist() == [1999, 30]
+    assert to_cents([3, 0]).tolist() == [300, 0]
+
+
+def test_to_cents_malformed_values_fall_back_to_zero():
+    """One bad string only zeroes itself; the rest of the column is still parsed."""
+    assert to_cents(['1,50', 'n/a', '2.25', '']).tolist() == [150, 0, 225, 0]
+
+
+def test_format_cents():
+    assert format_cents([123450, 5, 0, 100]).tolist() == ['1234,50', '0,05', '0,00', '1,00']
+    assert format_cents([-5, -123450]).tolist() == ['-0,05', '-1234,50']
+    assert format_cents([123450], locale='en').tolist() == ['1234.50']
+    assert format_cents([]).tolist() == []
+    # Обратное преобразование дает те же центы
+    cents = [1, 99, 100, 101, 999999]
+    assert to_cents(format_cents(cents)).tolist() == cents
+
+
+def test_batch_totals_and_positions():
+    batch = LineItemBatch.from_columns(
+        counts=[2, 0, 3],
+        prices=['1,10', '2,20', '0,10', '5,00', '0,01'],
+        quantities=[3, 1, 3, 2, 7],
+        sizes=['S', 'M', 'S', 'S', 'L'],
+        colors=['red', 'red', 'blue', 'red', 'blue']
+    )
+    assert batch.invoice_count == 3 and batch.counts.tolist() == [2, 0, 3]
+    assert batch.amount_cents.tolist() == [330, 220, 30, 1000, 7]
+    # Итог инвойса - точная сумма строк в центах, пустой инвойс дает 0
+    assert batch.totals_cents().tolist() == [550, 0, 1037]
+    assert batch.formatted_totals().tolist() == ['5,50', '0,00', '10,37']
+    assert batch.positions().tolist() == [1, 2, 1, 2, 3]
+    assert batch.invoice_ids().tolist() == [0, 0, 2, 2, 2]
+    assert batch.sizes == ['S', 'M', 'L'] and batch.size_codes.tolist() == [0, 1, 0, 0, 2]
+    assert batch.colors == ['red', 'blue'] and batch.color_codes.tolist() == [0, 0, 1, 0, 1]
+
+
+def test_batch_from_records():
+    invoices = [
+        [{'purchase_price': Decimal('3.50'), 'quantity': 2}, {'purchase_price': Decimal('9.99'), 'quantity': 1}],
+        [{'purchase_price': Decimal('3.50'), 'quantity': 4}],
+    ]
+    batch = LineItemBatch.from_records(invoices)
+    assert batch.totals_cents().tolist() == [1699, 1400]
+    assert batch.formatted_prices(locale='en').tolist() == ['3.50', '9.99', '3.50']
+    # Суммы, переданные явно, не пересчитываются из цены и количества
+    batch = LineItemBatch.from_columns([1], ['1,00'], [3], amounts=['2,50'])
+    assert batch.amount_cents.tolist() == [250]
+
+
+if __name__ == "__main__":
+    run_checks(globals())
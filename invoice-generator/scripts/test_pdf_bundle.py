@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Checks for invoice bundles (utils/pdf_bundle.py).
+
+The sidecar index is checked on its own and against a bundle rendered with
+the ReportLab template (no WeasyPrint needed).
+Run: python scripts/test_pdf_bundle.py (or pytest)
+"""
+
+import json
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from pdf_templates.feiler_template import FeilerInvoiceTemplate
+from scripts.checks import run_checks
+from utils.invoice_model import Invoice, build_items
+from utils.pdf_bundle import BUNDLE_INDEX_VERSION, BundleIndex, bookmark_css, outline_title
+
+
+def make_invoice(number, item_count):
+    rows = [dict(position=position, design='LUGANO', size='50x100', color='147', quantity='2', unit='pcs',
+                 price='1,00', amount='2,00', article_no='lugano.0001.147', hs_code='HS-Code: 63029100')
+            for position in range(1, item_count + 1)]
+    return Invoice(invoice_number=number, items=build_items(rows))
+
+
+def test_index_page_ranges():
+    index = BundleIndex('bundle.pdf')
+    assert index.add('A-1', 2) == (1, 2)
+    assert index.add('A-2', 1) == (3, 3)
+    # Номера инвойсов могут повторяться: каждая запись сохраняется
+    assert index.add('A-1', 3) == (4, 6)
+    assert index.page_count == 6
+    assert [entry['invoice_number'] for entry in index.entries] == ['A-1', 'A-2', 'A-1']
+
+
+def test_index_sidecar():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = BundleIndex(Path(tmp) / 'bundle.pdf')
+        index.add('Ä-1', 2)
+        path = index.write()
+        assert path == Path(tmp) / 'bundle.json'
+        data = json.loads(path.read_text(encoding='utf-8'))
+        assert data == {
+            'version': BUNDLE_INDEX_VERSION, 'pdf': 'bundle.pdf', 'page_count': 2,
+            'invoices': [{'invoice_number': 'Ä-1', 'first_page': 1, 'last_page': 2}]
+        }
+        assert index.write(Path(tmp) / 'other.json') == Path(tmp) / 'other.json'
+
+
+def test_titles_and_bookmark_css():
+    assert outline_title(Invoice(invoice_number='4711'), 3) == 'Invoice 4711'
+    assert outline_title(Invoice(), 3) == 'Invoice 3'
+    css = bookmark_css('body > :first-child', 'Invoice "A\\B"')
+    assert css == 'body > :first-child { bookmark-level: 1; bookmark-label: "Invoice \\"A\\\\B\\""; }'
+
+
+def test_reportlab_bundle_matches_page_plan():
+    template = FeilerInvoiceTemplate()
+    invoices = [make_invoice('1', 2), make_invoice('2', 60), make_invoice('3', 1)]
+    pages = [len(template.plan_pages(invoice)) for invoice in invoices]
+    assert pages[1] > 1, "the long invoice must span several pages"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = Path(tmp) / 'bundle.pdf'
+        index = json.loads(template.render_bundle(invoices, str(pdf_path)).read_text(encoding='utf-8'))
+        pdf = pdf_path.read_bytes()
+
+    assert [entry['last_page'] - entry['first_page'] + 1 for entry in index['invoices']] == pages
+    assert index['page_count'] == sum(pages) == len(re.findall(rb'/Type /Page\b(?!s)', pdf))
+    assert [entry['first_page'] for entry in index['invoices']] == [1, pages[0] + 1, pages[0] + pages[1] + 1]
+
+
+def test_empty_bundle_is_rejected():
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            FeilerInvoiceTemplate().render_bundle([], str(Path(tmp) / 'bundle.pdf'))
+        except ValueError:
+            return
+    raise AssertionError("a bundle without invoices must be rejected")
+
+
+if __name__ == "__main__":
+    run_checks(globals())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Checks for the fetch -> prepare -> render pipeline (utils/pipeline.py).
+
+Run: python scripts/test_pipeline.py (or pytest)
+"""
+
+import multiprocessing
+import sys
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.checks import run_checks
+from utils.pipeline import run_pipeline
+
+
+def square(value):
+    """Render step; module level so that pool workers can unpickle it."""
+    return value * value
+
+
+def failing_initializer():
+    raise RuntimeError("worker setup failed")
+
+
+def failing_source():
+    yield 1
+    yield 2
+    raise RuntimeError("source failed")
+
+
+def test_results_in_source_order():
+    for workers in (1, 3):
+        result = run_pipeline(range(50), lambda value: value + 1, square, workers=workers, queue_size=2)
+        assert result.results == [(value + 1) ** 2 for value in range(50)], f"workers={workers}"
+        assert [stage.name for stage in result.stages] == ['fetch', 'prepare', 'render']
+        assert all(stage.items == 50 for stage in result.stages)
+
+
+def test_empty_source():
+    result = run_pipeline([], lambda value: value, square, workers=1)
+    assert result.results == [] and all(stage.items == 0 for stage in result.stages)
+
+
+def test_source_error_is_raised():
+    try:
+        run_pipeline(failing_source(), lambda value: value, square, workers=1)
+    except RuntimeError as error:
+        assert str(error) == "source failed"
+        return
+    raise AssertionError("the source exception must reach the caller")
+
+
+def test_prepare_error_is_raised():
+    def prepare(value):
+        if value == 5:
+            raise ValueError("bad item")
+        return value
+
+    for workers in (1, 2):
+        try:
+            run_pipeline(range(100), prepare, square, workers=workers, queue_size=2)
+        except ValueError as error:
+            assert str(error) == "bad item"
+            continue
+        raise AssertionError("the prepare exception must reach the caller")
+
+
+def test_failing_initializer_shuts_pool_down():
+    """A worker initializer that fails during the pool warm-up leaves no worker processes behind."""
+    try:
+        run_pipeline(range(10), lambda value: value, square, workers=2, initializer=failing_initializer)
+    except BrokenProcessPool:
+        assert multiprocessing.active_children() == []
+        return
+    raise AssertionError("the broken pool must reach the caller")
+
+
+if __name__ == "__main__":
+    run_checks(globals())
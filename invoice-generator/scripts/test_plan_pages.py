@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Checks for the page planner (utils/pagination.py) shared by all renderers.
+
+Items are plain heights in points, so every expected split can be verified
+by hand. Run: python scripts/test_plan_pages.py (or pytest)
+"""
+
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.checks import run_checks
+from utils.pagination import PageLayout, plan_pages
+
+# Первая страница 100pt, последующие 200pt, заголовок таблицы 10pt, итоги 30pt
+LAYOUT = PageLayout(first_page_space=100, page_space=200, table_header_height=10, totals_height=30)
+
+
+def height(item):
+    return item
+
+
+def split(pages):
+    """Pages as lists of item heights."""
+    return [list(page.items) for page in pages]
+
+
+def check_all_items_kept(items, pages):
+    assert [item for page in pages for item in page.items] == list(items), "items lost or reordered"
+    assert [page.number for page in pages] == list(range(1, len(pages) + 1))
+    assert pages[0].is_first and not any(page.is_first for page in pages[1:])
+    assert pages[-1].is_last and not any(page.is_last for page in pages[:-1])
+
+
+def test_empty_items():
+    """No items: one page that is both first and last and carries the totals."""
+    pages = plan_pages([], LAYOUT, height)
+    assert split(pages) == [[]]
+    assert pages[0].is_first and pages[0].is_last and pages[0].has_totals
+
+    pages = plan_pages([], LAYOUT, height, totals=False)
+    assert split(pages) == [[]]
+    assert not pages[0].has_totals
+
+
+def test_items_fill_pages():
+    """Each page takes items while they fit; the table header is counted once per page."""
+    items = [30, 30, 30, 50, 50, 50, 50]
+    pages = plan_pages(items, LAYOUT, height, totals=False)
+    # 10 + 3 * 30 = 100 <= 100; 10 + 3 * 50 = 160, четвертая позиция дала бы 210 > 200
+    assert split(pages) == [[30, 30, 30], [50, 50, 50], [50]]
+    check_all_items_kept(items, pages)
+
+
+def test_first_page_too_small():
+    """A first page that cannot hold even one item stays without items."""
+    layout = PageLayout(first_page_space=20, page_space=200, table_header_height=10, totals_height=30)
+    items = [30, 30]
+    pages = plan_pages(items, layout, height)
+    assert split(pages) == [[], [30, 30]]
+    assert not pages[0].has_totals and pages[1].has_totals
+    check_all_items_kept(items, pages)
+
+
+def test_item_taller_than_page():
+    """An item taller than a whole page gets a page of its own and is not dropped."""
+    items = [50, 500, 50]
+    pages = plan_pages(items, LAYOUT, height)
+    assert split(pages) == [[50], [500], [50]]
+    check_all_items_kept(items, pages)
+
+    # Высокая позиция в начале страницы полного размера не оставляет страниц без позиций (кроме итогов)
+    items = [500, 500]
+    pages = plan_pages(items, PageLayout(200, 200, 10, totals_height=30), height)
+    assert split(pages) == [[500], [500], []]
+    assert pages[-1].has_totals
+    check_all_items_kept(items, pages)
+
+
+def test_totals_spill_to_extra_page():
+    """Totals that do not fit under the last item go onto an extra page without items."""
+    items = [40, 40]  # 10 + 40 + 40 = 90, итоги 30 не помещаются в 100
+    pages = plan_pages(items, LAYOUT, height)
+    assert split(pages) == [[40, 40], []]
+    assert not pages[0].has_totals and not pages[0].is_last
+    assert pages[1].has_totals and pages[1].is_last
+    check_all_items_kept(items, pages)
+
+    # Без блока итогов лишней страницы нет
+    assert split(plan_pages(items, LAYOUT, height, totals=False)) == [[40, 40]]
+
+
+def test_totals_fit_under_last_item():
+    items = [30, 30]  # 10 + 30 + 30 + 30 = 100 <= 100
+    pages = plan_pages(items, LAYOUT, height)
+    assert split(pages) == [[30, 30]]
+    assert pages[0].has_totals
+
+
+def test_pages_do_not_copy_items():
+    items = [30] * 10
+    pages = plan_pages(items, LAYOUT, height)
+    assert pages[1].items[0] is items[pages[1].items.start]
+    assert pages[1].items[-1] == 30 and pages[1].items[0:2] == [30, 30]
+
+
+if __name__ == "__main__":
+    run_checks(globals())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Checks for the PDF render cache (utils/render_cache.py).
+
+Rendering is simulated by writing bytes, so the checks run without any PDF
+backend. Run: python scripts/test_render_cache.py (or pytest)
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.checks import run_checks
+from utils.render_cache import EVICT_LOW_WATER, RenderCache
+
+
+def writer(content):
+    """render_fn that writes content and counts its calls."""
+    def render(path):
+        render.calls += 1
+        Path(path).write_bytes(content)
+    render.calls = 0
+    return render
+
+
+def test_make_key():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(Path(tmp) / 'cache')
+        assert cache.make_key('a', 'bc') == cache.make_key('a', 'bc')
+        # Границы частей входят в ключ
+        assert cache.make_key('a', 'bc') != cache.make_key('ab', 'c')
+        assert cache.make_key({'b': 1, 'a': 2}) == cache.make_key({'a': 2, 'b': 1})
+
+        source = Path(tmp) / 'template.html'
+        source.write_text('v1')
+        first = cache.make_key(source)
+        source.write_text('v2')
+        # Новый mtime - новый хэш содержимого
+        os.utime(source, ns=(1, 1))
+        assert cache.make_key(source) != first
+
+
+def test_miss_then_hit():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(Path(tmp) / 'cache')
+        render = writer(b'%PDF-1')
+        output = Path(tmp) / 'out' / 'invoice.pdf'
+
+        assert cache.render('k1', output, render) is False
+        assert cache.render('k1', output, render) is True
+        assert render.calls == 1 and output.read_bytes() == b'%PDF-1'
+        assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_rerender_does_not_corrupt_entry():
+    """The output may be a hard link to a cache entry; a new render must not write through it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(Path(tmp) / 'cache')
+        output = Path(tmp) / 'invoice.pdf'
+        cache.render('old', output, writer(b'%PDF-old'))
+        cache.render('old', output, writer(b'unused'))  # выход - ссылка на запись кэша
+
+        cache.render('new', output, writer(b'%PDF-new'))
+        assert output.read_bytes() == b'%PDF-new'
+        other = Path(tmp) / 'other.pdf'
+        assert cache.fetch('old', other) and other.read_bytes() == b'%PDF-old'
+
+
+def test_lru_eviction():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(Path(tmp) / 'cache', max_size=250)
+        for index, key in enumerate(('a1', 'b2', 'c3')):
+            cache.render(key, Path(tmp) / f'{key}.pdf', writer(b'x' * 100))
+            # Записи различаются по времени использования
+            os.utime(cache._entry_path(key), (index, index))
+            cache._size = None
+
+        # Четвертая запись превышает лимит: вытеснение идет до 90% лимита (225),
+        # то есть уходят две самые давно использованные записи
+        cache.render('d4', Path(tmp) / 'd4.pdf', writer(b'x' * 100))
+        assert cache.size() == 200 <= 250 * EVICT_LOW_WATER
+        assert not cache._entry_path('a1').exists() and not cache._entry_path('b2').exists()
+        assert cache._entry_path('c3').exists() and cache._entry_path('d4').exists()
+        assert cache.size() == sum(path.stat().st_size for path in cache.cache_dir.glob('*/*.pdf'))
+
+
+def test_no_eviction_within_limit():
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(Path(tmp) / 'cache', max_size=250)
+        cache.render('a1', Path(tmp) / 'a1.pdf', writer(b'x' * 100))
+        cache.render('b2', Path(tmp) / 'b2.pdf', writer(b'x' * 150))
+        # Ровно на лимите вытеснения нет, хотя размер выше нижней отметки
+        assert cache.evict() == 0 and cache.size() == 250
+
+
+def test_store_overwrite_keeps_size():
+    """Storing the same key again replaces the entry and counts its size once."""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(Path(tmp) / 'cache', max_size=250)
+        pdf = Path(tmp) / 'invoice.pdf'
+        assert cache.size() == 0
+        for content in (b'x' * 100, b'x' * 100, b'x' * 120):
+            pdf.write_bytes(content)
+            cache.store('k1', pdf)
+        assert cache.size() == 120 == cache._entry_path('k1').stat().st_size
+        # Без учета замены счетчик дошел бы до 320 и вызвал бы вытеснение
+        assert cache._entry_path('k1').exists()
+
+
+if __name__ == "__main__":
+    run_checks(globals())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Checks for the SQLite source snapshot (utils/snapshot.py).
+
+The PostgreSQL source is replaced by an in-memory SQLite database behind a
+minimal connection object (cursor, named cursor, fetchone, fetchmany), so
+the export and the reader run without a database server.
+Run: python scripts/test_snapshot.py (or pytest)
+"""
+
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.checks import run_checks
+from utils.snapshot import SNAPSHOT_TABLES, SnapshotReader, _create_schema, _export_table
+
+SOURCE = """
+    CREATE TABLE invoicesin (id INTEGER, created_date TEXT);
+    CREATE TABLE invoiceincontents (id INTEGER, invoice_in_id INTEGER, product_id INTEGER,
+                                    quantity INTEGER, purchase_price TEXT);
+    CREATE TABLE products (id INTEGER, name TEXT, sku TEXT, collection_id INTEGER, product_type_id INTEGER);
+    CREATE TABLE product_attribute_values (id INTEGER, product_id INTEGER, attribute_id INTEGER, value TEXT);
+    CREATE TABLE collections (id INTEGER, name TEXT);
+    CREATE TABLE producttypes (id INTEGER, name TEXT, base_name TEXT, base_name_fr TEXT,
+                               base_name_de TEXT, base_name_it TEXT, base_name_uk TEXT);
+    CREATE TABLE product_attributes (id INTEGER, attribute_name TEXT);
+    INSERT INTO invoicesin VALUES (1, '2024-05-01'), (2, '2024-05-02');
+    INSERT INTO invoiceincontents VALUES (10, 1, 100, 2, '3.50'), (11, 1, 101, 1, '9.99'), (12, 2, 100, 4, '3.50');
+    INSERT INTO products VALUES (100, 'Towel', 'SKU100', 5, 7), (101, 'Robe', 'SKU101', 5, 7);
+    INSERT INTO product_attribute_values VALUES (1, 100, 1, '50x100'), (2, 100, 2, 'White');
+    INSERT INTO collections VALUES (5, 'Exclusiv');
+    INSERT INTO producttypes VALUES (7, 'Handtuch', 'Towel', NULL, NULL, NULL, NULL);
+    INSERT INTO product_attributes VALUES (1, 'Size'), (2, 'Color');
+"""
+
+
+class FakeCursor:
+    """psycopg2-like cursor over the SQLite source (%s placeholders)."""
+
+    def __init__(self, source):
+        self.source = source
+        self.itersize = 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def execute(self, query, params=()):
+        self.rows = self.source.execute(query.replace('%s', '?'), params)
+
+    def fetchone(self):
+        return self.rows.fetchone()
+
+    def fetchmany(self, size):
+        return self.rows.fetchmany(size)
+
+
+class FakeConnection:
+    def __init__(self, source):
+        self.source = source
+
+    def cursor(self, name=None):
+        return FakeCursor(self.source)
+
+
+def make_source():
+    source = sqlite3.connect(':memory:')
+    source.executescript(SOURCE)
+    return source
+
+
+def export(source, snapshot_path, full=False):
+    """Refresh the snapshot the way export_snapshot does, from the fake source."""
+    db = sqlite3.connect(snapshot_path)
+    with db:
+        _create_schema(db)
+        fetched = {table.name: _export_table(FakeConnection(source), db, table, full) for table in SNAPSHOT_TABLES}
+    db.close()
+    return fetched
+
+
+def test_reader_returns_query_types():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'source.sqlite3'
+        export(make_source(), path)
+        with SnapshotReader(path) as reader:
+            rows = reader.fetch_invoice_data(1)
+    assert [row['item_position'] for row in rows] == [10, 11]
+    towel = rows[0]
+    assert towel['invoice_date'] == date(2024, 5, 1)
+    assert towel['purchase_price'] == Decimal('3.50') and towel['item_amount'] == Decimal('7.00')
+    assert towel['parameters'] == {'Size': '50x100', 'Color': 'White'}
+    assert towel['collection_name'] == 'Exclusiv' and towel['product_type_name'] == 'Handtuch'
+    assert rows[1]['parameters'] == {}
+
+
+def test_stream_invoices_filters():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'source.sqlite3'
+        export(make_source(), path)
+        with SnapshotReader(path) as reader:
+            def streamed(**filters):
+                return [(invoice_id, len(rows)) for invoice_id, rows in reader.stream_invoices(**filters)]
+
+            assert streamed() == [(1, 2), (2, 1)]
+            assert streamed(ids=[2]) == [(2, 1)]
+            assert streamed(first_id=2) == [(2, 1)] and streamed(last_id=1) == [(1, 2)]
+            # Пустой список id ничего не выбирает
+            assert streamed(ids=[]) == [] and streamed(ids=(), first_id=1) == []
+
+
+def test_incremental_refresh():
+    """New rows above the watermark are added, deletes are mirrored, reloaded tables pick up updates."""
+    source = make_source()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'source.sqlite3'
+        export(source, path)
+
+        source.executescript("""
+            INSERT INTO invoicesin VALUES (3, '2024-06-01');
+            INSERT INTO invoiceincontents VALUES (13, 3, 101, 1, '1.10');
+            DELETE FROM invoiceincontents WHERE id = 11;
+            DELETE FROM product_attribute_values WHERE id = 2;
+            UPDATE producttypes SET name = 'Frottier';
+        """)
+        fetched = export(source, path)
+        # Таблицы с отметкой отдают только новые строки, справочники - целиком
+        assert fetched['invoicesin'] == 1 and fetched['invoiceincontents'] == 1
+        assert fetched['products'] == 2 and fetched['producttypes'] == 1
+
+        with SnapshotReader(path) as reader:
+            rows = reader.fetch_invoice_data(1)
+            assert [row['item_position'] for row in rows] == [10]
+            assert rows[0]['parameters'] == {'Size': '50x100'}
+            assert rows[0]['product_type_name'] == 'Frottier'
+            assert [invoice_id for invoice_id, _ in reader.stream_invoices()] == [1, 2, 3]
+            info = {row['table_name']: row for row in reader.table_info()}
+        assert info['invoiceincontents']['watermark'] == 13 and info['invoiceincontents']['row_count'] == 3
+        assert info['products']['watermark'] is None
+
+
+if __name__ == "__main__":
+    run_checks(globals())
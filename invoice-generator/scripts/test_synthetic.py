@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Checks for the synthetic invoice sampler (utils/synthetic.py).
+
+The distribution model is built in code with a few product types, so every
+sampled value can be traced back to its histogram. No database or PDF
+backend is needed. Run: python scripts/test_synthetic.py (or pytest)
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from scripts.checks import run_checks
+from utils.distribution_model import DistributionModel, Histogram, ProductTypeProfile
+from utils.synthetic import SyntheticBatch, SyntheticSampler
+
+COLORS = [('147', 'pebble'), ('.', 'white')]
+
+
+def make_model(product_types=None):
+    """Two usable product types and one without quantity observations."""
+    if product_types is None:
+        product_types = {
+            1: ProductTypeProfile('Towel', Histogram([1, 2], [1, 3]), Histogram([500, 1250], [1, 1]),
+                                  {'Size': Histogram(['50x100'], [1])}),
+            2: ProductTypeProfile('Bathrobe', Histogram([3], [1]), Histogram([9900], [1])),
+            # Тип без наблюдений количества встречается в коллекциях чаще остальных
+            3: ProductTypeProfile('Empty', Histogram(), Histogram([100], [1])),
+        }
+    return DistributionModel(
+        summary={'invoices': 2},
+        items_per_invoice=Histogram([1, 4], [1, 1]),
+        product_types=product_types,
+        collections={10: 'Lugano', 20: 'Cannes'},
+        collection_types={10: Histogram([1, 2, 3], [2, 1, 5]), 20: Histogram([3], [4])}
+    )
+
+
+def test_types_without_observations_are_skipped():
+    sampler = SyntheticSampler(make_model(), COLORS, seed=1)
+    assert sampler.product_types == ['Towel', 'Bathrobe']
+
+    batch = sampler.sample(200)
+    items = batch.items
+    assert set(items.type_codes.tolist()) == {0, 1}
+    # Коллекция Cannes содержит только пропущенный тип и в выборку не попадает
+    assert set(items.collection_codes.tolist()) == {0}
+    assert set(items.quantity.tolist()) <= {1, 2, 3}
+
+
+def test_values_follow_product_type():
+    batch = SyntheticSampler(make_model(), COLORS, seed=2).sample(200)
+    items = batch.items
+    towel, bathrobe = items.type_codes == 0, items.type_codes == 1
+    assert set(items.quantity[towel].tolist()) <= {1, 2}
+    assert set(items.price_cents[towel].tolist()) <= {500, 1250}
+    assert set(items.quantity[bathrobe].tolist()) == {3}
+    assert set(items.price_cents[bathrobe].tolist()) == {9900}
+    assert np.array_equal(items.amount_cents, items.price_cents * items.quantity)
+
+    # Размер только у типа с атрибутом Size; код 0 - пустое значение
+    sizes = np.array(items.sizes)[items.size_codes]
+    assert set(sizes[towel].tolist()) == {'50x100'} and set(sizes[bathrobe].tolist()) == {''}
+
+
+def test_no_usable_types_raises():
+    model = make_model({3: ProductTypeProfile('Empty', Histogram(), Histogram([100], [1]))})
+    try:
+        SyntheticSampler(model, COLORS)
+    except ValueError:
+        return
+    raise AssertionError("a model without usable product types must be rejected")
+
+
+def test_batches_are_reproducible():
+    sampler = SyntheticSampler(make_model(), COLORS, seed=3)
+    first, again = sampler.sample(50, batch_index=1), sampler.sample(50, batch_index=1)
+    assert np.array_equal(first.items.price_cents, again.items.price_cents)
+    assert np.array_equal(first.invoice_dates, again.invoice_dates)
+
+    batches = list(sampler.iter_batches(10, batch_size=4))
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert [batch.first_number for batch in batches] == [1, 5, 9]
+    assert batches[2].invoice(1).invoice_number == 'SYN-0000010'
+
+
+def test_invoice_and_roundtrip():
+    batch = SyntheticSampler(make_model(), COLORS, seed=4).sample(20)
+    invoice = batch.invoice(0)
+    start, stop = int(batch.items.offsets[0]), int(batch.items.offsets[1])
+    assert len(invoice.items) == stop - start
+    assert invoice.total_cents == int(batch.items.amount_cents[start:stop].sum())
+    assert all(item.design == 'LUGANO' for item in invoice.items)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        loaded = SyntheticBatch.load(batch.save(Path(tmp) / 'batch.npz'))
+    assert len(loaded) == len(batch)
+    assert all(loaded.invoice(index) == batch.invoice(index) for index in range(len(batch)))
+
+
+if __name__ == "__main__":
+    run_checks(globals())
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Checks for text measurement and wrapping (pdf_templates/fonts.py).
+
+Courier is a standard PDF font with every glyph 600/1000 em wide, so at
+size 10 each character takes 6pt and the expected line breaks can be
+counted by hand. Run: python scripts/test_wrap_text.py (or pytest)
+"""
+
+import sys
+from pathlib import Path
+
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from pdf_templates.fonts import line_count, string_width, wrap_text
+from scripts.checks import run_checks
+
+# 5 символов Courier 10pt на строку
+WIDTH = 30
+
+
+def test_words_fill_lines():
+    assert wrap_text('aa bb cc', 'Courier', 10, WIDTH) == ('aa bb', 'cc')
+    assert wrap_text('aaaaa b', 'Courier', 10, WIDTH) == ('aaaaa', 'b')
+    # Лишние пробелы не попадают в строки
+    assert wrap_text('  aa   bb  ', 'Courier', 10, WIDTH) == ('aa bb',)
+
+
+def test_empty_text_is_one_line():
+    assert wrap_text('', 'Courier', 10, WIDTH) == ('',)
+    assert line_count('', 'Courier', 10, WIDTH) == 1
+
+
+def test_long_word():
+    """A word wider than the line is split between characters, or overflows like in a browser."""
+    assert wrap_text('abcdefghijkl', 'Courier', 10, WIDTH) == ('abcde', 'fghij', 'kl')
+    assert wrap_text('x abcdefghijkl y', 'Courier', 10, WIDTH) == ('x', 'abcde', 'fghij', 'kl y')
+    assert wrap_text('abcdefghijkl', 'Courier', 10, WIDTH, break_words=False) == ('abcdefghijkl',)
+    assert line_count('x abcdefghijkl y', 'Courier', 10, WIDTH) == 3
+
+
+def test_lines_fit_and_keep_text():
+    """With a proportional font every line fits the width and no character is lost."""
+    text = "LUGANO Exclusiv Frottier-Handtuch mit Bordüre und Монограмма " * 3
+    for font_name, size, width in (('Helvetica', 8.5, 60), ('Helvetica-Bold', 8.5, 120), ('Times-Roman', 11, 45)):
+        lines = wrap_text(text, font_name, size, width)
+        assert ''.join(lines).replace(' ', '') == text.replace(' ', '')
+        assert all(string_width(line, font_name, size) <= width + 1e-9 for line in lines), font_name
+
+
+def test_string_width_matches_reportlab():
+    for text in ('Pos.', 'Amount (EUR)', 'Größe 50x100'):
+        for font_name in ('Helvetica', 'Helvetica-Bold', 'Courier'):
+            assert abs(string_width(text, font_name, 9) - stringWidth(text, font_name, 9)) < 1e-6
+
+
+if __name__ == "__main__":
+    run_checks(globals())
@@ -4,12 +4,18 @@ Script for updating product categories in the database.
 Reads categories from product_types_separated file and updates base_name field in producttypes table.
 """
 
-from sqlalchemy import create_engine, text
-import configparser
+from sqlalchemy import text
+import sys
 from pathlib import Path
 import logging
 from datetime import datetime
 
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.db_bulk import bulk_update
+from utils.db import get_engine
+
 def setup_logging():
     """Setup logging configuration."""
     log_dir = Path(__file__).parent.parent / 'logs'
@@ -28,30 +34,6 @@ def setup_logging():
     )
     return logging.getLogger(__name__)
 
-def get_db_connection():
-    """Create database connection from config file."""
-    config = configparser.ConfigParser()
-    config_path = Path(__file__).parent.parent / 'config' / 'database.ini'
-    
-    if not config_path.exists():
-        raise FileNotFoundError(
-            f"Database configuration file not found at {config_path}. "
-            "Please copy database.ini.example to database.ini and update with your credentials."
-        )
-    
-    config.read(config_path)
-    
-    if 'postgresql' not in config:
-        raise KeyError("PostgreSQL configuration section not found in config file")
-    
-    db_params = config['postgresql']
-    
-    connection_string = (
-        f"postgresql+psycopg2://{db_params['user']}:{db_params['password']}"
-        f"@{db_params['host']}:{db_params['port']}/{db_params['database']}"
-    )
-    return create_engine(connection_string)
-
 def load_categories():
     """Load product categories from file."""
     logger = logging.getLogger(__name__)
@@ -105,49 +87,27 @@ def update_categories(connection, categories):
         stats = {
             'total': len(categories),
             'updated': 0,
-            'skipped': 0,
-            'errors': 0
+            'skipped': 0
         }
         
-        # Обновляем категории
-        for code, category in categories.items():
-            try:
-                result = connection.execute(
-                    text("""
-                        UPDATE producttypes 
-                        SET base_name = :category
-                        WHERE id = :code
-                        RETURNING id, base_name
-                    """),
-                    {
-                        "category": category,
-                        "code": code
-                    }
-                )
-                
-                updated_row = result.fetchone()
-                if updated_row:
-                    stats['updated'] += 1
-                    if stats['updated'] <= 5:  # Показываем первые 5 обновлений
-                        logger.info(f"Updated record {code}: {updated_row[1]}")
-                else:
-                    stats['skipped'] += 1
-                    logger.warning(f"No record found with id {code}")
-                
-                if stats['updated'] % 100 == 0:
-                    logger.info(f"Progress: {stats['updated']}/{stats['total']} records updated ({(stats['updated']/stats['total']*100):.1f}%)")
-                
-            except Exception as e:
-                logger.error(f"Error updating record {code}: {str(e)}")
-                stats['errors'] += 1
-                continue
+        def report(done, total):
+            logger.info(f"Progress: {done}/{total} records processed ({(done/total*100):.1f}%)")
+        
+        # Обновляем категории пачками: один UPDATE ... FROM (VALUES ...) на пачку
+        result = bulk_update(
+            connection, 'producttypes', 'id', ['base_name'], list(categories.items()),
+            progress=report
+        )
+        stats['updated'] = result.matched
+        stats['skipped'] = result.unmatched
+        for code in result.unmatched_keys:
+            logger.warning(f"No record found with id {code}")
         
         # Финальная статистика
         logger.info("\nUpdate completed. Statistics:")
         logger.info(f"- Total categories to process: {stats['total']}")
         logger.info(f"- Successfully updated: {stats['updated']}")
         logger.info(f"- Skipped (not found): {stats['skipped']}")
-        logger.info(f"- Errors: {stats['errors']}")
         
         # Проверка результатов
         logger.info("\nVerifying updates...")
@@ -169,7 +129,7 @@ def main():
     logger.info("Starting product categories update process")
     
     try:
-        engine = get_db_connection()
+        engine = get_engine()
         logger.info("Database connection established")
         
         with engine.begin() as connection:
@@ -5,34 +5,16 @@ Replaces values > 400 with random valid values from producttypes table.
 """
 
 import pandas as pd
-from sqlalchemy import create_engine, text
-import configparser
+from sqlalchemy import text
+import sys
 from pathlib import Path
 import random
 
-def get_db_connection():
-    """Create database connection from config file."""
-    config = configparser.ConfigParser()
-    config_path = Path(__file__).parent.parent / 'config' / 'database.ini'
-    
-    if not config_path.exists():
-        raise FileNotFoundError(
-            f"Database configuration file not found at {config_path}. "
-            "Please copy database.ini.example to database.ini and update with your credentials."
-        )
-    
-    config.read(config_path)
-    
-    if 'postgresql' not in config:
-        raise KeyError("PostgreSQL configuration section not found in config file")
-    
-    db_params = config['postgresql']
-    
-    connection_string = (
-        f"postgresql+psycopg2://{db_params['user']}:{db_params['password']}"
-        f"@{db_params['host']}:{db_params['port']}/{db_params['database']}"
-    )
-    return create_engine(connection_string)
+# Добавляем корневую директорию проекта в PYTHONPATH
+sys.path.append(str(Path(__file__).parent.parent))
+
+from utils.db_bulk import bulk_update
+from utils.db import get_engine
 
 def get_valid_type_ids(connection):
     """Get list of valid product type IDs from producttypes table."""
@@ -60,19 +42,16 @@ def update_product_types(connection, valid_type_ids):
         )
         products_to_update = [row[0] for row in result.fetchall()]
         
-        # Обновляем каждую запись случайным значением
-        updated_count = 0
-        for product_id in products_to_update:
-            new_type_id = random.choice(valid_type_ids)
-            connection.execute(
-                text("UPDATE products SET product_type_id = :new_type_id WHERE id = :product_id"),
-                {"new_type_id": new_type_id, "product_id": product_id}
-            )
-            updated_count += 1
-            if updated_count % 100 == 0:
-                print(f"Updated {updated_count} records...")
+        # Каждой записи назначается случайный тип; обновление идет пачками
+        rows = [(product_id, random.choice(valid_type_ids)) for product_id in products_to_update]
+        result = bulk_update(
+            connection, 'products', 'id', ['product_type_id'], rows,
+            progress=lambda done, total: print(f"Updated {done} records...")
+        )
+        if result.unmatched:
+            print(f"Warning: {result.unmatched} products disappeared during the update")
         
-        print(f"Successfully updated {records_to_update} records in products table")
+        print(f"Successfully updated {result.matched} records in products table")
         
     except Exception as e:
         print(f"Error updating product types: {str(e)}")
@@ -82,7 +61,7 @@ def main():
     """Main function for updating product types."""
     try:
         # Initialize database connection
-        engine = get_db_connection()
+        engine = get_engine()
         
         # Используем with для автоматического управления транзакцией
         with engine.begin() as connection:
@@ -6,10 +6,11 @@ Base generator class for all document templates.
 from pathlib import Path
 from abc import ABC, abstractmethod
 from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML, CSS
-from weasyprint.text.fonts import FontConfiguration
 import os
 
+from utils.pdf_bundle import BundleIndex, bookmark_css
+from utils.pdf_utils import get_asset_bundle, get_css, get_font_config
+
 
 class BaseGenerator(ABC):
     """Base class for all document generators."""
@@ -24,7 +25,8 @@ class BaseGenerator(ABC):
             
         self.base_dir = Path(__file__).parent.parent.parent
         self.template_dir = self._get_template_dir()
-        self.font_config = FontConfiguration()
+        self.font_config = get_font_config()
+        self.assets = get_asset_bundle()
         
         # Setup Jinja2 environment
         self.env = Environment(
@@ -47,8 +49,8 @@ class BaseGenerator(ABC):
         """
         pass
         
-    def generate_html(self, data, output_path):
-        """Generate HTML document from template and data."""
+    def render_html(self, data, output_path):
+        """Render HTML document from template and data without writing it to disk."""
         template = self.env.get_template("html/template.html")
         prepared_data = self._prepare_data(data)
         
@@ -59,40 +61,115 @@ class BaseGenerator(ABC):
         prepared_data["CSS_PATH"] = css_rel_path.replace("\\", "/")
         
         # Render HTML
-        html_content = template.render(**prepared_data)
+        return template.render(**prepared_data)
         
-        # Save HTML file
+    def _write_html(self, html_content, output_path):
+        """Save rendered HTML to disk."""
+        output_path = Path(output_path)
         output_path.parent.mkdir(parents=True, exist_ok=True)
         output_path.write_text(html_content, encoding='utf-8')
         
         print(f"HTML {self.TEMPLATE_NAME} generated: {output_path}")
         return output_path
         
-    def generate_pdf(self, html_path, pdf_path, base_url=None):
-        """Generate PDF from HTML using WeasyPrint."""
+    def generate_html(self, data, output_path):
+        """Generate HTML document from template and data."""
+        html_content = self.render_html(data, output_path)
+        return self._write_html(html_content, output_path)
+        
+    def generate_pdf(self, html_path, pdf_path, base_url=None, html_content=None):
+        """Generate PDF from HTML using WeasyPrint.
+        
+        If html_content is given, the PDF is rendered straight from the string and
+        html_path is only used to resolve relative resource links (it does not
+        have to exist on disk).
+        """
+        # WeasyPrint импортируется при рендеринге: пакет templates импортируется и без Pango
+        from weasyprint import HTML
+        
         html_path = Path(html_path)
         pdf_path = Path(pdf_path)
         pdf_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Load CSS
-        css = CSS(filename=str(self.css_path), font_config=self.font_config)
+        # Разобранный CSS берется из общего кэша процесса
+        css = get_css(self.css_path)
+        
+        if html_content is not None:
+            # Относительные пути в HTML считаются от места, где лежал бы HTML-файл
+            document = HTML(
+                string=html_content,
+                base_url=base_url or str(html_path),
+                url_fetcher=self.assets.url_fetcher
+            )
+        else:
+            document = HTML(filename=str(html_path), base_url=base_url, url_fetcher=self.assets.url_fetcher)
         
         # Convert to PDF
-        HTML(filename=str(html_path), base_url=base_url).write_pdf(
+        document.write_pdf(
             str(pdf_path),
             stylesheets=[css],
-            font_config=self.font_config
+            font_config=self.font_config,
+            cache=self.assets.image_cache
         )
         
         print(f"PDF {self.TEMPLATE_NAME} generated: {pdf_path}")
         return pdf_path
         
-    def generate_both(self, data, html_path, pdf_path, base_url=None):
-        """Generate both HTML and PDF versions of the document."""
-        html_path = self.generate_html(data, html_path)
-        pdf_path = self.generate_pdf(html_path, pdf_path, base_url)
+    def generate_both(self, data, html_path, pdf_path, base_url=None, persist_html=True):
+        """Generate both HTML and PDF versions of the document.
+        
+        The rendered HTML is passed to WeasyPrint in memory. It is written to
+        html_path after the PDF is done, or not at all with persist_html=False
+        (in that case None is returned instead of the HTML path).
+        """
+        html_content = self.render_html(data, html_path)
+        pdf_path = self.generate_pdf(html_path, pdf_path, base_url, html_content=html_content)
+        
+        if not persist_html:
+            return None, pdf_path
+        
+        html_path = self._write_html(html_content, html_path)
         return html_path, pdf_path
         
+    def bundle_entry(self, data, number):
+        """Return (document id, outline title) of the document at position `number` of a bundle."""
+        return str(number), f"{self.TEMPLATE_NAME} {number}"
+        
+    def generate_bundle(self, items, pdf_path, index_path=None):
+        """Generate many documents into one PDF with an outline entry per document.
+        
+        Each document is laid out separately and all pages are written as one
+        PDF, so fonts and images are embedded once. A JSON sidecar maps document
+        ids to page ranges (utils.pdf_bundle). Returns (pdf path, sidecar path).
+        """
+        from weasyprint import CSS, HTML
+        
+        pdf_path = Path(pdf_path)
+        pdf_path.parent.mkdir(parents=True, exist_ok=True)
+        css = get_css(self.css_path)
+        index = BundleIndex(pdf_path)
+        
+        documents = []
+        for number, data in enumerate(items, 1):
+            document_id, title = self.bundle_entry(data, number)
+            html_content = self.render_html(data, pdf_path)
+            outline = CSS(string=bookmark_css('body > :first-child', title))
+            document = HTML(
+                string=html_content,
+                base_url=str(pdf_path),
+                url_fetcher=self.assets.url_fetcher
+            ).render(stylesheets=[css, outline], font_config=self.font_config, cache=self.assets.image_cache)
+            documents.append(document)
+            index.add(document_id, len(document.pages))
+        
+        if not documents:
+            raise ValueError("No documents to bundle")
+        all_pages = [page for document in documents for page in document.pages]
+        documents[0].copy(all_pages).write_pdf(str(pdf_path))
+        
+        print(f"PDF {self.TEMPLATE_NAME} bundle generated: {pdf_path} ({len(documents)} documents)")
+        return pdf_path, index.write(index_path)
+        
     @abstractmethod
     def generate_template(self, html_path, pdf_path):
         """
@@ -1,24 +1,77 @@
 import os
 import json
 import random
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional
+from dataclasses import replace
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
 from decimal import Decimal
-import math
 
 from jinja2 import Environment, FileSystemLoader
-from weasyprint import HTML
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+
+from pdf_templates import fonts
+from pdf_templates.feiler_template import FeilerInvoiceTemplate
+from utils.invoice_model import Address, Invoice, LineItem, as_invoice, format_date
+from utils.line_items import format_cents
+from utils.pagination import PageLayout, Page, plan_pages
+from utils.pdf_bundle import BundleIndex, bookmark_css, outline_title
+from utils.pdf_utils import get_asset_bundle, get_font_config
+from utils.pipeline import DEFAULT_QUEUE_SIZE, PipelineResult, run_pipeline
+from utils.render_cache import RenderCache
+
+# Геометрия template.html в пунктах (1px = 0.75pt). Arial измеряется по
+# метрикам совместимого с ним Helvetica
+PAGE_BODY_HEIGHT = A4[1] - 35 * mm  # @page: поля 1.5cm сверху и 2cm снизу
+CONTENT_WIDTH = A4[0] - 40 * mm
+# Логотип 150x100pt, отступ 25px, колонка реквизитов (заголовок + 7 строк по 15.3pt), отступ 35px
+HTML_HEADER_HEIGHT = 103 + 18.75 + 139 + 26.25
+# Ship to: 6 строк по 10.8pt, строки 8pt (налог, переписка, накладная) со схлопнутыми отступами, отступ 35px
+HTML_SHIPPING_HEIGHT = 6 * 10.8 + 3 * 9.6 + 11.25 * 2 + 9 + 26.25
+HTML_LAYOUT = PageLayout(
+    first_page_space=PAGE_BODY_HEIGHT - HTML_HEADER_HEIGHT - HTML_SHIPPING_HEIGHT,
+    page_space=PAGE_BODY_HEIGHT - HTML_HEADER_HEIGHT,
+    table_header_height=8.5 * 1.2 + 7.5 + 0.75,  # th: 8.5pt, padding 5px, рамки
+    table_end_height=18.75,  # margin-bottom: 25px
+    totals_height=4 * 12.3 + 5.25 + 7.5 + 22.5 + 3 * 10.8 + 7.5  # 4 строки итогов + Terms of Delivery
+)
+# Колонка Design (35%) и строка HS-Code (colspan 6) за вычетом padding 3px
+HTML_DESIGN_WIDTH = 0.35 * CONTENT_WIDTH - 4.5
+HTML_HS_CODE_WIDTH = 0.96 * CONTENT_WIDTH - 4.5
+HTML_CELL_PADDING = 3  # 2px сверху и снизу
+
+
+def html_item_height(item: LineItem) -> float:
+    """Height of one item (main, article and HS-Code rows) in template.html."""
+    design_lines = fonts.line_count(str(item.design), 'Helvetica-Bold', 8.5, HTML_DESIGN_WIDTH)
+    article_lines = fonts.line_count(f"Article No.: {item.article_no}", 'Helvetica', 7.5, HTML_DESIGN_WIDTH)
+    hs_code_lines = fonts.line_count(str(item.hs_code), 'Helvetica', 7.5, HTML_HS_CODE_WIDTH)
+    return (design_lines * 10.2 + article_lines * 8.25 + hs_code_lines * 8.25
+            + 3 * HTML_CELL_PADDING)
+
 
 class FeilerInvoiceGenerator:
-    def __init__(self):
+    # Версия генератора входит в ключ кэша рендеринга: увеличивать при изменении
+    # логики рендеринга, которое не отражается в HTML
+    GENERATOR_VERSION = "1"
+    
+    # weasyprint - эталонный HTML-путь, reportlab - быстрый рендеринг на холсте
+    BACKENDS = ('weasyprint', 'reportlab')
+    
+    def __init__(self, backend: str = 'weasyprint'):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}. Available: {', '.join(self.BACKENDS)}")
+        self.backend = backend
         self.template_dir = os.path.dirname(os.path.abspath(__file__))
         self.env = Environment(loader=FileSystemLoader(self.template_dir))
         self.template = self.env.get_template('template.html')
-        self.items_per_page = {
-            1: 8,  # На первой странице 8 записей
-            'other': 12  # На остальных страницах по 12 записей
-        }
+        # WeasyPrint (и Pango) нужен только HTML-бэкенду: reportlab работает без него
+        self.font_config = get_font_config() if backend == 'weasyprint' else None
+        self.assets = get_asset_bundle()
         self.load_anonymized_data()
+        # Холст ReportLab получает те же подготовленные данные, что и HTML-шаблон
+        self.canvas_template = FeilerInvoiceTemplate() if backend == 'reportlab' else None
         
     def load_anonymized_data(self):
         """Load anonymized data from JSON file."""
@@ -69,169 +122,380 @@ class FeilerInvoiceGenerator:
         
     def format_date(self, date: datetime) -> str:
         """Format date according to Feiler standards."""
-        return date.strftime("%d.%m.%Y")
+        return format_date(date)
         
-    def calculate_total(self, items: List[Dict]) -> float:
+    def calculate_total_cents(self, items: Sequence[LineItem]) -> int:
+        """Calculate total amount from items in integer cents."""
+        # Суммы в центах посчитаны при подготовке инвойса: итог всегда
+        # совпадает с суммой строк, без накопления ошибки float
+        return sum(item.amount_cents or 0 for item in items)
+        
+    def calculate_total(self, items: Sequence[LineItem]) -> float:
         """Calculate total amount from items."""
-        total = 0.0
-        for item in items:
-            amount_str = str(item.get('amount', '0.0'))
-            # Заменяем запятую на точку для корректного преобразования
-            amount_str = amount_str.replace(',', '.')
-            try:
-                amount = float(amount_str)
-                total += amount
-            except ValueError:
-                print(f"Warning: Could not convert amount '{amount_str}' to float, using 0.0")
-                continue
-        return total
-        
-    def calculate_pages(self, total_items: int) -> int:
-        """Calculate total number of pages needed."""
-        if total_items <= self.items_per_page[1]:
-            return 1
-        remaining_items = total_items - self.items_per_page[1]
-        return 1 + math.ceil(remaining_items / self.items_per_page['other'])
-        
-    def split_items_by_pages(self, items: List[Dict]) -> List[List[Dict]]:
-        """Split items into pages according to Feiler's layout rules."""
-        if not items:
-            return [[]]
-            
-        pages = []
-        remaining_items = items[:]
-        
-        # Первая страница
-        first_page = remaining_items[:self.items_per_page[1]]
-        pages.append(first_page)
-        remaining_items = remaining_items[self.items_per_page[1]:]
-        
-        # Остальные страницы
-        while remaining_items:
-            page_items = remaining_items[:self.items_per_page['other']]
-            pages.append(page_items)
-            remaining_items = remaining_items[self.items_per_page['other']:]
-            
-        return pages
-        
-    def prepare_item_data(self, items: List[Dict]) -> List[Dict]:
-        """Prepare items data for the template."""
-        prepared_items = []
-        for item in items:
-            # Получаем данные из всех трёх строк
-            first_line = item['lines'][0]['content']
-            second_line = item['lines'][1]['content']
-            third_line = item['lines'][2]['content']
-            
-            # Каждая 20-я позиция будет иметь пустое поле Color
-            position = item['item_position']
-            color = '.' if position % 20 == 0 else first_line.get('color_id', '.')
-            color_name = '.' if position % 20 == 0 else second_line.get('color', '')
-            
-            prepared_items.append({
-                'position': position,  # Берем position с верхнего уровня
-                'design': first_line.get('collection', ''),  # Только название коллекции
-                'article_no': second_line.get('value', ''),  # Артикул из второй строки
-                'size': first_line.get('size', ''),
-                'color': color,  # ID цвета в первой строке или точка для каждой 20-й позиции
-                'color_name': color_name,  # Название цвета во второй строке или точка для каждой 20-й позиции
-                'quantity': first_line.get('quantity', ''),
-                'price': first_line.get('price', '0,00'),
-                'amount': item.get('amount', '0,00'),  # Берем amount с верхнего уровня
-                'hs_code': f"{third_line.get('prefix', '')}: {third_line.get('value', '')}"  # Полная строка HS-Code
-            })
-        return prepared_items
-        
-    def generate(self, data: Dict, output_html: str, output_pdf: str, anonymize: bool = True) -> tuple[str, str]:
-        """Generate invoice in both HTML and PDF formats."""
-        # Подготовка данных для шаблона
-        items = data.get('items', [])
-        total_amount = self.calculate_total(items)
-        total_pages = self.calculate_pages(len(items))
-        pages_items = self.split_items_by_pages(items)
-        
-        # Форматируем суммы
-        formatted_total = self.format_currency(total_amount)
-        transport_charge = 30.00
-        invoice_net = total_amount + transport_charge
-        invoice_gross = invoice_net
+        return self.calculate_total_cents(items) / 100
+        
+    def plan_pages(self, invoice: Invoice) -> List[Page]:
+        """Split the invoice into pages of the active backend by measured item heights."""
+        if self.canvas_template is not None:
+            return self.canvas_template.plan_pages(invoice)
+        return plan_pages(invoice.items, HTML_LAYOUT, html_item_height,
+                          totals=invoice.total_cents is not None)
+        
+    def prepare_invoice(self, data, anonymize: bool = True) -> Invoice:
+        """Return the invoice exactly as it is rendered (anonymized header, color gaps).
+        
+        Accepts an Invoice or a legacy dict. Line items are shared with the input,
+        only the changed positions are replaced.
+        """
+        invoice = as_invoice(data)
+        changes = {}
         
         # Получаем анонимизированные данные, если требуется
         if anonymize:
             company_data = self.get_random_company()
             seller_data = self.get_random_seller()
-            correspondence_person = self.get_random_correspondence_person()
-        else:
-            company_data = {
-                'name': data.get('recipient_name'),
-                'street': data.get('recipient_street'),
-                'postal_code': data.get('recipient_postal_code'),
-                'city': data.get('recipient_city'),
-                'country': data.get('recipient_country')
-            }
-            seller_data = {
-                'name': data.get('seller'),
-                'contact': data.get('contact'),
-                'agent': data.get('agent')
-            }
-            correspondence_person = data.get('correspondence_person')
+            changes.update(
+                recipient=Address(
+                    name=company_data['name'],
+                    street=company_data['street'],
+                    postal_code=company_data['postal_code'],
+                    city=company_data['city'],
+                    country=company_data['country']
+                ),
+                shipping=None,
+                seller=seller_data['name'],
+                contact=seller_data['contact'],
+                agent=seller_data['agent'],
+                correspondence_person=self.get_random_correspondence_person()
+            )
+        
+        # Каждая 20-я позиция будет иметь пустое поле Color
+        if any(self._without_color(item) for item in invoice.items):
+            changes['items'] = tuple(
+                replace(item, color='.', color_name='.') if self._without_color(item) else item
+                for item in invoice.items
+            )
+        
+        return invoice.replace(**changes) if changes else invoice
+        
+    @staticmethod
+    def _without_color(item: LineItem) -> bool:
+        return isinstance(item.position, int) and item.position % 20 == 0
+        
+    def prepare_template_data(self, data, anonymize: bool = True) -> tuple[Dict, List[Dict]]:
+        """Prepare document-level template data and the list of pages."""
+        invoice = self.prepare_invoice(data, anonymize=anonymize)
+        return self.template_data(invoice)
+        
+    def template_data(self, invoice: Invoice) -> tuple[Dict, List[Dict]]:
+        """Build template variables and pages from a prepared invoice."""
+        planned = plan_pages(invoice.items, HTML_LAYOUT, html_item_height,
+                             totals=invoice.total_cents is not None)
+        
+        # Форматируем суммы (в центах, чтобы итоги не расходились из-за float)
+        formatted_total = invoice_net = invoice_gross = ''
+        if invoice.total_cents is not None:
+            formatted_total, invoice_net, invoice_gross = format_cents(
+                [invoice.total_cents, invoice.net_cents, invoice.gross_cents], locale='en'
+            ).tolist()
+        
+        recipient = invoice.recipient
+        shipping = invoice.ship_to
+        # Общие для всех страниц данные собираются один раз на документ
+        template_data = {
+            'logo_path': self.assets.url('feiler/logo'),
+            'recipient_name': recipient.name,
+            'recipient_street': recipient.street,
+            'recipient_city': recipient.city_line,
+            'recipient_country': recipient.country,
+            'invoice_date': format_date(invoice.invoice_date),
+            'customer_number': invoice.customer_number,
+            'invoice_number': invoice.invoice_number,
+            'seller': invoice.seller,
+            'contact': invoice.contact,
+            'agent': invoice.agent,
+            'order': invoice.order,
+            'total_amount': formatted_total,
+            'invoice_net': invoice_net,
+            'invoice_gross': invoice_gross,
+            'correspondence_number': invoice.correspondence_number,
+            'correspondence_date': format_date(invoice.correspondence_date),
+            'correspondence_person': invoice.correspondence_person,
+            'delivery_note_number': invoice.delivery_note_number,
+            'delivery_date': format_date(invoice.delivery_date),
+            'total_pages': len(planned),
+            'shipping_name': shipping.name,
+            'shipping_street': shipping.street,
+            'shipping_city': shipping.city_line,
+            'shipping_country': shipping.country
+        }
+        
+        # Постраничные данные: диапазон позиций и флаги страницы.
+        # Позиции передаются в шаблон как есть, без промежуточных словарей и копий списков
+        pages = []
+        for page in planned:
+            pages.append({
+                'current_page': page.number,
+                'page_items': page.items or None,
+                'is_first_page': page.is_first,
+                'is_last_page': page.is_last,
+                'has_totals': page.has_totals
+            })
+        
+        return template_data, pages
+        
+    def render_html(self, data, anonymize: bool = True, single_document: bool = True) -> str:
+        """Render the invoice HTML.
+        
+        By default the whole invoice is rendered in one template pass as a single
+        document with one stylesheet. With ``single_document=False`` every page is
+        rendered as a separate HTML document and the documents are concatenated.
+        """
+        template_data, pages = self.prepare_template_data(data, anonymize=anonymize)
+        
+        if single_document:
+            return self.template.render(pages=pages, **template_data)
         
         # Генерация HTML для каждой страницы
         all_pages_html = []
-        for page_num, page_items in enumerate(pages_items, 1):
-            is_last_page = page_num == len(pages_items)
-            
-            template_data = {
-                'logo_path': os.path.join(self.template_dir, 'assets', 'feiler_logo.svg'),
-                'recipient_name': company_data['name'],
-                'recipient_street': company_data['street'],
-                'recipient_city': f"{company_data['postal_code']} {company_data['city']}",
-                'recipient_country': company_data['country'],
-                'invoice_date': self.format_date(data.get('invoice_date')),
-                'customer_number': data.get('customer_number'),
-                'invoice_number': data.get('invoice_number'),
-                'seller': seller_data['name'],
-                'contact': seller_data['contact'],
-                'agent': seller_data['agent'],
-                'order': data.get('order'),
-                'items': self.prepare_item_data(page_items) if page_items else None,
-                'total_amount': formatted_total if is_last_page else None,
-                'invoice_net': self.format_currency(invoice_net) if is_last_page else None,
-                'invoice_gross': self.format_currency(invoice_gross) if is_last_page else None,
-                'correspondence_number': data.get('correspondence_number'),
-                'correspondence_date': self.format_date(data.get('correspondence_date')) if data.get('correspondence_date') else '',
-                'correspondence_person': correspondence_person,
-                'delivery_note_number': data.get('delivery_note_number'),
-                'delivery_date': self.format_date(data.get('delivery_date')) if data.get('delivery_date') else '',
-                'current_page': page_num,
-                'total_pages': total_pages,
-                'is_first_page': page_num == 1,
-                'is_last_page': is_last_page,
-                'shipping_name': company_data['name'],
-                'shipping_street': company_data['street'],
-                'shipping_city': f"{company_data['postal_code']} {company_data['city']}",
-                'shipping_country': company_data['country']
-            }
-            
-            page_html = self.template.render(**template_data)
-            all_pages_html.append(page_html)
+        for page in pages:
+            all_pages_html.append(self.template.render(pages=[page], **template_data))
             
             # Добавляем разрыв страницы между страницами, кроме последней
-            if not is_last_page:
+            if not page['is_last_page']:
                 all_pages_html.append('<div style="page-break-after: always;"></div>')
         
         # Объединяем все страницы в один HTML
-        combined_html = '\n'.join(all_pages_html)
+        return '\n'.join(all_pages_html)
+        
+    def _write_pdf(self, html: str, output_pdf: str) -> None:
+        """Render HTML to a PDF file with WeasyPrint."""
+        from weasyprint import HTML
         
-        # Сохраняем HTML
-        with open(output_html, 'w', encoding='utf-8') as f:
-            f.write(combined_html)
-            
         # Генерация PDF с правильными размерами страницы и шрифтами
-        HTML(string=combined_html).write_pdf(
+        HTML(string=html, url_fetcher=self.assets.url_fetcher).write_pdf(
             output_pdf,
             stylesheets=[],
-            optimize_size=('fonts', 'images')
+            font_config=self.font_config,
+            optimize_size=('fonts', 'images'),
+            cache=self.assets.image_cache
         )
         
-        return output_html, output_pdf 
\ No newline at end of file
+    def render_cache_key(self, cache, html: str) -> str:
+        """Build the render cache key for an already rendered invoice HTML.
+        
+        The HTML captures both the template source and the prepared invoice data;
+        the logo, generator version and WeasyPrint version are added on top.
+        """
+        from weasyprint import __version__ as WEASYPRINT_VERSION
+        
+        return cache.make_key(
+            type(self).__name__,
+            self.GENERATOR_VERSION,
+            WEASYPRINT_VERSION,
+            html,
+            self.assets.load('feiler/logo')
+        )
+        
+    def generate(self, data, output_html: str, output_pdf: str, anonymize: bool = True,
+                 single_document: bool = True, cache=None) -> tuple[str, str]:
+        """Generate invoice in both HTML and PDF formats.
+        
+        If a RenderCache is given, WeasyPrint is skipped when a PDF for exactly
+        the same inputs is already cached. With the reportlab backend the PDF is
+        drawn on a ReportLab canvas from the same prepared data.
+        """
+        if self.backend == 'reportlab':
+            return self._generate_canvas(data, output_html, output_pdf, anonymize=anonymize, cache=cache)
+        
+        combined_html = self.render_html(data, anonymize=anonymize, single_document=single_document)
+        
+        # Сохраняем HTML
+        with open(output_html, 'w', encoding='utf-8') as f:
+            f.write(combined_html)
+        
+        if cache is None:
+            self._write_pdf(combined_html, output_pdf)
+        else:
+            key = self.render_cache_key(cache, combined_html)
+            cache.render(key, output_pdf, lambda path: self._write_pdf(combined_html, path))
+        
+        return output_html, output_pdf
+        
+    def canvas_cache_key(self, cache, invoice: Invoice) -> str:
+        """Build the render cache key for the ReportLab backend.
+        
+        Like the HTML string on the WeasyPrint path, the key holds the fields as
+        they are printed (formatted dates, amounts), not the raw invoice, whose
+        datetimes may differ below the printed precision.
+        """
+        return self.canvas_template.cache_key(cache, invoice, type(self).__name__, self.GENERATOR_VERSION)
+        
+    def _generate_canvas(self, data, output_html: str, output_pdf: str, anonymize: bool = True,
+                         cache=None) -> tuple[str, str]:
+        """Generate the PDF with ReportLab; HTML is still rendered from the same data as a reference."""
+        invoice = self.prepare_invoice(data, anonymize=anonymize)
+        
+        if output_html:
+            template_data, pages = self.template_data(invoice)
+            with open(output_html, 'w', encoding='utf-8') as f:
+                f.write(self.template.render(pages=pages, **template_data))
+        
+        def render(path):
+            self.canvas_template.render_invoice(invoice, path)
+        
+        if cache is None:
+            render(output_pdf)
+        else:
+            cache.render(self.canvas_cache_key(cache, invoice), output_pdf, render)
+        
+        return output_html, output_pdf
+
+    def generate_bundle(self, invoices: Iterable, output_pdf: str, anonymize: bool = True,
+                        index_path: Optional[str] = None) -> tuple[str, str]:
+        """Generate many invoices into one PDF with an outline entry per invoice.
+        
+        Every invoice is laid out as its own document (page numbers restart per
+        invoice) and all pages are written as one PDF, so fonts and the logo are
+        embedded once per bundle. A JSON sidecar maps invoice numbers to page
+        ranges (utils.pdf_bundle). Returns (pdf path, sidecar path).
+        """
+        prepared = (self.prepare_invoice(data, anonymize=anonymize) for data in invoices)
+        if self.backend == 'reportlab':
+            return output_pdf, str(self.canvas_template.render_bundle(prepared, output_pdf, index_path))
+        
+        from weasyprint import CSS, HTML
+        
+        index = BundleIndex(output_pdf)
+        documents = []
+        for number, invoice in enumerate(prepared, 1):
+            template_data, pages = self.template_data(invoice)
+            html = self.template.render(pages=pages, **template_data)
+            # Закладка оглавления на шапке первой страницы инвойса
+            outline = CSS(string=bookmark_css('body > .header:first-child', outline_title(invoice, number)))
+            document = HTML(string=html, url_fetcher=self.assets.url_fetcher).render(
+                stylesheets=[outline],
+                font_config=self.font_config,
+                cache=self.assets.image_cache
+            )
+            documents.append(document)
+            index.add(invoice.invoice_number, len(document.pages))
+        
+        if not documents:
+            raise ValueError("No invoices to bundle")
+        all_pages = [page for document in documents for page in document.pages]
+        documents[0].copy(all_pages).write_pdf(output_pdf, optimize_size=('fonts', 'images'))
+        return output_pdf, str(index.write(index_path))
+
+    def generate_many(self, invoices: Iterable, out_dir: str, workers: Optional[int] = None,
+                      anonymize: bool = True, chunksize: int = 4, cache=None) -> List[tuple[str, str]]:
+        """Generate many invoices in a pool of pre-warmed worker processes.
+
+        Each worker builds its own generator (Jinja environment, template and
+        font configuration) with the same backend once and then renders all invoices assigned to it.
+        Files are named ``invoice_<invoice_number>.html/.pdf`` inside ``out_dir``.
+        Returns the list of (html, pdf) paths in the order of ``invoices``.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+
+        tasks = []
+        used_names = set()
+        for index, data in enumerate(invoices, 1):
+            # Инвойс приводится к модели один раз, в процесс пула уходит уже готовый объект
+            data = as_invoice(data)
+            name = f"invoice_{data.invoice_number or index}"
+            # Одинаковые номера инвойсов не должны перезаписывать друг друга
+            if name in used_names:
+                name = f"{name}_{index}"
+            used_names.add(name)
+            tasks.append((
+                data,
+                os.path.join(out_dir, f'{name}.html'),
+                os.path.join(out_dir, f'{name}.pdf'),
+                anonymize,
+                cache is not None
+            ))
+
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(tasks) <= 1:
+            return [self.generate(data, html, pdf, anonymize=anon, cache=cache)
+                    for data, html, pdf, anon, _ in tasks]
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.backend, _cache_settings(cache))) as pool:
+            return _count_cache_results(pool.map(_render_invoice, tasks, chunksize=chunksize), cache)
+
+    def generate_pipeline(self, source: Iterable, out_dir: str, prepare: Optional[Callable] = None,
+                          workers: Optional[int] = None, anonymize: bool = True, cache=None,
+                          queue_size: int = DEFAULT_QUEUE_SIZE) -> PipelineResult:
+        """Generate invoices while they are still being fetched (utils.pipeline).
+
+        `source` is read in its own thread. `prepare(item)` returns a
+        (file name, invoice data) pair and runs in a second thread together with
+        prepare_invoice (anonymization), so random values are drawn in source
+        order exactly as in serial generation. PDFs are rendered by a pool of
+        pre-warmed workers as in generate_many. Returns the (html, pdf) paths in
+        source order and the throughput counters of every stage.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        prepare = prepare or (lambda item: item)
+
+        def prepare_task(item):
+            name, data = prepare(item)
+            invoice = self.prepare_invoice(data, anonymize=anonymize)
+            # Инвойс уже анонимизирован: процесс пула только рендерит
+            return (
+                invoice,
+                os.path.join(out_dir, f'{name}.html'),
+                os.path.join(out_dir, f'{name}.pdf'),
+                False,
+                cache is not None
+            )
+
+        result = run_pipeline(source, prepare_task, _render_invoice, workers=workers, queue_size=queue_size,
+                              initializer=_init_worker, initargs=(self.backend, _cache_settings(cache)))
+        result.results = _count_cache_results(result.results, cache)
+        return result
+
+
+# Генератор и кэш рендеринга, созданные один раз в каждом процессе пула
+_worker_generator = None
+_worker_cache = None
+
+
+def _cache_settings(cache):
+    return cache.settings() if cache is not None else None
+
+
+def _count_cache_results(rendered, cache):
+    """Add the hit flags returned by pool workers to the parent cache counters; returns the paths."""
+    paths = []
+    for result, hit in rendered:
+        if cache is not None and hit is not None:
+            if hit:
+                cache.hits += 1
+            else:
+                cache.misses += 1
+        paths.append(result)
+    return paths
+
+
+def _init_worker(backend='weasyprint', cache_settings=None):
+    """Build the generator and the render cache once per worker process."""
+    global _worker_generator, _worker_cache
+    if backend == 'reportlab':
+        # Шрифты и таблицы ширин глифов загружаются до первой задачи
+        fonts.preload()
+    _worker_generator = FeilerInvoiceGenerator(backend=backend)
+    _worker_generator.assets.preload()
+    # Кэш живет весь срок процесса: размер кэша и хэши файлов шаблона считаются один раз
+    _worker_cache = RenderCache(**cache_settings) if cache_settings else None
+
+
+def _render_invoice(task):
+    """Render a single invoice in a pool worker; returns ((html, pdf), cache hit or None)."""
+    data, output_html, output_pdf, anonymize, use_cache = task
+    cache = _worker_cache if use_cache else None
+    hits = cache.hits if cache is not None else 0
+    result = _worker_generator.generate(data, output_html, output_pdf, anonymize=anonymize, cache=cache)
+    return result, (cache.hits > hits if cache is not None else None) 
\ No newline at end of file
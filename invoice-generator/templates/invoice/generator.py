@@ -3,10 +3,40 @@
 Invoice generator implementation.
 """
 
-import os
-import math
-from pathlib import Path
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+
 from ..base.generator import BaseGenerator
+from pdf_templates import fonts
+from utils.invoice_model import as_invoice, format_date
+from utils.pagination import PageLayout, plan_pages
+from utils.pdf_bundle import outline_title
+
+# Геометрия html/styles.css (печать) в пунктах. Arial измеряется по метрикам Helvetica
+PAGE_BODY_HEIGHT = A4[1] - 50 * mm  # @page: поля 2.5cm сверху и снизу
+CONTENT_WIDTH = A4[0] - 80 * mm  # поля 2cm и padding .page 20mm
+LINE_HEIGHT = 11 * 1.3  # body: 11pt, line-height 1.3
+DETAILS_ROW_HEIGHT = LINE_HEIGHT + 3  # padding 2px 0
+# Логотип 180px (135x45pt) + 2cm; колонка реквизитов: заголовок, 7 строк, номер страницы; отступ 2cm
+FIRST_PAGE_HEADER_HEIGHT = (48 + 20 * mm) + (14 * 1.3 + 10 * mm + 7 * DETAILS_ROW_HEIGHT + 5 * mm
+                                             + LINE_HEIGHT) + 20 * mm
+# Ship to, адрес (4 строки по 11pt * 1.4), три строки 9pt * 1.4 с отступами 0.3cm, отступ 2cm
+SHIPPING_HEIGHT = (LINE_HEIGHT + 5 * mm) + (4 * 15.4 + 10 * mm) + (3 * 12.6 + 2 * 3 * mm) + 20 * mm
+# Последующие страницы: номер инвойса и дата, номер страницы, отступ 20mm
+PAGE_HEADER_HEIGHT = 10 * mm + 2 * DETAILS_ROW_HEIGHT + 5 * mm + LINE_HEIGHT + 20 * mm
+HTML_LAYOUT = PageLayout(
+    # padding .page 20mm сверху и снизу (30mm сверху на последующих страницах)
+    first_page_space=PAGE_BODY_HEIGHT - 40 * mm - FIRST_PAGE_HEADER_HEIGHT - SHIPPING_HEIGHT,
+    page_space=PAGE_BODY_HEIGHT - 50 * mm - PAGE_HEADER_HEIGHT,
+    table_header_height=2 * LINE_HEIGHT + 7.5 + 0.75  # Amount<br>(EUR), padding 5px, рамка
+)
+HTML_DESIGN_WIDTH = 0.25 * CONTENT_WIDTH - 7.5  # колонка Design за вычетом padding 5px
+
+
+def html_item_height(item):
+    """Height of one product row of html/template.html (the Design cell may wrap)."""
+    lines = fonts.line_count(str(item.design), 'Helvetica', 11, HTML_DESIGN_WIDTH)
+    return lines * LINE_HEIGHT + 7.5
 
 
 class InvoiceGenerator(BaseGenerator):
@@ -19,85 +49,74 @@ class InvoiceGenerator(BaseGenerator):
         """Initialize the invoice generator."""
         super().__init__()
         
-        # Количество товаров на первой и последующих страницах
-        self.products_per_first_page = 8
-        self.products_per_page = 12
-        
         # Путь к логотипу
         self.logo_path = self.base_dir / "data" / "sample" / "logo_feiler.png"
+        self.logo_url = self.assets.url("invoice/logo") if self.assets.exists("invoice/logo") else None
         
     def _prepare_data(self, data):
         """Prepare data for template rendering."""
-        prepared_data = data.copy() if data else {}
+        invoice = as_invoice(data)
         
-        # Convert newlines in addresses to HTML breaks
-        if "CUSTOMER_FULL_ADDRESS" in prepared_data:
-            prepared_data["CUSTOMER_FULL_ADDRESS_HTML"] = prepared_data["CUSTOMER_FULL_ADDRESS"].replace("\n", "<br>")
-        if "SHIPPING_ADDRESS" in prepared_data:
-            prepared_data["SHIPPING_ADDRESS_HTML"] = prepared_data["SHIPPING_ADDRESS"].replace("\n", "<br>")
+        # Переменные шаблона строятся из модели инвойса, без копирования входных данных
+        prepared_data = {
+            "SENDER": invoice.sender,
+            "CUSTOMER_FULL_ADDRESS_HTML": "<br>".join(line for line in invoice.recipient.lines() if line),
+            "SHIPPING_ADDRESS_HTML": "<br>".join(line for line in invoice.ship_to.lines() if line),
+            "DATE": format_date(invoice.invoice_date),
+            "CUSTOMER_NO": invoice.customer_number,
+            "INVOICE_NO": invoice.invoice_number,
+            "ORDER": invoice.order,
+            "AGENT": invoice.agent,
+            "SELLER": invoice.seller,
+            "CONTACT": invoice.contact,
+            "VAT_INFO": invoice.vat_info,
+            "CORRESPONDENCE": invoice.correspondence_text(),
+            "DELIVERY_NOTE": invoice.delivery_text()
+        }
             
-        # Разделяем товары на страницы
-        products = prepared_data.get("products", [])
-        
-        # Товары для первой страницы
-        first_page_products = products[:self.products_per_first_page]
-        remaining_products = products[self.products_per_first_page:]
+        # Разбиваем товары на страницы по измеренной высоте строк
+        planned = plan_pages(invoice.items, HTML_LAYOUT, html_item_height, totals=False)
         
         # Генерируем HTML для первой страницы
         first_page_html = []
-        for product in first_page_products:
+        for product in planned[0].items:
             row = self._generate_product_row(product)
             first_page_html.append(row)
         prepared_data["FIRST_PAGE_PRODUCTS"] = "\n".join(first_page_html)
         
         # Генерируем последующие страницы
-        if remaining_products:
-            subsequent_pages = []
-            total_remaining = len(remaining_products)
-            num_subsequent_pages = math.ceil(total_remaining / self.products_per_page)
-            
-            for page_num in range(num_subsequent_pages):
-                start_idx = page_num * self.products_per_page
-                end_idx = start_idx + self.products_per_page
-                page_products = remaining_products[start_idx:end_idx]
-                
-                # Генерируем HTML для страницы
-                page_html = self._generate_subsequent_page(
-                    page_products,
-                    page_num + 2,  # +2 потому что первая страница уже есть
-                    len(products)
-                )
-                subsequent_pages.append(page_html)
-            
-            prepared_data["SUBSEQUENT_PAGES"] = "\n".join(subsequent_pages)
-        else:
-            prepared_data["SUBSEQUENT_PAGES"] = ""
+        subsequent_pages = []
+        for page in planned[1:]:
+            page_html = self._generate_subsequent_page(page.items, page.number, len(invoice.items))
+            subsequent_pages.append(page_html)
+        prepared_data["SUBSEQUENT_PAGES"] = "\n".join(subsequent_pages)
             
         # Общее количество страниц
-        total_pages = 1 + math.ceil(max(0, len(products) - self.products_per_first_page) / self.products_per_page)
-        prepared_data["TOTAL_PAGES"] = str(total_pages)
+        prepared_data["TOTAL_PAGES"] = str(len(planned))
         
-        # Добавляем путь к логотипу
-        if self.logo_path.exists():
-            prepared_data["LOGO_PATH"] = os.path.relpath(
-                self.logo_path,
-                Path(self.template_dir) / "html"
-            ).replace("\\", "/")
+        # Логотип отдается из общего набора ресурсов процесса
+        if self.logo_url:
+            prepared_data["LOGO_PATH"] = self.logo_url
             
         return prepared_data
         
+    def bundle_entry(self, data, number):
+        """Invoices are listed in a bundle by invoice number."""
+        invoice = as_invoice(data)
+        return invoice.invoice_number, outline_title(invoice, number)
+        
     def _generate_product_row(self, product):
         """Generate HTML for a single product row."""
         return f"""
         <tr>
-            <td class="pos">{product.get('pos', '')}</td>
-            <td class="design">{product.get('design', '')}</td>
-            <td class="size">{product.get('size', '')}</td>
-            <td class="color">{product.get('color', '')}</td>
-            <td class="quantity">{product.get('quantity', '')}</td>
-            <td class="qu">{product.get('qu', '')}</td>
-            <td class="price">{product.get('price', '')}</td>
-            <td class="amount">{product.get('amount', '')}</td>
+            <td class="pos">{product.position}</td>
+            <td class="design">{product.design}</td>
+            <td class="size">{product.size}</td>
+            <td class="color">{product.color}</td>
+            <td class="quantity">{product.quantity}</td>
+            <td class="qu">{product.unit}</td>
+            <td class="price">{product.price}</td>
+            <td class="amount">{product.amount}</td>
         </tr>
         """
         
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Process-wide PostgreSQL access for all scripts.
+
+Connection parameters come from ``config/database.ini`` (section
+``[postgresql]``). One SQLAlchemy engine per process owns a connection pool
+with pre-ping (stale connections are replaced transparently) and a server-side
+``statement_timeout``, so a bulk run reuses a handful of connections instead
+of opening one per invoice. Scripts that work with DB-API cursors borrow a
+pooled psycopg2 connection with ``connection()``.
+
+Hot lookups are registered once with ``prepare_statement`` and run with
+``execute_prepared``: each pooled connection sends ``PREPARE`` the first time
+it runs a statement and only ``EXECUTE`` afterwards, so the query is parsed
+and planned once per connection.
+"""
+
+import configparser
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Connection
+
+CONFIG_PATH = Path(__file__).parent.parent / 'config' / 'database.ini'
+
+# Значения по умолчанию для необязательных ключей [postgresql]
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 5
+DEFAULT_STATEMENT_TIMEOUT_MS = 300000
+
+_lock = threading.Lock()
+_engine = None
+_engine_pid = None
+# Имя подготовленного запроса -> текст запроса с параметрами $1, $2, ...
+_statements: Dict[str, str] = {}
+
+
+def load_config(config_path: Optional[Path] = None) -> configparser.SectionProxy:
+    """Read the [postgresql] section of the database config."""
+    config_path = Path(config_path) if config_path else CONFIG_PATH
+    if not config_path.exists():
+        raise FileNotFoundError(
+            f"Database configuration file not found at {config_path}. "
+            "Please copy database.ini.example to database.ini and update with your credentials."
+        )
+
+    config = configparser.ConfigParser()
+    config.read(config_path)
+    if 'postgresql' not in config:
+        raise KeyError("PostgreSQL configuration section not found in config file")
+    return config['postgresql']
+
+
+def get_engine(config_path: Optional[Path] = None):
+    """Return the engine of this process, creating it on first use."""
+    global _engine, _engine_pid
+    with _lock:
+        if _engine is not None and _engine_pid == os.getpid():
+            return _engine
+        if _engine is not None:
+            # Движок унаследован от родительского процесса: его соединения не трогаем
+            _engine.dispose(close=False)
+
+        params = load_config(config_path)
+        timeout = params.getint('statement_timeout', DEFAULT_STATEMENT_TIMEOUT_MS)
+        _engine = create_engine(
+            f"postgresql+psycopg2://{params['user']}:{params['password']}"
+            f"@{params['host']}:{params['port']}/{params['database']}",
+            pool_size=params.getint('pool_size', DEFAULT_POOL_SIZE),
+            max_overflow=params.getint('max_overflow', DEFAULT_MAX_OVERFLOW),
+            pool_pre_ping=True,
+            connect_args={
+                'options': f"-c statement_timeout={timeout}",
+                'application_name': 'invoice-generator'
+            }
+        )
+        _engine_pid = os.getpid()
+        return _engine
+
+
+@contextmanager
+def connection(cursor_factory=None):
+    """Borrow a pooled psycopg2 connection.
+
+    The transaction is committed when the block exits normally and rolled
+    back on an exception; the connection then goes back to the pool.
+    `cursor_factory` (e.g. RealDictCursor) applies to cursors created inside
+    the block.
+    """
+    conn = get_engine().raw_connection()
+    dbapi_connection = conn.dbapi_connection
+    previous_factory = dbapi_connection.cursor_factory
+    if cursor_factory is not None:
+        dbapi_connection.cursor_factory = cursor_factory
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        dbapi_connection.cursor_factory = previous_factory
+        conn.close()
+
+
+def prepare_statement(name: str, sql: str) -> str:
+    """Register a query with %s placeholders as a prepared statement; returns its name."""
+    if re.search(r'%\(\w+\)s', sql):
+        raise ValueError(f"Prepared statement {name} must use positional %s placeholders")
+
+    counter = iter(range(1, sql.count('%s') + 1))
+    sql = re.sub(r'%s', lambda _: f"${next(counter)}", sql).replace('%%', '%')
+    _statements[name] = sql.strip().rstrip(';')
+    return name
+
+
+def execute_prepared(conn, name: str, params: Sequence = ()) -> List:
+    """Run a registered statement on a pooled or SQLAlchemy connection; returns all rows."""
+    if isinstance(conn, Connection):
+        conn = conn.connection
+    # Подготовленные запросы живут, пока живет соединение, поэтому учитываются
+    # в info соединения пула (при переподключении он создается заново)
+    prepared = conn.info.setdefault('prepared_statements', set())
+
+    cursor = conn.cursor()
+    try:
+        if name not in prepared:
+            cursor.execute(f"PREPARE {name} AS {_statements[name]}")
+            prepared.add(name)
+        if params:
+            cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", tuple(params))
+        else:
+            cursor.execute(f"EXECUTE {name}")
+        return cursor.fetchall()
+    finally:
+        cursor.close()
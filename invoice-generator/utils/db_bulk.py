@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Batched UPDATE ... FROM (VALUES ...) for the maintenance scripts.
+
+Instead of one UPDATE per row, rows are sent in chunks as a VALUES list and
+applied with a single ``UPDATE ... FROM`` per chunk. ``RETURNING`` reports
+which keys matched a row in the table, so scripts get matched/unmatched
+counts without extra queries.
+"""
+
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+@dataclass
+class BulkUpdateResult:
+    """Outcome of bulk_update."""
+
+    matched: int = 0
+    unmatched: int = 0
+    unmatched_keys: List = field(default_factory=list)
+    chunks: int = 0
+
+
+def _update_statement(table: str, key: str, columns: Sequence[str], row_count: int,
+                      types: Dict[str, str]):
+    """Build the UPDATE ... FROM (VALUES ...) statement for row_count rows."""
+    names = [key, *columns]
+    values = []
+    for row in range(row_count):
+        params = []
+        for index, name in enumerate(names):
+            param = f":v{row}_{index}"
+            # Типы задаются в первой строке VALUES, остальные строки их наследуют
+            if row == 0 and name in types:
+                param = f"CAST({param} AS {types[name]})"
+            params.append(param)
+        values.append(f"({', '.join(params)})")
+
+    assignments = ', '.join(f"{column} = v.{column}" for column in columns)
+    return text(f"""
+        UPDATE {table} AS t
+        SET {assignments}
+        FROM (VALUES {', '.join(values)}) AS v({', '.join(names)})
+        WHERE t.{key} = v.{key}
+        RETURNING t.{key}
+    """)
+
+
+def bulk_update(connection, table: str, key: str, columns: Sequence[str], rows: Sequence[Sequence],
+                chunk_size: int = DEFAULT_CHUNK_SIZE, types: Optional[Dict[str, str]] = None,
+                progress: Optional[Callable[[int, int], None]] = None) -> BulkUpdateResult:
+    """Update `columns` of `table` from rows of (key, *column values).
+
+    Rows are applied with one statement per `chunk_size` rows. If a key occurs
+    several times, the last row wins (as with sequential UPDATEs). `types`
+    maps column names to SQL types for values whose type PostgreSQL cannot
+    infer (e.g. ``{'id': 'integer'}``). `progress(done, total)` is called after
+    every chunk.
+    """
+    # Повторяющиеся ключи: остается последняя строка
+    rows = list({row[0]: row for row in rows}.values())
+    types = types or {}
+    result = BulkUpdateResult()
+    width = len(columns) + 1
+
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        params = {}
+        for row_index, row in enumerate(chunk):
+            if len(row) != width:
+                raise ValueError(f"Expected {width} values per row, got {len(row)}: {row!r}")
+            for index, value in enumerate(row):
+                params[f"v{row_index}_{index}"] = value
+
+        statement = _update_statement(table, key, columns, len(chunk), types)
+        matched = {row[0] for row in connection.execute(statement, params)}
+
+        result.matched += len(matched)
+        unmatched = [row[0] for row in chunk if row[0] not in matched]
+        result.unmatched += len(unmatched)
+        result.unmatched_keys.extend(unmatched)
+        result.chunks += 1
+
+        if progress:
+            progress(start + len(chunk), len(rows))
+
+    return result
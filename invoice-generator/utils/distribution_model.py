@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Empirical distributions of the source data for synthetic generation.
+
+``scripts/profile_distributions.py`` aggregates the database into a
+``DistributionModel`` and saves it as compact JSON; synthesis loads the file
+and never queries the database. Every distribution is a ``Histogram`` of
+observed values and their counts, weighted by invoice lines (a product type
+that appears on many lines is drawn more often). Prices are integer cents,
+as in utils.line_items.
+"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MODEL_VERSION = 1
+DEFAULT_MODEL_PATH = Path(__file__).parent.parent / 'data' / 'synthetic' / 'distribution_model.json'
+
+
+@dataclass
+class Histogram:
+    """Observed values and how often each occurred."""
+
+    values: List = field(default_factory=list)
+    counts: List[int] = field(default_factory=list)
+
+    @classmethod
+    def from_pairs(cls, pairs) -> 'Histogram':
+        """Build from (value, count) pairs; values are sorted for a stable file."""
+        merged = {}
+        for value, count in pairs:
+            merged[value] = merged.get(value, 0) + int(count)
+        values = sorted(merged, key=lambda value: (value is None, value))
+        return cls(values, [merged[value] for value in values])
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def mean(self) -> float:
+        return sum(value * count for value, count in zip(self.values, self.counts)) / self.total
+
+    def to_dict(self) -> Dict:
+        return {'values': self.values, 'counts': self.counts}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Histogram':
+        return cls(list(data['values']), list(data['counts']))
+
+
+@dataclass
+class ProductTypeProfile:
+    """Distributions of the invoice lines of one product type."""
+
+    name: str
+    quantity: Histogram
+    price_cents: Histogram
+    attributes: Dict[str, Histogram] = field(default_factory=dict)
+
+    @property
+    def lines(self) -> int:
+        return self.quantity.total
+
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'quantity': self.quantity.to_dict(),
+            'price_cents': self.price_cents.to_dict(),
+            'attributes': {name: histogram.to_dict() for name, histogram in sorted(self.attributes.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ProductTypeProfile':
+        return cls(
+            name=data['name'],
+            quantity=Histogram.from_dict(data['quantity']),
+            price_cents=Histogram.from_dict(data['price_cents']),
+            attributes={name: Histogram.from_dict(item) for name, item in data['attributes'].items()}
+        )
+
+
+@dataclass
+class DistributionModel:
+    """Everything synthesis needs to draw realistic invoices."""
+
+    summary: Dict
+    items_per_invoice: Histogram
+    product_types: Dict[int, ProductTypeProfile]
+    # Коллекция -> (название, гистограмма типов продуктов в ее позициях)
+    collections: Dict[int, str]
+    collection_types: Dict[int, Histogram]
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec='seconds'))
+    version: int = MODEL_VERSION
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': self.version,
+            'created_at': self.created_at,
+            'summary': self.summary,
+            'items_per_invoice': self.items_per_invoice.to_dict(),
+            # Ключи JSON - строки; порядок по ID, чтобы файл не менялся без изменения данных
+            'product_types': {str(type_id): self.product_types[type_id].to_dict()
+                              for type_id in sorted(self.product_types)},
+            'collections': {
+                str(collection_id): {
+                    'name': self.collections.get(collection_id),
+                    'types': self.collection_types[collection_id].to_dict()
+                }
+                for collection_id in sorted(self.collection_types)
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'DistributionModel':
+        if data.get('version') != MODEL_VERSION:
+            raise ValueError(f"Unsupported distribution model version: {data.get('version')}")
+        collections = {int(key): item for key, item in data['collections'].items()}
+        return cls(
+            summary=data['summary'],
+            items_per_invoice=Histogram.from_dict(data['items_per_invoice']),
+            product_types={int(key): ProductTypeProfile.from_dict(item)
+                           for key, item in data['product_types'].items()},
+            collections={key: item['name'] for key, item in collections.items()},
+            collection_types={key: Histogram.from_dict(item['types']) for key, item in collections.items()},
+            created_at=data['created_at'],
+            version=data['version']
+        )
+
+    def save(self, path: Optional[Path] = None) -> Path:
+        """Write the model as compact JSON (default: data/synthetic/distribution_model.json)."""
+        path = Path(path) if path else DEFAULT_MODEL_PATH
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), ensure_ascii=False, separators=(',', ':')) + '\n',
+                        encoding='utf-8')
+        return path
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> 'DistributionModel':
+        path = Path(path) if path else DEFAULT_MODEL_PATH
+        return cls.from_dict(json.loads(path.read_text(encoding='utf-8')))
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Backend-neutral invoice document model.
+
+An ``Invoice`` is prepared once (see scripts/generate_invoice_from_sql.py)
+and consumed directly by every renderer: the Jinja/WeasyPrint generators and
+the ReportLab canvas template. The classes are frozen and slotted, so one
+prepared invoice can be routed to several backends without copying; changes
+such as anonymization produce a new ``Invoice`` that shares the line items.
+
+``as_invoice`` converts the legacy dict shapes (nested ``items[].lines`` and
+flat upper-case keys with ``products``) for callers that still pass dicts.
+"""
+
+import re
+from dataclasses import dataclass, replace
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from .line_items import to_cents
+
+DEFAULT_SENDER = "Ernst Feiler GmbH - Postfach 28 - D-95691 Hohenberg/Eger"
+DEFAULT_VAT_INFO = "Tax free exports to third countries pursuant to § 4(1a) i.c.w. § 6 German VAT Act."
+DEFAULT_TRANSPORT_CHARGE_CENTS = 3000
+
+# Плейсхолдер шаблона-заготовки вместо суммы, например [Amount]
+PLACEHOLDER_PATTERN = re.compile(r'^\[.*\]$')
+
+
+def format_date(value: Union[date, datetime, str, None]) -> str:
+    """Format a date according to Feiler standards (strings are passed through)."""
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime)):
+        return value.strftime("%d.%m.%Y")
+    return str(value)
+
+
+@dataclass(frozen=True, slots=True)
+class Address:
+    """Postal address printed as four lines."""
+
+    name: str = ''
+    street: str = ''
+    postal_code: str = ''
+    city: str = ''
+    country: str = ''
+
+    @property
+    def city_line(self) -> str:
+        return f"{self.postal_code} {self.city}".strip()
+
+    def lines(self) -> List[str]:
+        return [self.name, self.street, self.city_line, self.country]
+
+    @classmethod
+    def from_lines(cls, text: str) -> 'Address':
+        """Parse a newline-separated address (name, street, postal code + city, country)."""
+        lines = (text or '').split('\n') + [''] * 4
+        postal_code, _, city = lines[2].partition(' ')
+        return cls(name=lines[0], street=lines[1], postal_code=postal_code, city=city, country=lines[3])
+
+
+@dataclass(frozen=True, slots=True)
+class LineItem:
+    """One invoice position: main line, article line and HS-Code line."""
+
+    position: int
+    design: str
+    size: str
+    color: str  # ID цвета или '.'
+    quantity: str
+    unit: str
+    price: str  # цена, отформатированная для вывода
+    amount: str  # сумма позиции, отформатированная для вывода
+    amount_cents: Optional[int] = None  # None - плейсхолдер шаблона-заготовки
+    color_name: str = ''
+    article_no: str = ''
+    hs_code: str = ''
+    product_type: str = ''
+
+
+@dataclass(frozen=True, slots=True)
+class Invoice:
+    """Invoice header data plus line items."""
+
+    invoice_number: str = ''
+    invoice_date: Union[date, str, None] = None
+    customer_number: str = ''
+    order: str = ''
+    agent: str = ''
+    seller: str = ''
+    contact: str = ''
+    recipient: Address = Address()
+    shipping: Optional[Address] = None  # None - доставка на адрес получателя
+    correspondence_number: str = ''
+    correspondence_date: Union[date, str, None] = None
+    correspondence_person: str = ''
+    delivery_note_number: str = ''
+    delivery_date: Union[date, str, None] = None
+    items: Tuple[LineItem, ...] = ()
+    sender: str = DEFAULT_SENDER
+    vat_info: str = DEFAULT_VAT_INFO
+    # Готовые строки из плоского формата, заменяют собранный из полей текст
+    correspondence_line: str = ''
+    delivery_line: str = ''
+    transport_charge_cents: int = DEFAULT_TRANSPORT_CHARGE_CENTS
+
+    @property
+    def ship_to(self) -> Address:
+        return self.shipping or self.recipient
+
+    @property
+    def total_cents(self) -> Optional[int]:
+        """Sum of line amounts in cents.
+        
+        None only for a template without data: no items, or placeholder amounts
+        such as "[Amount]". Malformed amounts do not hide the totals; they count
+        as 0 with a warning (see build_items).
+        """
+        amounts = [item.amount_cents for item in self.items]
+        if not amounts or any(amount is None for amount in amounts):
+            return None
+        return sum(amounts)
+
+    @property
+    def net_cents(self) -> Optional[int]:
+        total = self.total_cents
+        return None if total is None else total + self.transport_charge_cents
+
+    @property
+    def gross_cents(self) -> Optional[int]:
+        # Экспорт в третьи страны без НДС: брутто равно нетто
+        return self.net_cents
+
+    def correspondence_text(self) -> str:
+        if self.correspondence_line or not self.correspondence_number:
+            return self.correspondence_line
+        return (f"Your Correspondence Number {self.correspondence_number} "
+                f"dated {format_date(self.correspondence_date)} placed by {self.correspondence_person}")
+
+    def delivery_text(self) -> str:
+        if self.delivery_line or not self.delivery_note_number:
+            return self.delivery_line
+        return f"Delivery Note No. {self.delivery_note_number}, Delivery Date {format_date(self.delivery_date)}"
+
+    def replace(self, **changes) -> 'Invoice':
+        """Return a copy with some fields replaced (line items are shared, not copied)."""
+        return replace(self, **changes)
+
+    @classmethod
+    def from_feiler_dict(cls, data: Dict) -> 'Invoice':
+        """Build an invoice from the nested ``items[].lines[].content`` format."""
+        rows = []
+        for item in data.get('items', []):
+            first_line = item['lines'][0]['content']
+            second_line = item['lines'][1]['content']
+            third_line = item['lines'][2]['content']
+            quantity, _, unit = str(first_line.get('quantity', '')).partition(' ')
+            rows.append(dict(
+                position=item['item_position'],
+                design=first_line.get('collection', ''),
+                size=first_line.get('size', ''),
+                color=first_line.get('color_id', '.'),
+                quantity=quantity,
+                unit=unit,
+                price=first_line.get('price', '0,00'),
+                amount=item.get('amount', '0,00'),
+                color_name=second_line.get('color', ''),
+                article_no=second_line.get('value', ''),
+                hs_code=f"{third_line.get('prefix', '')}: {third_line.get('value', '')}",
+                product_type=first_line.get('product_type', '')
+            ))
+
+        recipient = Address(
+            name=data.get('recipient_name') or '',
+            street=data.get('recipient_street') or '',
+            postal_code=data.get('recipient_postal_code') or '',
+            city=data.get('recipient_city') or '',
+            country=data.get('recipient_country') or ''
+        )
+        return cls(
+            invoice_number=str(data.get('invoice_number') or ''),
+            invoice_date=data.get('invoice_date'),
+            customer_number=data.get('customer_number') or '',
+            order=data.get('order') or '',
+            agent=data.get('agent') or '',
+            seller=data.get('seller') or '',
+            contact=data.get('contact') or '',
+            recipient=recipient,
+            correspondence_number=data.get('correspondence_number') or '',
+            correspondence_date=data.get('correspondence_date'),
+            correspondence_person=data.get('correspondence_person') or '',
+            delivery_note_number=data.get('delivery_note_number') or '',
+            delivery_date=data.get('delivery_date'),
+            items=build_items(rows)
+        )
+
+    @classmethod
+    def from_flat_dict(cls, data: Dict) -> 'Invoice':
+        """Build an invoice from flat upper-case keys plus ``products``."""
+        rows = [
+            dict(
+                position=product.get('pos', ''),
+                design=product.get('design', ''),
+                size=product.get('size', ''),
+                color=product.get('color', ''),
+                quantity=str(product.get('quantity', '')),
+                unit=product.get('qu', ''),
+                price=str(product.get('price', '')),
+                amount=str(product.get('amount', '')),
+                color_name=product.get('color_name', ''),
+                article_no=product.get('article_no', ''),
+                hs_code=product.get('hs_code', '')
+            )
+            for product in data.get('products', [])
+        ]
+
+        recipient = Address.from_lines(data.get('CUSTOMER_FULL_ADDRESS', ''))
+        shipping = Address.from_lines(data['SHIPPING_ADDRESS']) if 'SHIPPING_ADDRESS' in data else None
+        return cls(
+            invoice_number=data.get('INVOICE_NO', ''),
+            invoice_date=data.get('DATE'),
+            customer_number=data.get('CUSTOMER_NO', ''),
+            order=data.get('ORDER', ''),
+            agent=data.get('AGENT', ''),
+            seller=data.get('SELLER', ''),
+            contact=data.get('CONTACT', ''),
+            recipient=recipient,
+            shipping=shipping,
+            items=build_items(rows),
+            sender=data.get('SENDER', DEFAULT_SENDER),
+            vat_info=data.get('VAT_INFO', DEFAULT_VAT_INFO),
+            correspondence_line=data.get('CORRESPONDENCE', ''),
+            delivery_line=data.get('DELIVERY_NOTE', '')
+        )
+
+
+def build_items(rows: List[Dict]) -> Tuple[LineItem, ...]:
+    """Build line items from field dicts, converting amounts to cents in one pass.
+    
+    Placeholder amounts get amount_cents None. A malformed amount (e.g.
+    "1.234,56") is skipped with a warning and counts as 0, so one bad line does
+    not drop the totals of the whole invoice.
+    """
+    amount_cents = [None] * len(rows)
+    numeric = [index for index, row in enumerate(rows) if not PLACEHOLDER_PATTERN.match(str(row['amount']))]
+    cents = to_cents([str(rows[index]['amount']) for index in numeric]).tolist()
+    for index, value in zip(numeric, cents):
+        amount_cents[index] = value
+    return tuple(LineItem(amount_cents=value, **row) for row, value in zip(rows, amount_cents))
+
+
+def as_invoice(data: Union[Invoice, Dict, None]) -> Invoice:
+    """Return data as an Invoice, converting the legacy dict formats."""
+    if isinstance(data, Invoice):
+        return data
+    if not data:
+        return Invoice()
+    if 'items' in data:
+        return Invoice.from_feiler_dict(data)
+    return Invoice.from_flat_dict(data)
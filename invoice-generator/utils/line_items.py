@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Columnar line-item engine.
+
+Line items of a batch of invoices are kept as NumPy columns: prices and
+amounts as integer cents, quantities as integers and colors/sizes as
+category codes. Invoices are stored back to back; ``offsets[i]:offsets[i + 1]``
+is the slice of invoice ``i``. Totals, currency strings and position numbers
+are computed for the whole batch at once, and integer cents keep invoice
+totals equal to the sum of their lines. Page breaks depend on measured item
+heights and are planned per invoice by utils.pagination.plan_pages.
+"""
+
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Iterable, List, Sequence
+
+import numpy as np
+
+# Десятичный разделитель для поддерживаемых локалей
+DECIMAL_SEPARATORS = {
+    'de': ',',
+    'en': '.',
+}
+
+
+def to_cents(values: Sequence) -> np.ndarray:
+    """Convert prices/amounts (str with ',' or '.', Decimal, int, float) to integer cents."""
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    first = values[0]
+    if isinstance(first, Decimal):
+        # Decimal переводим в центы без промежуточного float
+        return np.fromiter((int((v * 100).to_integral_value()) for v in values),
+                           dtype=np.int64, count=len(values))
+
+    array = np.asarray(values)
+    if array.dtype.kind in 'US':
+        array = np.char.replace(array.astype(str), ',', '.')
+        try:
+            array = array.astype(np.float64)
+        except ValueError:
+            array = np.array([_parse_amount(v) for v in array], dtype=np.float64)
+
+    return np.rint(array.astype(np.float64) * 100).astype(np.int64)
+
+
+def _parse_amount(value: str) -> float:
+    """Parse a single amount, falling back to 0.0 for malformed values."""
+    try:
+        return float(value)
+    except ValueError:
+        print(f"Warning: Could not convert amount '{value}' to float, using 0.0")
+        return 0.0
+
+
+def format_cents(cents: np.ndarray, locale: str = 'de') -> np.ndarray:
+    """Format integer cents as currency strings ('1234,50' for de, '1234.50' for en)."""
+    cents = np.asarray(cents, dtype=np.int64)
+    if cents.size == 0:
+        return np.zeros(0, dtype=str)
+
+    separator = DECIMAL_SEPARATORS[locale]
+    absolute = np.abs(cents)
+    units = np.char.mod('%d', absolute // 100)
+    fraction = np.char.zfill(np.char.mod('%d', absolute % 100), 2)
+    formatted = np.char.add(np.char.add(units, separator), fraction)
+    return np.where(cents < 0, np.char.add('-', formatted), formatted)
+
+
+def encode_categories(values: Iterable[str]) -> tuple[np.ndarray, List[str]]:
+    """Encode string values as integer codes plus the list of categories."""
+    categories: Dict[str, int] = {}
+    codes = [categories.setdefault(value, len(categories)) for value in values]
+    return np.asarray(codes, dtype=np.int32), list(categories)
+
+
+@dataclass
+class LineItemBatch:
+    """Line items of a batch of invoices stored as typed columns."""
+
+    offsets: np.ndarray  # int64, длина = число инвойсов + 1
+    price_cents: np.ndarray  # int64
+    quantity: np.ndarray  # int64
+    amount_cents: np.ndarray  # int64
+    size_codes: np.ndarray = None  # int32, индексы в sizes
+    color_codes: np.ndarray = None  # int32, индексы в colors
+    sizes: List[str] = field(default_factory=list)
+    colors: List[str] = field(default_factory=list)
+    collection_codes: np.ndarray = None  # int32, индексы в collections
+    type_codes: np.ndarray = None  # int32, индексы в product_types
+    collections: List[str] = field(default_factory=list)
+    product_types: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_columns(cls, counts: Sequence[int], prices, quantities, amounts=None,
+                     sizes: Iterable[str] = None, colors: Iterable[str] = None) -> 'LineItemBatch':
+        """Build a batch from per-invoice item counts and flat per-item columns.
+
+        If amounts are not given they are computed as price * quantity in cents.
+        """
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(np.asarray(counts, dtype=np.int64), out=offsets[1:])
+
+        price_cents = to_cents(prices)
+        quantity = np.asarray(quantities, dtype=np.int64).reshape(-1)
+        amount_cents = price_cents * quantity if amounts is None else to_cents(amounts)
+
+        batch = cls(offsets=offsets, price_cents=price_cents, quantity=quantity, amount_cents=amount_cents)
+        if sizes is not None:
+            batch.size_codes, batch.sizes = encode_categories(sizes)
+        if colors is not None:
+            batch.color_codes, batch.colors = encode_categories(colors)
+        return batch
+
+    @classmethod
+    def from_records(cls, invoices: Iterable[Sequence[Dict]], price_key: str = 'purchase_price',
+                     quantity_key: str = 'quantity') -> 'LineItemBatch':
+        """Build a batch from SQL rows grouped by invoice (see fetch_invoice_data.sql)."""
+        counts, prices, quantities = [], [], []
+        for rows in invoices:
+            counts.append(len(rows))
+            prices.extend(row[price_key] for row in rows)
+            quantities.extend(row[quantity_key] for row in rows)
+        return cls.from_columns(counts, prices, quantities)
+
+    @property
+    def invoice_count(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def counts(self) -> np.ndarray:
+        """Number of line items per invoice."""
+        return np.diff(self.offsets)
+
+    def invoice_ids(self) -> np.ndarray:
+        """Index of the owning invoice for every line item."""
+        return np.repeat(np.arange(self.invoice_count), self.counts)
+
+    def totals_cents(self) -> np.ndarray:
+        """Sum of line amounts per invoice, in cents."""
+        totals = np.zeros(self.invoice_count, dtype=np.int64)
+        np.add.at(totals, self.invoice_ids(), self.amount_cents)
+        return totals
+
+    def positions(self) -> np.ndarray:
+        """1-based position number of every item within its invoice."""
+        return np.arange(len(self.amount_cents), dtype=np.int64) - np.repeat(self.offsets[:-1], self.counts) + 1
+
+    def formatted_prices(self, locale: str = 'de') -> np.ndarray:
+        return format_cents(self.price_cents, locale)
+
+    def formatted_amounts(self, locale: str = 'de') -> np.ndarray:
+        return format_cents(self.amount_cents, locale)
+
+    def formatted_totals(self, locale: str = 'de') -> np.ndarray:
+        return format_cents(self.totals_cents(), locale)
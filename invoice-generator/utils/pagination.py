@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+One-pass pagination shared by all invoice renderers.
+
+Every renderer describes the vertical space of its pages with a
+``PageLayout`` (in points, derived from its fonts and stylesheet) and a
+function that measures the height of one line item. ``plan_pages`` walks the
+items once and fills each page until the next item does not fit, so only the
+last page can be partially empty and no item is ever dropped. Pages reference
+index ranges of the original item sequence instead of holding copied lists.
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Callable, List
+
+
+@dataclass(frozen=True, slots=True)
+class PageLayout:
+    """Space available for the items table on the first and following pages."""
+
+    first_page_space: float  # под шапкой и блоком доставки первой страницы
+    page_space: float  # под шапкой последующих страниц
+    table_header_height: float  # заголовок таблицы, повторяется на каждой странице с позициями
+    table_end_height: float = 0  # отступ после таблицы
+    totals_height: float = 0  # блок итогов на последней странице
+
+
+class ItemRange(Sequence):
+    """Read-only view of ``items[start:stop]`` that does not copy the items."""
+
+    __slots__ = ('_items', 'start', 'stop')
+
+    def __init__(self, items, start, stop):
+        self._items = items
+        self.start = start
+        self.stop = stop
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._items[self.start + i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('item index out of range')
+        return self._items[self.start + index]
+
+    def __iter__(self):
+        items = self._items
+        for index in range(self.start, self.stop):
+            yield items[index]
+
+    def __repr__(self):
+        return f"ItemRange({self.start}:{self.stop})"
+
+
+@dataclass(frozen=True, slots=True)
+class Page:
+    """One planned page: its items and where the page sits in the document."""
+
+    number: int
+    items: ItemRange
+    is_first: bool
+    is_last: bool
+    has_totals: bool
+
+
+def plan_pages(items, layout: PageLayout, item_height: Callable, totals: bool = True) -> List[Page]:
+    """Split items into pages in a single pass.
+
+    An item goes onto the current page if it fits; otherwise a new page is
+    started. A first page that cannot hold even one item stays without items,
+    an item taller than a whole page gets a page of its own. With
+    ``totals=True`` the totals block is placed under the last item, or on an
+    extra page if it does not fit there.
+    """
+    # Индексы первых позиций страниц
+    breaks = [0]
+    available = layout.first_page_space
+    used = 0.0
+    table_height = layout.table_header_height + layout.table_end_height
+
+    for index, item in enumerate(items):
+        height = item_height(item)
+        page_empty = index == breaks[-1]
+        needed = height + table_height if page_empty else height
+
+        if used + needed > available and (not page_empty or available < layout.page_space):
+            breaks.append(index)
+            available = layout.page_space
+            used = 0.0
+            needed = height + table_height
+        used += needed
+
+    if totals and used + layout.totals_height > available:
+        breaks.append(len(items))
+
+    bounds = breaks + [len(items)]
+    last = len(breaks) - 1
+    return [
+        Page(
+            number=page + 1,
+            items=ItemRange(items, bounds[page], bounds[page + 1]),
+            is_first=page == 0,
+            is_last=page == last,
+            has_totals=totals and page == last
+        )
+        for page in range(len(breaks))
+    ]
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Bundles of many invoices in one PDF.
+
+A bundle is a single PDF in which every invoice starts on a new page and has
+its own top-level outline entry. Fonts and the logo are embedded once per
+bundle instead of once per invoice. A JSON sidecar next to the PDF (same name,
+``.json`` extension) lists every invoice with its page range, so consumers
+such as OCR tests can split the bundle without parsing the PDF.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+BUNDLE_INDEX_VERSION = 1
+
+
+def outline_title(invoice, number: int) -> str:
+    """Outline entry text for the invoice at position `number` of a bundle."""
+    return f"Invoice {invoice.invoice_number or number}"
+
+
+def bookmark_css(selector: str, title: str) -> str:
+    """CSS that turns the first element matching selector into a WeasyPrint outline entry."""
+    label = title.replace('\\', '\\\\').replace('"', '\\"')
+    return f'{selector} {{ bookmark-level: 1; bookmark-label: "{label}"; }}'
+
+
+class BundleIndex:
+    """Page ranges of the invoices written into one bundle PDF."""
+
+    def __init__(self, pdf_path):
+        self.pdf_path = Path(pdf_path)
+        self.entries: List[Dict] = []
+        self.page_count = 0
+
+    def add(self, invoice_number: str, pages: int) -> Tuple[int, int]:
+        """Append an invoice of `pages` pages; returns its (first, last) page, 1-based."""
+        first = self.page_count + 1
+        self.page_count += pages
+        self.entries.append({
+            'invoice_number': invoice_number,
+            'first_page': first,
+            'last_page': self.page_count
+        })
+        return first, self.page_count
+
+    def write(self, index_path: Optional[str] = None) -> Path:
+        """Write the JSON sidecar (default: the PDF path with a .json extension)."""
+        index_path = Path(index_path) if index_path else self.pdf_path.with_suffix('.json')
+        index = {
+            'version': BUNDLE_INDEX_VERSION,
+            'pdf': self.pdf_path.name,
+            'page_count': self.page_count,
+            # Список, а не словарь: номера инвойсов в корпусе могут повторяться
+            'invoices': self.entries
+        }
+        index_path.write_text(json.dumps(index, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        return index_path
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Shared WeasyPrint resources for PDF generators.
+
+Parsed stylesheets, the font configuration and static assets (logos, CSS,
+fonts) are cached once per process, so rendering a document only pays for
+the layout of its own content. WeasyPrint is imported on first use: the
+asset bundle also serves the ReportLab backend, which runs without Pango.
+"""
+
+import os
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Схема URL для ресурсов из AssetBundle, например asset://feiler/logo
+ASSET_SCHEME = 'asset://'
+
+# Имя ресурса -> (путь к файлу, MIME-тип)
+ASSETS = {
+    'feiler/logo': (BASE_DIR / 'templates' / 'invoice' / 'feiler' / 'assets' / 'feiler_logo.svg', 'image/svg+xml'),
+    'invoice/logo': (BASE_DIR / 'data' / 'sample' / 'logo_feiler.png', 'image/png'),
+    'invoice/styles': (BASE_DIR / 'templates' / 'invoice' / 'html' / 'styles.css', 'text/css'),
+    'fonts/liberation-serif': (BASE_DIR / 'fonts' / 'LiberationSerif-Regular.ttf', 'font/ttf'),
+    'fonts/liberation-serif-bold': (BASE_DIR / 'fonts' / 'LiberationSerif-Bold.ttf', 'font/ttf'),
+}
+
+_lock = threading.RLock()
+_font_config = None
+_asset_bundle = None
+# Путь к стилю -> (mtime_ns, разобранный CSS)
+_css_cache = {}
+
+
+class AssetBundle:
+    """In-memory bundle of static assets served to WeasyPrint through url_fetcher."""
+
+    def __init__(self, assets=None):
+        self.assets = dict(ASSETS if assets is None else assets)
+        self._data = {}
+        # Обратный индекс: абсолютный путь файла -> имя ресурса
+        self._names_by_path = {str(path.resolve()): name for name, (path, _) in self.assets.items()}
+        # Декодированные изображения, общие для всех документов процесса
+        self.image_cache = {}
+        self._lock = threading.Lock()
+        self._url_fetcher = None
+
+    @property
+    def url_fetcher(self):
+        """Loader for the url_fetcher argument of HTML() and CSS(), created on first use."""
+        if self._url_fetcher is None:
+            self._url_fetcher = _make_url_fetcher(self)
+        return self._url_fetcher
+
+    def url(self, name):
+        """Return the asset:// URL of a registered asset."""
+        if name not in self.assets:
+            raise KeyError(f"Unknown asset: {name}")
+        return f"{ASSET_SCHEME}{name}"
+
+    def exists(self, name):
+        """Check whether the file behind an asset is present."""
+        return name in self._data or self.assets[name][0].exists()
+
+    def load(self, name):
+        """Return the asset content, reading the file only on first use."""
+        with self._lock:
+            data = self._data.get(name)
+            if data is None:
+                data = self.assets[name][0].read_bytes()
+                self._data[name] = data
+            return data
+
+    def preload(self):
+        """Read all available assets into memory (e.g. in a pool worker initializer)."""
+        for name in self.assets:
+            if self.exists(name):
+                self.load(name)
+
+    def _resolve(self, url):
+        """Map an asset:// or file:// URL to a registered asset name."""
+        if url.startswith(ASSET_SCHEME):
+            name = url[len(ASSET_SCHEME):]
+            if name not in self.assets:
+                raise ValueError(f"Unknown asset URL: {url}")
+            return name
+        if url.startswith('file:'):
+            path = os.path.normpath(url2pathname(urlparse(url).path))
+            return self._names_by_path.get(path)
+        return None
+
+    def _fetch(self, url):
+        """url_fetcher function for WeasyPrint < 68, serving registered assets from memory."""
+        name = self._resolve(url)
+        if name is None:
+            from weasyprint import default_url_fetcher
+            return default_url_fetcher(url)
+
+        return {
+            'string': self.load(name),
+            'mime_type': self.assets[name][1],
+            'redirected_url': url
+        }
+
+
+def _make_url_fetcher(bundle):
+    """Return the url_fetcher serving the assets of a bundle for the installed WeasyPrint."""
+    try:
+        # WeasyPrint >= 68: загрузчик ресурсов - объект URLFetcher, ответ - URLFetcherResponse
+        from weasyprint.urls import URLFetcher, URLFetcherResponse
+    except ImportError:
+        # WeasyPrint < 68: загрузчик - функция, ответ - словарь
+        return bundle._fetch
+
+    class _AssetURLFetcher(URLFetcher):
+        """URLFetcher serving the assets of an AssetBundle from memory."""
+
+        def fetch(self, url, headers=None):
+            name = bundle._resolve(url)
+            if name is None:
+                return super().fetch(url, headers)
+            return URLFetcherResponse(url, bundle.load(name), {'Content-Type': bundle.assets[name][1]})
+
+    return _AssetURLFetcher()
+
+
+def get_asset_bundle():
+    """Return the asset bundle shared by all generators of this process."""
+    global _asset_bundle
+    with _lock:
+        if _asset_bundle is None:
+            _asset_bundle = AssetBundle()
+        return _asset_bundle
+
+
+def get_font_config():
+    """Return the font configuration shared by all generators of this process."""
+    global _font_config
+    with _lock:
+        if _font_config is None:
+            from weasyprint.text.fonts import FontConfiguration
+            _font_config = FontConfiguration()
+        return _font_config
+
+
+def get_css(css_path):
+    """Return the parsed stylesheet, re-parsing it only when the file has changed."""
+    css_path = str(Path(css_path).resolve())
+    mtime = os.stat(css_path).st_mtime_ns
+
+    with _lock:
+        cached = _css_cache.get(css_path)
+        if cached is None or cached[0] != mtime:
+            from weasyprint import CSS
+            css = CSS(
+                filename=css_path,
+                font_config=get_font_config(),
+                url_fetcher=get_asset_bundle().url_fetcher
+            )
+            cached = (mtime, css)
+            _css_cache[css_path] = cached
+        return cached[1]
+
+
+def clear_cache():
+    """Drop all cached stylesheets, assets and the shared font configuration."""
+    global _font_config, _asset_bundle
+    with _lock:
+        _css_cache.clear()
+        _font_config = None
+        _asset_bundle = None
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Overlapped fetch -> prepare -> render pipeline.
+
+The source (e.g. a database cursor) is drained by a reader thread and the
+prepare step runs in a second thread; rendering goes to a process pool. The
+stages are connected by bounded queues, so a fast stage blocks once the next
+one falls behind (backpressure) and memory stays bounded. With every stage
+busy at the same time, the wall time approaches that of the slowest stage
+instead of the sum of all stages.
+
+Every stage counts its items, the time spent working, the time spent waiting
+for input and the time blocked on a full output queue. The slowest stage is
+the one with the least waiting.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Iterable, List, Optional
+
+DEFAULT_QUEUE_SIZE = 8
+# Сколько секунд поток ждет места в очереди между проверками остановки
+_POLL_INTERVAL = 0.1
+_DONE = object()
+
+
+@dataclass
+class StageStats:
+    """Throughput counters of one pipeline stage (times in seconds)."""
+
+    name: str
+    items: int = 0
+    busy: float = 0.0  # работа стадии (для рендеринга - сумма по процессам пула)
+    waiting: float = 0.0  # ожидание входных данных
+    blocked: float = 0.0  # ожидание места в выходной очереди
+    parallelism: int = 1  # процессов, между которыми делится busy
+
+    @property
+    def rate(self) -> float:
+        """Items per second the stage sustains when it never waits."""
+        return self.items * self.parallelism / self.busy if self.busy else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.name}: {self.items} items, {self.busy:.2f}s busy ({self.rate:.1f}/s), "
+                f"waiting {self.waiting:.2f}s, blocked {self.blocked:.2f}s")
+
+
+@dataclass
+class PipelineResult:
+    """Render results in source order and the counters of every stage."""
+
+    results: List = field(default_factory=list)
+    stages: List[StageStats] = field(default_factory=list)
+    wall_time: float = 0.0
+
+
+class _Failure:
+    """An exception raised in a stage thread, passed downstream in place of an item."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(target: queue.Queue, item, stop: threading.Event, stats: StageStats):
+    """Put into a bounded queue, counting the time blocked; gives up when stopped."""
+    started = time.perf_counter()
+    while not stop.is_set():
+        try:
+            target.put(item, timeout=_POLL_INTERVAL)
+            break
+        except queue.Full:
+            continue
+    stats.blocked += time.perf_counter() - started
+
+
+def _get(source: queue.Queue, stop: threading.Event, stats: StageStats):
+    """Get from a queue, counting the time waited; returns _DONE when stopped."""
+    started = time.perf_counter()
+    item = _DONE
+    while not stop.is_set():
+        try:
+            item = source.get(timeout=_POLL_INTERVAL)
+            break
+        except queue.Empty:
+            continue
+    stats.waiting += time.perf_counter() - started
+    return item
+
+
+def _read(source: Iterable, output: queue.Queue, stop: threading.Event, stats: StageStats):
+    """Reader thread: drain the source into the first queue."""
+    iterator = iter(source)
+    try:
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                break
+            finally:
+                stats.busy += time.perf_counter() - started
+            stats.items += 1
+            _put(output, item, stop, stats)
+    except BaseException as error:
+        _put(output, _Failure(error), stop, stats)
+        return
+    finally:
+        # Источник (курсор базы) закрывается в том же потоке, который его читал
+        close = getattr(iterator, 'close', None)
+        if close:
+            close()
+    _put(output, _DONE, stop, stats)
+
+
+def _prepare(prepare: Callable, source: queue.Queue, output: queue.Queue, stop: threading.Event,
+             stats: StageStats):
+    """Prepare thread: turn fetched items into render tasks."""
+    while not stop.is_set():
+        item = _get(source, stop, stats)
+        if item is _DONE or isinstance(item, _Failure):
+            _put(output, item, stop, stats)
+            return
+
+        started = time.perf_counter()
+        try:
+            task = prepare(item)
+        except BaseException as error:
+            _put(output, _Failure(error), stop, stats)
+            return
+        finally:
+            stats.busy += time.perf_counter() - started
+        stats.items += 1
+        _put(output, task, stop, stats)
+
+
+def _timed(render: Callable, task):
+    """Run render(task) and return (seconds, result); executed in the pool worker."""
+    started = time.perf_counter()
+    result = render(task)
+    return time.perf_counter() - started, result
+
+
+def run_pipeline(source: Iterable, prepare: Callable, render: Callable, workers: Optional[int] = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, initializer: Optional[Callable] = None,
+                 initargs: tuple = ()) -> PipelineResult:
+    """Run source items through prepare (thread) and render (process pool).
+
+    `render` and `initializer` must be picklable (module-level functions);
+    `initializer(*initargs)` runs once in every worker. At most
+    ``workers + queue_size`` tasks are submitted to the pool at a time. The
+    first exception of any stage stops the pipeline and is re-raised.
+    """
+    workers = workers or os.cpu_count() or 1
+    fetch_stats, prepare_stats = StageStats('fetch'), StageStats('prepare')
+    render_stats = StageStats('render', parallelism=workers)
+    fetched = queue.Queue(maxsize=queue_size)
+    prepared = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_read, args=(source, fetched, stop, fetch_stats),
+                         name='pipeline-fetch', daemon=True),
+        threading.Thread(target=_prepare, args=(prepare, fetched, prepared, stop, prepare_stats),
+                         name='pipeline-prepare', daemon=True)
+    ]
+
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs)
+        # Процессы пула создаются до запуска потоков: fork при работающих потоках
+        # может унаследовать захваченные ими блокировки
+        try:
+            pool.submit(int).result()
+        except BaseException:
+            # Потоки еще не запущены: ошибка инициализатора должна закрыть пул здесь же
+            pool.shutdown(cancel_futures=True)
+            raise
+    else:
+        # Один процесс: рендеринг в текущем процессе без сериализации задач
+        pool = None
+        if initializer:
+            initializer(*initargs)
+    timed_render = partial(_timed, render)
+
+    started = time.perf_counter()
+    results = {}
+    pending = {}
+
+    def collect(done):
+        for future in done:
+            seconds, result = future.result()
+            render_stats.busy += seconds
+            render_stats.items += 1
+            results[pending.pop(future)] = result
+
+    for thread in threads:
+        thread.start()
+    try:
+        index = 0
+        while True:
+            waited = time.perf_counter()
+            task = prepared.get()
+            render_stats.waiting += time.perf_counter() - waited
+            if task is _DONE:
+                break
+            if isinstance(task, _Failure):
+                raise task.error
+
+            if pool is None:
+                seconds, results[index] = timed_render(task)
+                render_stats.busy += seconds
+                render_stats.items += 1
+            else:
+                # Ограничение числа задач в пуле: подготовка ждет, пока рендеринг не освободится
+                if len(pending) >= workers + queue_size:
+                    blocked = time.perf_counter()
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    render_stats.blocked += time.perf_counter() - blocked
+                    collect(done)
+                pending[pool.submit(timed_render, task)] = index
+            index += 1
+
+        if pending:
+            done, _ = wait(pending)
+            collect(done)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    return PipelineResult(
+        results=[results[i] for i in range(len(results))],
+        stages=[fetch_stats, prepare_stats, render_stats],
+        wall_time=time.perf_counter() - started
+    )
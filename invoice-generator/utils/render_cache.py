@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of rendered PDF documents.
+
+A cache key is a SHA-256 hash over everything that determines the output
+(template source or rendered HTML, stylesheets, assets, prepared invoice
+data, generator version). Cached PDFs are stored under their key and hard
+linked (or copied) into the output tree on a hit, so re-runs only render
+documents whose inputs changed. The cache size is bounded with LRU eviction
+based on file modification time, which is refreshed on every hit. Once the
+cache grows past max_size, eviction frees space down to a low-water mark so
+that the next stores do not trigger it again right away.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path(__file__).resolve().parent.parent / 'data' / 'cache' / 'pdf'
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3  # 2 ГБ
+# Доля max_size, до которой освобождается кэш при вытеснении
+EVICT_LOW_WATER = 0.9
+
+
+class RenderCache:
+    """Content-addressed PDF cache with a size limit and LRU eviction."""
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE, link=True):
+        self.cache_dir = Path(cache_dir or DEFAULT_CACHE_DIR)
+        self.max_size = max_size
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        # (путь, mtime_ns) -> хэш содержимого файла
+        self._file_digests = {}
+        self._lock = threading.Lock()
+
+    def settings(self):
+        """Constructor arguments, to build an equivalent cache once per pool worker."""
+        return {'cache_dir': str(self.cache_dir), 'max_size': self.max_size, 'link': self.link}
+
+    def __getstate__(self):
+        """Drop process-local state when the cache is sent to pool workers."""
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        state['_size'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _file_digest(self, path):
+        """Hash file content, memoized by path and mtime."""
+        path = Path(path)
+        stat = path.stat()
+        memo_key = (str(path.resolve()), stat.st_mtime_ns)
+        digest = self._file_digests.get(memo_key)
+        if digest is None:
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            self._file_digests[memo_key] = digest
+        return digest
+
+    def make_key(self, *parts):
+        """Build a cache key from strings, bytes, file paths and JSON-serializable data."""
+        h = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, bytes):
+                data = part
+            elif isinstance(part, str):
+                data = part.encode('utf-8')
+            elif isinstance(part, Path):
+                data = self._file_digest(part).encode('ascii')
+            else:
+                data = json.dumps(part, sort_keys=True, default=str, ensure_ascii=False).encode('utf-8')
+            # Длина части исключает коллизии на границах между частями
+            h.update(len(data).to_bytes(8, 'little'))
+            h.update(data)
+        return h.hexdigest()
+
+    def _entry_path(self, key):
+        return self.cache_dir / key[:2] / f'{key}.pdf'
+
+    def fetch(self, key, output_path):
+        """Place the cached PDF at output_path. Returns False on a cache miss."""
+        entry = self._entry_path(key)
+        try:
+            # Обновляем mtime: по нему определяется давность использования для LRU
+            os.utime(entry)
+        except FileNotFoundError:
+            self.misses += 1
+            return False
+
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        if output_path.exists() or output_path.is_symlink():
+            output_path.unlink()
+
+        if self.link:
+            try:
+                os.link(entry, output_path)
+            except OSError:
+                # Другая файловая система или ссылки не поддерживаются
+                shutil.copyfile(entry, output_path)
+        else:
+            shutil.copyfile(entry, output_path)
+
+        self.hits += 1
+        return True
+
+    def store(self, key, pdf_path):
+        """Copy a freshly rendered PDF into the cache."""
+        entry = self._entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        # Запись через временный файл, чтобы параллельные процессы не видели неполный PDF
+        fd, tmp_path = tempfile.mkstemp(dir=entry.parent, suffix='.tmp')
+        os.close(fd)
+        shutil.copyfile(pdf_path, tmp_path)
+        # Запись с тем же ключом заменяется: ее размер уходит из общего
+        try:
+            old_size = entry.stat().st_size
+        except FileNotFoundError:
+            old_size = 0
+        os.replace(tmp_path, entry)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += entry.stat().st_size - old_size
+        self.evict()
+        return entry
+
+    def render(self, key, output_path, render_fn):
+        """Return True on a cache hit; otherwise call render_fn(output_path) and cache the result."""
+        if self.fetch(key, output_path):
+            return True
+
+        # Выходной файл может быть жесткой ссылкой на запись кэша с прошлого запуска:
+        # перезапись по месту испортила бы кэш
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        if output_path.exists() or output_path.is_symlink():
+            output_path.unlink()
+
+        render_fn(str(output_path))
+        self.store(key, output_path)
+        return False
+
+    def _entries(self):
+        """List cache entries as (mtime, size, path)."""
+        entries = []
+        if not self.cache_dir.exists():
+            return entries
+        for path in self.cache_dir.glob('*/*.pdf'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self):
+        """Total size of the cache in bytes."""
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            return self._size
+
+    def evict(self):
+        """Once the cache exceeds max_size, remove least recently used entries down to the low-water mark."""
+        if self.max_size is None or self.size() <= self.max_size:
+            return 0
+
+        target = self.max_size * EVICT_LOW_WATER
+        removed = 0
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= target:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+            self._size = total
+        return removed
+
+    def clear(self):
+        """Remove all cached documents."""
+        with self._lock:
+            if self.cache_dir.exists():
+                shutil.rmtree(self.cache_dir)
+            self._size = 0
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Local SQLite snapshot of the source tables used for invoice generation.
+
+``export_snapshot`` copies the tables read by ``fetch_invoice_data.sql``
+from PostgreSQL into one SQLite file. Tables whose rows are only inserted
+or deleted (invoices, their lines, attribute values) are refreshed
+incrementally: only rows with an id above the stored watermark are fetched,
+and rows deleted at the source are removed. Tables that maintenance scripts
+update in place (products, via update_product_types.py, and the lookup
+tables) are reloaded completely on every refresh. ``SnapshotReader`` serves
+the same rows as ``fetch_invoice_data.sql``, so generation can run without
+the database.
+
+Values are stored losslessly (numerics as decimal strings, dates as ISO
+strings) and rows are written in id order, so two exports of the same data
+give the same reader results.
+"""
+
+import json
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import groupby
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+SNAPSHOT_VERSION = 1
+DEFAULT_SNAPSHOT_PATH = Path(__file__).parent.parent / 'data' / 'snapshot' / 'source.sqlite3'
+# Строк за одну выборку из PostgreSQL
+FETCH_SIZE = 5000
+
+
+@dataclass(frozen=True)
+class SnapshotTable:
+    """A source table: exported columns with SQLite types and the watermark column."""
+
+    name: str
+    columns: Tuple[Tuple[str, str], ...]
+    watermark: Optional[str] = 'id'  # None - таблица перезагружается целиком
+
+    @property
+    def column_names(self) -> List[str]:
+        return [name for name, _ in self.columns]
+
+
+SNAPSHOT_TABLES = (
+    SnapshotTable('invoicesin', (('id', 'INTEGER PRIMARY KEY'), ('created_date', 'TEXT'))),
+    SnapshotTable('invoiceincontents', (
+        ('id', 'INTEGER PRIMARY KEY'), ('invoice_in_id', 'INTEGER'), ('product_id', 'INTEGER'),
+        ('quantity', 'INTEGER'), ('purchase_price', 'TEXT')
+    )),
+    SnapshotTable('products', (
+        ('id', 'INTEGER PRIMARY KEY'), ('name', 'TEXT'), ('sku', 'TEXT'),
+        ('collection_id', 'INTEGER'), ('product_type_id', 'INTEGER')
+    ), watermark=None),  # product_type_id переписывается на месте (update_product_types.py)
+    SnapshotTable('product_attribute_values', (
+        ('id', 'INTEGER PRIMARY KEY'), ('product_id', 'INTEGER'), ('attribute_id', 'INTEGER'), ('value', 'TEXT')
+    )),
+    SnapshotTable('collections', (('id', 'INTEGER PRIMARY KEY'), ('name', 'TEXT')), watermark=None),
+    SnapshotTable('producttypes', (
+        ('id', 'INTEGER PRIMARY KEY'), ('name', 'TEXT'), ('base_name', 'TEXT'), ('base_name_fr', 'TEXT'),
+        ('base_name_de', 'TEXT'), ('base_name_it', 'TEXT'), ('base_name_uk', 'TEXT')
+    ), watermark=None),
+    SnapshotTable('product_attributes', (('id', 'INTEGER PRIMARY KEY'), ('attribute_name', 'TEXT')), watermark=None),
+)
+
+_SCHEMA_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS invoiceincontents_invoice_in_id_idx ON invoiceincontents (invoice_in_id, id)",
+    "CREATE INDEX IF NOT EXISTS product_attribute_values_product_id_idx ON product_attribute_values (product_id)",
+)
+
+# Аналог fetch_invoice_data.sql для SQLite (без условия по инвойсу)
+_INVOICE_ROWS = """
+    SELECT
+        ii.id AS invoice_in_number,
+        ii.created_date AS invoice_date,
+        iic.id AS item_position,
+        iic.product_id,
+        col.name AS collection_name,
+        p.name AS product_name,
+        pt.name AS product_type_name,
+        p.sku AS product_sku,
+        (
+            SELECT json_group_object(pa.attribute_name, pav.value)
+            FROM product_attribute_values pav
+            JOIN product_attributes pa ON pa.id = pav.attribute_id
+            WHERE pav.product_id = p.id
+        ) AS parameters,
+        iic.quantity,
+        iic.purchase_price
+    FROM invoicesin ii
+    JOIN invoiceincontents iic ON ii.id = iic.invoice_in_id
+    JOIN products p ON iic.product_id = p.id
+    LEFT JOIN collections col ON p.collection_id = col.id
+    LEFT JOIN producttypes pt ON p.product_type_id = pt.id
+"""
+
+
+def _to_sqlite(value):
+    """Convert a PostgreSQL value to a lossless SQLite value."""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _create_schema(db: sqlite3.Connection):
+    for table in SNAPSHOT_TABLES:
+        columns = ', '.join(f"{name} {sql_type}" for name, sql_type in table.columns)
+        db.execute(f"CREATE TABLE IF NOT EXISTS {table.name} ({columns})")
+    for statement in _SCHEMA_INDEXES:
+        db.execute(statement)
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS snapshot_tables (
+            table_name TEXT PRIMARY KEY,
+            watermark INTEGER,
+            row_count INTEGER NOT NULL,
+            refreshed_at TEXT NOT NULL
+        )
+    """)
+    db.execute("CREATE TABLE IF NOT EXISTS snapshot_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    db.execute("INSERT OR REPLACE INTO snapshot_info VALUES ('version', ?)", (str(SNAPSHOT_VERSION),))
+
+
+def _watermark(db: sqlite3.Connection, table: SnapshotTable) -> int:
+    row = db.execute("SELECT watermark FROM snapshot_tables WHERE table_name = ?", (table.name,)).fetchone()
+    return row[0] if row and row[0] is not None else 0
+
+
+def _prune_deleted(pg_connection, db: sqlite3.Connection, table: SnapshotTable, watermark: int) -> int:
+    """Remove snapshot rows up to the watermark that no longer exist at the source."""
+    column = table.watermark
+    with pg_connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {table.name} WHERE {column} <= %s", (watermark,))
+        source_count = cursor.fetchone()[0]
+    local_count = db.execute(f"SELECT COUNT(*) FROM {table.name} WHERE {column} <= ?", (watermark,)).fetchone()[0]
+    # Новые строки получают id выше отметки: при равном числе строк удалений не было
+    if source_count == local_count:
+        return 0
+
+    db.execute("CREATE TEMP TABLE IF NOT EXISTS source_ids (id INTEGER PRIMARY KEY)")
+    db.execute("DELETE FROM source_ids")
+    with pg_connection.cursor(name=f"snapshot_{table.name}_ids") as cursor:
+        cursor.itersize = FETCH_SIZE
+        cursor.execute(f"SELECT {column} FROM {table.name} WHERE {column} <= %s", (watermark,))
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            db.executemany("INSERT INTO source_ids VALUES (?)", rows)
+    return db.execute(
+        f"DELETE FROM {table.name} WHERE {column} <= ? AND {column} NOT IN (SELECT id FROM source_ids)",
+        (watermark,)
+    ).rowcount
+
+
+def _export_table(pg_connection, db: sqlite3.Connection, table: SnapshotTable, full: bool) -> int:
+    """Copy new rows of one table; returns the number of rows fetched."""
+    columns = table.column_names
+    query = f"SELECT {', '.join(columns)} FROM {table.name}"
+    params = ()
+    if table.watermark and not full:
+        watermark = _watermark(db, table)
+        _prune_deleted(pg_connection, db, table, watermark)
+        query += f" WHERE {table.watermark} > %s"
+        params = (watermark,)
+    else:
+        db.execute(f"DELETE FROM {table.name}")
+    query += " ORDER BY id"
+
+    insert = (f"INSERT OR REPLACE INTO {table.name} ({', '.join(columns)}) "
+              f"VALUES ({', '.join('?' * len(columns))})")
+    fetched = 0
+    # Именованный курсор: таблица читается порциями, а не целиком в память
+    with pg_connection.cursor(name=f"snapshot_{table.name}") as cursor:
+        cursor.itersize = FETCH_SIZE
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            db.executemany(insert, [tuple(_to_sqlite(value) for value in row) for row in rows])
+            fetched += len(rows)
+
+    watermark = None
+    if table.watermark:
+        watermark = db.execute(f"SELECT MAX({table.watermark}) FROM {table.name}").fetchone()[0]
+    row_count = db.execute(f"SELECT COUNT(*) FROM {table.name}").fetchone()[0]
+    db.execute(
+        "INSERT OR REPLACE INTO snapshot_tables VALUES (?, ?, ?, ?)",
+        (table.name, watermark, row_count, datetime.now().isoformat(timespec='seconds'))
+    )
+    return fetched
+
+
+def export_snapshot(snapshot_path=DEFAULT_SNAPSHOT_PATH, full: bool = False,
+                    progress: Optional[Callable[[str, int], None]] = None) -> Dict[str, int]:
+    """Create or refresh the snapshot from PostgreSQL; returns rows fetched per table.
+
+    With ``full=True`` every table is reloaded. All tables are read in one
+    PostgreSQL transaction (a consistent view of the source) and written in
+    one SQLite transaction, so an interrupted refresh leaves the previous
+    snapshot intact. `progress(table, rows)` is called after every table.
+    """
+    # Чтение снимка (SnapshotReader) не требует драйвера PostgreSQL
+    from utils.db import connection
+
+    snapshot_path = Path(snapshot_path)
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    fetched = {}
+    db = sqlite3.connect(snapshot_path)
+    try:
+        with connection() as pg_connection, db:
+            # Один снимок данных источника на все таблицы; уровень изоляции задается
+            # только для этой транзакции, соединение возвращается в пул без изменений
+            pg_connection.rollback()
+            with pg_connection.cursor() as cursor:
+                cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            _create_schema(db)
+            for table in SNAPSHOT_TABLES:
+                fetched[table.name] = _export_table(pg_connection, db, table, full)
+                if progress:
+                    progress(table.name, fetched[table.name])
+        db.execute("ANALYZE")
+    finally:
+        db.close()
+    return fetched
+
+
+class SnapshotReader:
+    """Serves fetch_invoice_data.sql rows from a snapshot file."""
+
+    def __init__(self, snapshot_path=DEFAULT_SNAPSHOT_PATH):
+        snapshot_path = Path(snapshot_path)
+        if not snapshot_path.exists():
+            raise FileNotFoundError(
+                f"Snapshot not found at {snapshot_path}. Run scripts/export_snapshot.py first."
+            )
+        # Только чтение: снимок не меняется при генерации
+        self.db = sqlite3.connect(f"file:{snapshot_path}?mode=ro", uri=True)
+        self.db.row_factory = sqlite3.Row
+        version = self.db.execute("SELECT value FROM snapshot_info WHERE key = 'version'").fetchone()
+        if version is None or int(version[0]) != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {snapshot_path}")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> Dict:
+        """Convert a snapshot row to the types psycopg2 returns for fetch_invoice_data.sql."""
+        record = dict(row)
+        record['invoice_date'] = date.fromisoformat(record['invoice_date']) if record['invoice_date'] else None
+        record['parameters'] = json.loads(record['parameters']) if record['parameters'] else {}
+        record['purchase_price'] = Decimal(record['purchase_price'])
+        record['item_amount'] = record['quantity'] * record['purchase_price']
+        return record
+
+    def fetch_invoice_data(self, invoice_id: int) -> List[Dict]:
+        """Line items of one invoice, as fetch_invoice_data.sql returns them."""
+        rows = self.db.execute(_INVOICE_ROWS + " WHERE ii.id = ? ORDER BY iic.id", (invoice_id,))
+        return [self._record(row) for row in rows]
+
+    def stream_invoices(self, ids: Optional[Sequence[int]] = None, first_id: Optional[int] = None,
+                        last_id: Optional[int] = None) -> Iterator[Tuple[int, List[Dict]]]:
+        """Yield (invoice_id, rows) per invoice, like fetch_invoices_data.sql."""
+        conditions, params = [], []
+        if ids is not None:
+            if len(ids) == 0:
+                # Пустой список id ничего не выбирает: запрос с нестандартным "IN ()" не нужен
+                return
+            conditions.append(f"ii.id IN ({', '.join('?' * len(ids))})")
+            params.extend(ids)
+        if first_id is not None:
+            conditions.append("ii.id >= ?")
+            params.append(first_id)
+        if last_id is not None:
+            conditions.append("ii.id <= ?")
+            params.append(last_id)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        rows = self.db.execute(_INVOICE_ROWS + where + " ORDER BY ii.id, iic.id", params)
+        for invoice_id, group in groupby(rows, key=lambda row: row['invoice_in_number']):
+            yield invoice_id, [self._record(row) for row in group]
+
+    def table_info(self) -> List[Dict]:
+        """Watermark, row count and refresh time of every snapshot table."""
+        return [dict(row) for row in self.db.execute("SELECT * FROM snapshot_tables ORDER BY table_name")]
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Vectorized sampler of synthetic invoices.
+
+Invoices are drawn from the empirical distributions of the source data
+(utils.distribution_model) with a seeded NumPy ``Generator``. Every column of
+a batch is sampled as a whole array: item counts, (collection, product type)
+pairs, then quantity, price and size conditioned on the product type, and
+colors from ``data/colors.txt``. A categorical draw is an inverse-CDF lookup
+(``searchsorted``) over integer cumulative counts, and the conditional draws
+of all product types share one concatenated table, so no per-item Python code
+runs during sampling.
+
+A batch is a ``LineItemBatch`` plus per-invoice columns. ``SyntheticBatch.invoice``
+builds the Invoice model of one invoice for the renderers, and batches can be
+saved to and loaded from ``.npz`` files.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.distribution_model import DistributionModel, Histogram
+from utils.invoice_model import Address, Invoice, LineItem
+from utils.line_items import LineItemBatch, format_cents
+
+DEFAULT_COLORS_PATH = Path(__file__).parent.parent / 'data' / 'colors.txt'
+DEFAULT_BATCH_SIZE = 100000
+# Даты инвойсов равномерно в пределах года от этой даты
+FIRST_INVOICE_DATE = np.datetime64('2024-01-01')
+DATE_RANGE_DAYS = 365
+HS_CODE = 'HS-Code: 63029100 Chenille towels, 100% cotton'
+
+
+def load_colors(path: Optional[Path] = None) -> List[Tuple[str, str]]:
+    """Read (color_id, color_name) pairs from a colors file ('[147] pebble' per line)."""
+    colors = []
+    with open(path or DEFAULT_COLORS_PATH, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.strip().split('] ', 1)
+            if len(parts) == 2:
+                # Пустой ID цвета печатается точкой, как в prepare_invoice_data
+                colors.append((parts[0].strip('[') or '.', parts[1].strip()))
+    return colors
+
+
+class _Categorical:
+    """Inverse-CDF sampler of one histogram; returns indices into its values."""
+
+    def __init__(self, histogram: Histogram):
+        self.cumulative = np.cumsum(np.asarray(histogram.counts, dtype=np.int64))
+        self.total = int(self.cumulative[-1]) if len(self.cumulative) else 0
+
+    def sample(self, rng: np.random.Generator, size: int) -> np.ndarray:
+        draws = rng.integers(0, self.total, size=size)
+        return np.searchsorted(self.cumulative, draws, side='right')
+
+
+class _Conditional:
+    """Samples one histogram per group for many rows at once.
+
+    The histograms of all groups are concatenated; a row of group g draws an
+    integer in g's range of the common cumulative counts. Rows of groups
+    without observations get -1.
+    """
+
+    def __init__(self, histograms: Sequence[Histogram]):
+        counts = [np.asarray(histogram.counts, dtype=np.int64) for histogram in histograms]
+        self.totals = np.array([block.sum() for block in counts], dtype=np.int64)
+        self.starts = np.concatenate(([0], np.cumsum(self.totals)[:-1])).astype(np.int64)
+        self.cumulative = np.cumsum(np.concatenate(counts)) if counts else np.zeros(0, dtype=np.int64)
+
+    def sample(self, rng: np.random.Generator, groups: np.ndarray) -> np.ndarray:
+        totals = self.totals[groups]
+        draws = self.starts[groups] + (rng.random(len(groups)) * totals).astype(np.int64)
+        indices = np.searchsorted(self.cumulative, draws, side='right')
+        return np.where(totals > 0, indices, -1)
+
+
+def _encode(values_per_group: Sequence[Sequence], categories: List) -> np.ndarray:
+    """Category codes of the concatenated values of all groups (extends categories)."""
+    index = {value: code for code, value in enumerate(categories)}
+    codes = []
+    for values in values_per_group:
+        for value in values:
+            if value not in index:
+                index[value] = len(categories)
+                categories.append(value)
+            codes.append(index[value])
+    return np.asarray(codes, dtype=np.int32)
+
+
+@dataclass
+class SyntheticBatch:
+    """Sampled line items plus per-invoice columns."""
+
+    items: LineItemBatch
+    invoice_dates: np.ndarray  # datetime64[D], одна дата на инвойс
+    color_ids: List[str]  # ID цвета для каждой категории items.colors
+    first_number: int = 1
+
+    def __len__(self) -> int:
+        return self.items.invoice_count
+
+    def invoice(self, index: int) -> Invoice:
+        """Invoice model of one invoice of the batch, accepted by every renderer."""
+        items = self.items
+        start, stop = int(items.offsets[index]), int(items.offsets[index + 1])
+        prices = format_cents(items.price_cents[start:stop]).tolist()
+        amounts = format_cents(items.amount_cents[start:stop]).tolist()
+        invoice_date = self.invoice_dates[index].astype(datetime)
+        invoice_date = datetime(invoice_date.year, invoice_date.month, invoice_date.day)
+
+        line_items = []
+        for position, row in enumerate(range(start, stop), 1):
+            collection = items.collections[items.collection_codes[row]]
+            size = items.sizes[items.size_codes[row]]
+            color_code = items.color_codes[row]
+            line_items.append(LineItem(
+                position=position,
+                design=collection.upper(),
+                size=size,
+                color=self.color_ids[color_code],
+                quantity=str(items.quantity[row]),
+                unit='pcs',
+                price=prices[position - 1],
+                amount=amounts[position - 1],
+                amount_cents=int(items.amount_cents[row]),
+                color_name=items.colors[color_code],
+                article_no=f"{collection[:8].lower().replace(' ', '')}.{items.size_codes[row]:04d}."
+                           f"{self.color_ids[color_code]}",
+                hs_code=HS_CODE,
+                product_type=items.product_types[items.type_codes[row]]
+            ))
+
+        return Invoice(
+            invoice_number=f"SYN-{self.first_number + index:07d}",
+            invoice_date=invoice_date,
+            customer_number='29060',
+            order='2069354',
+            agent='49112',
+            seller='Emanuel Baur Asien/Drittland',
+            contact='Anja Konig',
+            recipient=Address('Home Sweet Home', 'Perekopskaya Street 123', '73022', 'KHERSON', 'UKRAINE'),
+            correspondence_number='09-2024',
+            correspondence_date=invoice_date,
+            correspondence_person='Tatjana Parygin',
+            delivery_note_number='4059965',
+            delivery_date=invoice_date,
+            items=tuple(line_items)
+        )
+
+    def save(self, path) -> Path:
+        """Write the batch columns to an .npz file."""
+        items = self.items
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(
+            path,
+            offsets=items.offsets, price_cents=items.price_cents, quantity=items.quantity,
+            amount_cents=items.amount_cents, size_codes=items.size_codes, color_codes=items.color_codes,
+            collection_codes=items.collection_codes, type_codes=items.type_codes,
+            sizes=np.array(items.sizes, dtype=str), colors=np.array(items.colors, dtype=str),
+            collections=np.array(items.collections, dtype=str),
+            product_types=np.array(items.product_types, dtype=str),
+            color_ids=np.array(self.color_ids, dtype=str),
+            invoice_dates=self.invoice_dates, first_number=np.int64(self.first_number)
+        )
+        return path
+
+    @classmethod
+    def load(cls, path) -> 'SyntheticBatch':
+        with np.load(path) as data:
+            items = LineItemBatch(
+                offsets=data['offsets'], price_cents=data['price_cents'], quantity=data['quantity'],
+                amount_cents=data['amount_cents'], size_codes=data['size_codes'],
+                color_codes=data['color_codes'], sizes=data['sizes'].tolist(), colors=data['colors'].tolist(),
+                collection_codes=data['collection_codes'], type_codes=data['type_codes'],
+                collections=data['collections'].tolist(), product_types=data['product_types'].tolist()
+            )
+            return cls(items, data['invoice_dates'], data['color_ids'].tolist(), int(data['first_number']))
+
+
+class SyntheticSampler:
+    """Draws batches of synthetic invoices from a DistributionModel."""
+
+    def __init__(self, model: DistributionModel, colors: Sequence[Tuple[str, str]], seed: int = 0):
+        if not colors:
+            raise ValueError("At least one color is required")
+        self.seed = seed
+        self.colors = list(colors)
+        self.items_per_invoice = np.asarray(model.items_per_invoice.values, dtype=np.int64)
+        self._items = _Categorical(model.items_per_invoice)
+
+        # Типы продуктов: порядковый код -> профиль. Типы без наблюдений количества
+        # или цены пропускаются: для их позиций нечего выбирать
+        type_ids = sorted(type_id for type_id, profile in model.product_types.items()
+                          if profile.quantity.total and profile.price_cents.total)
+        type_codes = {type_id: code for code, type_id in enumerate(type_ids)}
+        profiles = [model.product_types[type_id] for type_id in type_ids]
+        self.product_types = [profile.name for profile in profiles]
+
+        # Совместное распределение (коллекция, тип) по позициям инвойсов
+        self.collections = []
+        pair_collections, pair_types, pair_counts = [], [], []
+        for collection_id in sorted(model.collection_types):
+            histogram = model.collection_types[collection_id]
+            collection_code = len(self.collections)
+            self.collections.append(model.collections.get(collection_id) or '')
+            for type_id, count in zip(histogram.values, histogram.counts):
+                if type_id in type_codes:
+                    pair_collections.append(collection_code)
+                    pair_types.append(type_codes[type_id])
+                    pair_counts.append(count)
+        if not pair_counts:
+            raise ValueError("Distribution model has no collection/product type observations")
+        self._pair_collections = np.asarray(pair_collections, dtype=np.int32)
+        self._pair_types = np.asarray(pair_types, dtype=np.int32)
+        self._pairs = _Categorical(Histogram(list(range(len(pair_counts))), pair_counts))
+
+        # Условные распределения по типу продукта
+        self._quantity_values = np.concatenate(
+            [np.asarray(profile.quantity.values, dtype=np.int64) for profile in profiles])
+        self._quantity = _Conditional([profile.quantity for profile in profiles])
+        self._price_values = np.concatenate(
+            [np.asarray(profile.price_cents.values, dtype=np.int64) for profile in profiles])
+        self._price = _Conditional([profile.price_cents for profile in profiles])
+
+        # Размер: код 0 - пустое значение для типов без атрибута Size
+        self.sizes = ['']
+        size_histograms = [profile.attributes.get('Size', Histogram()) for profile in profiles]
+        self._size_codes = _encode([histogram.values for histogram in size_histograms], self.sizes)
+        self._size = _Conditional(size_histograms)
+
+    def sample(self, invoice_count: int, batch_index: int = 0, first_number: int = 1) -> SyntheticBatch:
+        """Draw one batch; the same (seed, batch_index) always gives the same batch."""
+        rng = np.random.default_rng([self.seed, batch_index])
+
+        counts = self.items_per_invoice[self._items.sample(rng, invoice_count)]
+        offsets = np.zeros(invoice_count + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        line_count = int(offsets[-1])
+
+        pairs = self._pairs.sample(rng, line_count)
+        type_codes = self._pair_types[pairs]
+        quantity = self._quantity_values[self._quantity.sample(rng, type_codes)]
+        price_cents = self._price_values[self._price.sample(rng, type_codes)]
+        size_index = self._size.sample(rng, type_codes)
+        if len(self._size_codes):
+            size_codes = np.where(size_index >= 0, self._size_codes[size_index], 0).astype(np.int32)
+        else:
+            size_codes = np.zeros(line_count, dtype=np.int32)
+        color_codes = rng.integers(0, len(self.colors), size=line_count).astype(np.int32)
+
+        items = LineItemBatch(
+            offsets=offsets,
+            price_cents=price_cents,
+            quantity=quantity,
+            amount_cents=price_cents * quantity,
+            size_codes=size_codes,
+            color_codes=color_codes,
+            sizes=self.sizes,
+            colors=[name for _, name in self.colors],
+            collection_codes=self._pair_collections[pairs],
+            type_codes=type_codes,
+            collections=self.collections,
+            product_types=self.product_types
+        )
+        invoice_dates = FIRST_INVOICE_DATE + rng.integers(0, DATE_RANGE_DAYS, size=invoice_count)
+        return SyntheticBatch(items, invoice_dates, [color_id for color_id, _ in self.colors], first_number)
+
+    def iter_batches(self, invoice_count: int, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[SyntheticBatch]:
+        """Draw invoice_count invoices in batches of at most batch_size invoices."""
+        for batch_index, start in enumerate(range(0, invoice_count, batch_size)):
+            yield self.sample(min(batch_size, invoice_count - start), batch_index, first_number=start + 1)